@@ -0,0 +1,641 @@
+import asyncio
+import hashlib
+import threading
+from collections import Counter
+from copy import copy
+from http import HTTPStatus
+from math import ceil
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.http import HttpResponse, QueryDict, StreamingHttpResponse
+from django.urls import reverse
+from django.views import View
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import (
+    AuthenticationFailed,
+    NotAcceptable,
+    NotAuthenticated,
+    Throttled,
+    ValidationError,
+)
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.facets import aget_facets, is_facets_requested
+from api.fast_serializers import (
+    fill_missing_documents,
+    get_recipe_row_fields,
+    serialize_recipe_rows,
+)
+from api.fields import parse_field_names
+from api.serializers import UserSerializer
+from api.stale import (
+    aget_stale_response,
+    astore_response,
+    counters,
+    get_stale_key,
+)
+from api.views import IngredientViewSet, RecipeViewSet, UserViewSet
+from foodgram.constants import (
+    BOOTSTRAP_CACHE_TIMEOUT,
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+    EVENTS_HEARTBEAT_INTERVAL,
+    EVENTS_MAX_CONNECTIONS_PER_USER,
+    EVENTS_RETRY_INTERVAL,
+)
+from foodgram.pubsub import REFRESH, pubsub
+from foodgram.resilience import database_breaker, statement_timeout
+from recipes.caching import aget_list_version, aget_user_version
+from recipes.counters import aget_counters, get_user_channel
+from recipes.documents import attach_recipe_documents
+from recipes.models import ShoppingCart
+from users.models import Subscribe
+from users.tokens import aget_token_user
+
+
+async def aget_user(request):
+    """Асинхронный аналог TokenAuthentication.
+
+    Возвращает None, если заголовок Authorization есть, но токен
+    недействителен: такой запрос отдается синхронному view, чтобы
+    ответ об ошибке формировал DRF.
+    """
+    auth = request.headers.get('Authorization', '').split()
+    if not auth:
+        return AnonymousUser()
+    if len(auth) != 2 or auth[0].lower() != 'token':
+        return None
+    user = await aget_token_user(auth[1])
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+async def get_subscribed_authors(user, author_ids):
+    if not user.is_authenticated:
+        return set()
+    return {
+        author_id async for author_id in Subscribe.objects.filter(
+            user=user, author_id__in=author_ids,
+        ).values_list('author_id', flat=True)
+    }
+
+
+def render(request, data, status=200):
+    """Рендерит ответ так же, как Response: с выбором формата по Accept.
+
+    Браузерный API асинхронными view не поддерживается.
+    """
+    drf_request = Request(request)
+    renderers = [
+        renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+        if renderer.format != 'api'
+    ]
+    try:
+        renderer, media_type = DefaultContentNegotiation().select_renderer(
+            drf_request, renderers)
+    except NotAcceptable as exc:
+        renderer, media_type = renderers[0], renderers[0].media_type
+        data, status = {'detail': exc.detail}, exc.status_code
+    content_type = media_type
+    if renderer.charset:
+        content_type = f'{media_type}; charset={renderer.charset}'
+    return HttpResponse(
+        renderer.render(data, media_type, {'request': drf_request}),
+        content_type=content_type,
+        status=status,
+    )
+
+
+def render_authentication_error(request, exc_class):
+    """Ответ 401 view, которые не передают запрос синхронному ViewSet."""
+    response = render(
+        request,
+        {'detail': exc_class.default_detail},
+        status=exc_class.status_code,
+    )
+    response['WWW-Authenticate'] = TokenAuthentication.keyword
+    return response
+
+
+class AsyncReadView(View):
+    """Асинхронное чтение поверх синхронного ViewSet.
+
+    GET обрабатывается через async ORM, а все остальные методы
+    и пограничные случаи (ошибки авторизации, 404, невалидная страница)
+    передаются исходному ViewSet через sync_to_async.
+    """
+
+    viewset = None
+    actions = None
+    basename = None
+    detail = False
+    stale_while_revalidate = False
+    """Отдавать ли GET последним успешным ответом, когда база
+    недоступна или не отвечает за DATABASE_READ_STATEMENT_TIMEOUT."""
+
+    revalidations = set()
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not self.stale_while_revalidate or request.method != 'GET':
+            return await super().dispatch(request, *args, **kwargs)
+        key = get_stale_key(request)
+        state = database_breaker.acquire()
+        if state == database_breaker.OPEN:
+            return await self.get_stale_response(request, key)
+        if state == database_breaker.HALF_OPEN:
+            response = await aget_stale_response(request, key)
+            if response is not None:
+                counters['stale'] += 1
+                self.revalidate(request, key, *args, **kwargs)
+                return response
+        try:
+            return await self.read(request, key, *args, **kwargs)
+        except DatabaseError:
+            return await self.get_stale_response(request, key)
+
+    async def read(self, request, key, *args, **kwargs):
+        """GET с ограничением времени SQL-запросов; успешный ответ
+        сохраняется, а результат учитывается автоматом базы."""
+        token = statement_timeout.set(
+            settings.DATABASE_READ_STATEMENT_TIMEOUT)
+        try:
+            response = await super().dispatch(request, *args, **kwargs)
+        except DatabaseError:
+            database_breaker.record_failure()
+            raise
+        finally:
+            statement_timeout.reset(token)
+        database_breaker.record_success()
+        counters['fresh'] += 1
+        if response.status_code == HTTPStatus.OK:
+            if not getattr(response, 'is_rendered', True):
+                await sync_to_async(response.render)()
+            await astore_response(key, response)
+        return response
+
+    def revalidate(self, request, key, *args, **kwargs):
+        """Получает актуальный ответ в фоне (пробная попытка
+        полуоткрытого автомата)."""
+        async def revalidate():
+            try:
+                await self.read(request, key, *args, **kwargs)
+            except DatabaseError:
+                counters['revalidation_failed'] += 1
+            else:
+                counters['revalidated'] += 1
+
+        task = asyncio.create_task(revalidate())
+        self.revalidations.add(task)
+        task.add_done_callback(self.revalidations.discard)
+
+    async def get_stale_response(self, request, key):
+        response = await aget_stale_response(request, key)
+        if response is not None:
+            counters['stale'] += 1
+            return response
+        counters['miss'] += 1
+        response = render(
+            request,
+            {'detail': 'База данных временно недоступна.'},
+            status=HTTPStatus.SERVICE_UNAVAILABLE,
+        )
+        response['Retry-After'] = CIRCUIT_BREAKER_RESET_TIMEOUT
+        return response
+
+    @classmethod
+    def get_initkwargs(cls):
+        initkwargs = {'basename': cls.basename, 'detail': cls.detail}
+        action = getattr(cls.viewset, cls.actions['get'])
+        initkwargs.update(getattr(action, 'kwargs', {}))
+        return initkwargs
+
+    @classmethod
+    def get_sync_view(cls):
+        if '_sync_view' not in cls.__dict__:
+            cls._sync_view = cls.viewset.as_view(
+                cls.actions, **cls.get_initkwargs())
+        return cls._sync_view
+
+    async def run_sync(self, request, *args, **kwargs):
+        return await sync_to_async(self.get_sync_view())(
+            request, *args, **kwargs)
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return await self.run_sync(request, *args, **kwargs)
+
+    options = http_method_not_allowed
+
+    def get_viewset(self, request, user, **kwargs):
+        drf_request = Request(request)
+        drf_request.user = user
+        return self.viewset(
+            request=drf_request,
+            args=(),
+            kwargs=kwargs,
+            format_kwarg=None,
+            action=self.actions['get'],
+            **self.get_initkwargs(),
+        )
+
+
+class RecipeListView(AsyncReadView):
+    viewset = RecipeViewSet
+    actions = {'get': 'list', 'post': 'create'}
+    basename = 'recipes'
+    stale_while_revalidate = True
+
+    async def get(self, request):
+        user = await aget_user(request)
+        if user is None or 'ids' in request.GET:
+            return await self.run_sync(request)
+        page_number = request.GET.get(
+            RecipeViewSet.pagination_class.page_query_param, '1')
+        if not page_number.isdigit() or int(page_number) < 1:
+            return await self.run_sync(request)
+        try:
+            data = await self.get_page(request, user, int(page_number))
+        except ValidationError:
+            return await self.run_sync(request)
+        if data is None:
+            return await self.run_sync(request)
+        return render(request, data)
+
+    async def get_page(self, request, user, page_number):
+        """Страница списка рецептов; None, если такой страницы нет.
+
+        Ошибки параметров фильтрации поднимаются как ValidationError.
+        """
+        view = self.get_viewset(request, user)
+        paginator = view.paginator
+        page_size = paginator.get_page_size(view.request)
+        fields = view.requested_fields
+        queryset = view.filter_queryset(view.get_queryset())
+        count = await queryset.acount()
+        if page_number > max(1, ceil(count / page_size)):
+            return None
+
+        offset = (page_number - 1) * page_size
+        row_fields = get_recipe_row_fields(fields)
+        rows = await sync_to_async(fill_missing_documents)([
+            row async for row in queryset.values_list(
+                *row_fields)[offset:offset + page_size]
+        ], row_fields)
+        subscribed_authors = set()
+        if fields is None or 'author' in fields:
+            subscribed_authors = await get_subscribed_authors(
+                user, {row[1] for row in rows})
+
+        url = request.build_absolute_uri()
+        next_url = previous_url = None
+        if offset + page_size < count:
+            next_url = replace_query_param(
+                url, paginator.page_query_param, page_number + 1)
+        if page_number == 2:
+            previous_url = remove_query_param(
+                url, paginator.page_query_param)
+        elif page_number > 2:
+            previous_url = replace_query_param(
+                url, paginator.page_query_param, page_number - 1)
+
+        data = {
+            'count': count,
+            'next': next_url,
+            'previous': previous_url,
+            'results': serialize_recipe_rows(
+                rows, view.request, subscribed_authors, fields),
+        }
+        if is_facets_requested(request):
+            data['facets'] = await aget_facets(request, user, queryset)
+        return data
+
+
+class RecipeDetailView(AsyncReadView):
+    viewset = RecipeViewSet
+    actions = {'get': 'retrieve', 'patch': 'partial_update',
+               'delete': 'destroy'}
+    basename = 'recipes'
+    detail = True
+    stale_while_revalidate = True
+
+    async def get(self, request, pk):
+        user = await aget_user(request)
+        if user is None:
+            return await self.run_sync(request, pk=pk)
+        view = self.get_viewset(request, user, pk=pk)
+        try:
+            fields = view.requested_fields
+            queryset = view.filter_queryset(view.get_queryset())
+        except ValidationError:
+            return await self.run_sync(request, pk=pk)
+        if fields is not None:
+            return await self.get_partial(
+                request, view, queryset.filter(pk=pk), fields)
+        recipe = await queryset.filter(pk=pk).afirst()
+        if recipe is None:
+            return await self.run_sync(request, pk=pk)
+        await sync_to_async(attach_recipe_documents)((recipe,))
+        context = view.get_serializer_context()
+        context['subscribed_authors'] = await get_subscribed_authors(
+            user, (recipe.author_id,))
+        return render(
+            request,
+            view.get_serializer_class()(recipe, context=context).data,
+        )
+
+    async def get_partial(self, request, view, queryset, fields):
+        """Ответ с частью полей рецепта (?fields= или ?omit=)."""
+        row_fields = get_recipe_row_fields(fields)
+        rows = await sync_to_async(fill_missing_documents)([
+            row async for row in queryset.values_list(*row_fields)
+        ], row_fields)
+        if not rows:
+            return await self.run_sync(request, pk=view.kwargs['pk'])
+        subscribed_authors = set()
+        if 'author' in fields:
+            subscribed_authors = await get_subscribed_authors(
+                view.request.user, (rows[0][1],))
+        return render(request, serialize_recipe_rows(
+            rows, view.request, subscribed_authors, fields)[0])
+
+
+class ShoppingCartCountView(AsyncReadView):
+    viewset = RecipeViewSet
+    actions = {'get': 'shopping_cart_count'}
+    basename = 'recipes'
+
+    async def get(self, request):
+        user = await aget_user(request)
+        if user is None:
+            return await self.run_sync(request)
+        if not user.is_authenticated:
+            return render_authentication_error(request, NotAuthenticated)
+        count = await ShoppingCart.objects.filter(user=user).acount()
+        return render(request, {'count': count})
+
+
+class IngredientListView(AsyncReadView):
+    viewset = IngredientViewSet
+    actions = {'get': 'list'}
+    basename = 'ingredients'
+    stale_while_revalidate = True
+
+    async def get(self, request):
+        view = self.get_viewset(request, AnonymousUser())
+        queryset = view.filter_queryset(view.get_queryset())
+        ingredients = [ingredient async for ingredient in queryset]
+        return render(
+            request, view.get_serializer(ingredients, many=True).data)
+
+
+class IngredientDetailView(AsyncReadView):
+    viewset = IngredientViewSet
+    actions = {'get': 'retrieve'}
+    basename = 'ingredients'
+    detail = True
+    stale_while_revalidate = True
+
+    async def get(self, request, pk):
+        view = self.get_viewset(request, AnonymousUser(), pk=pk)
+        ingredient = await view.filter_queryset(
+            view.get_queryset()).filter(pk=pk).afirst()
+        if ingredient is None:
+            return await self.run_sync(request, pk=pk)
+        return render(request, view.get_serializer(ingredient).data)
+
+
+class BootstrapView(View):
+    """Данные для первой загрузки приложения одним запросом.
+
+    Каждый раздел совпадает с ответом своего эндпоинта и кешируется
+    отдельно: ключ раздела содержит версии списка рецептов и данных
+    пользователя, поэтому после изменений он собирается заново.
+    Разделы собираются параллельно, каждый в своем потоке.
+    """
+
+    sections = {
+        'me': ('get_me', 'api:users-me', ()),
+        'recipes': ('get_recipes', 'api:recipes-list', ('limit',)),
+        'shopping_cart_count': (
+            'get_shopping_cart_count', 'api:recipes-shopping-cart-count', ()),
+        'subscriptions': (
+            'get_subscriptions',
+            'api:users-subscriptions',
+            ('limit', 'recipes_limit'),
+        ),
+    }
+    """Раздел -> (метод, эндпоинт, передаваемые ему параметры запроса)."""
+
+    async def get(self, request):
+        user = await aget_user(request)
+        if user is None:
+            return render_authentication_error(request, AuthenticationFailed)
+        names = request.GET.get('sections')
+        names = (set(self.sections) if names is None
+                 else parse_field_names(names))
+        unknown = names.difference(self.sections)
+        if unknown:
+            return render(
+                request,
+                {'sections': [
+                    f'Неизвестные разделы: {", ".join(sorted(unknown))}.']},
+                status=ValidationError.status_code,
+            )
+        names = [name for name in self.sections if name in names]
+        versions = (
+            await aget_list_version(),
+            await aget_user_version(user.pk) if user.is_authenticated else 0,
+        )
+        data = await asyncio.gather(*(
+            self.get_section(request, user, name, versions)
+            for name in names
+        ))
+        return render(request, dict(zip(names, data)))
+
+    def get_section_request(self, request, name):
+        """Копия запроса, адресованная эндпоинту раздела: ссылки
+        пагинации в разделе ведут на него."""
+        _, url_name, params = self.sections[name]
+        query = QueryDict(mutable=True)
+        for param in params:
+            if param in request.GET:
+                query.setlist(param, request.GET.getlist(param))
+        section_request = copy(request)
+        section_request.GET = query
+        section_request.META = {
+            **request.META, 'QUERY_STRING': query.urlencode()}
+        section_request.path = section_request.path_info = reverse(url_name)
+        return section_request
+
+    async def get_section(self, request, user, name, versions):
+        if name != 'recipes' and not user.is_authenticated:
+            return None
+        return await sync_to_async(
+            self.get_section_data, thread_sensitive=False,
+        )(request, user, name, versions)
+
+    def get_section_data(self, request, user, name, versions):
+        """Раздел из кеша или собранный заново.
+
+        Выполняется в отдельном потоке со своим соединением с базой,
+        поэтому разделы, которых нет в кеше, собираются одновременно,
+        а не по очереди в потоке async ORM. Соединение закрывается
+        (возвращается в пул) после раздела.
+        """
+        try:
+            request = self.get_section_request(request, name)
+            cache_key = 'bootstrap:{}:{}:{}:{}'.format(
+                name,
+                user.pk or 0,
+                ':'.join(map(str, versions)),
+                hashlib.sha256(
+                    request.build_absolute_uri().encode()).hexdigest(),
+            )
+            data = cache.get(cache_key)
+            if data is None:
+                data = getattr(self, self.sections[name][0])(request, user)
+                cache.set(cache_key, data, BOOTSTRAP_CACHE_TIMEOUT)
+            return data
+        finally:
+            connections.close_all()
+
+    def get_me(self, request, user):
+        return dict(UserSerializer(user, context={
+            'request': Request(request),
+            'subscribed_authors': set(),
+        }).data)
+
+    def get_recipes(self, request, user):
+        return self.get_viewset_data(
+            request, user, RecipeViewSet, 'list', 'recipes')
+
+    def get_shopping_cart_count(self, request, user):
+        return {'count': ShoppingCart.objects.filter(user=user).count()}
+
+    def get_subscriptions(self, request, user):
+        return self.get_viewset_data(
+            request, user, UserViewSet, 'subscriptions', 'users')
+
+    def get_viewset_data(self, request, user, viewset, action, basename):
+        drf_request = Request(request)
+        drf_request.user = user
+        view = viewset(
+            request=drf_request,
+            args=(),
+            kwargs={},
+            format_kwarg=None,
+            action=action,
+            basename=basename,
+            detail=False,
+        )
+        return getattr(view, action)(drf_request).data
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """Поток событий, который при закрытии вызывает on_close."""
+
+    def __init__(self, streaming_content, on_close):
+        super().__init__(streaming_content, content_type='text/event-stream')
+        self.on_close = on_close
+        self['Cache-Control'] = 'no-cache'
+        self['X-Accel-Buffering'] = 'no'
+
+    def close(self):
+        try:
+            self.on_close()
+        finally:
+            super().close()
+
+
+class EventsView(View):
+    """Поток Server-Sent Events со счетчиками пользователя.
+
+    Сразу после подключения и при каждом изменении избранного или
+    списка покупок отправляет событие counters. Пока событий нет,
+    отправляются комментарии-пинги, чтобы прокси не закрывали
+    соединение. Между событиями поток не держит соединение с БД.
+
+    Число потоков пользователя ограничено EVENTS_MAX_CONNECTIONS_PER_USER
+    в каждом процессе: при нескольких воркерах пользователь может открыть
+    до этого числа потоков на каждом из них.
+    """
+
+    streams = Counter()
+    """id пользователя -> число открытых потоков в этом процессе."""
+    streams_lock = threading.Lock()
+
+    async def get(self, request):
+        user = await aget_user(request)
+        if user is None:
+            return render_authentication_error(request, AuthenticationFailed)
+        if not user.is_authenticated:
+            return render_authentication_error(request, NotAuthenticated)
+        release = self.reserve_stream(user.pk)
+        if release is None:
+            return render(
+                request,
+                {'detail': 'Слишком много открытых потоков событий.'},
+                status=Throttled.status_code,
+            )
+        return EventStreamResponse(self.stream(user.pk, release), release)
+
+    @classmethod
+    def reserve_stream(cls, user_id):
+        """Занимает место потока пользователя до начала ответа.
+
+        Возвращает функцию, освобождающую место (повторные вызовы ничего
+        не делают), или None, если мест нет. Место освобождается при
+        закрытии ответа или завершении потока — тем, что наступит раньше.
+        """
+        with cls.streams_lock:
+            if cls.streams[user_id] >= EVENTS_MAX_CONNECTIONS_PER_USER:
+                return None
+            cls.streams[user_id] += 1
+        released = False
+
+        def release():
+            nonlocal released
+            with cls.streams_lock:
+                if released:
+                    return
+                released = True
+                cls.streams[user_id] -= 1
+                if not cls.streams[user_id]:
+                    del cls.streams[user_id]
+
+        return release
+
+    async def get_counters(self, user_id):
+        counters = await aget_counters(user_id)
+        await sync_to_async(connections.close_all)()
+        return counters
+
+    @staticmethod
+    def format_event(counters):
+        return 'event: counters\ndata: {}\n\n'.format(
+            orjson.dumps(counters).decode())
+
+    async def stream(self, user_id, release):
+        try:
+            with pubsub.subscribe(get_user_channel(user_id)) as subscription:
+                yield f'retry: {EVENTS_RETRY_INTERVAL}\n\n'
+                yield self.format_event(await self.get_counters(user_id))
+                while True:
+                    try:
+                        counters = await asyncio.wait_for(
+                            subscription.get(), EVENTS_HEARTBEAT_INTERVAL)
+                    except asyncio.TimeoutError:
+                        yield ': ping\n\n'
+                        continue
+                    if counters is REFRESH:
+                        counters = await self.get_counters(user_id)
+                    yield self.format_event(counters)
+        finally:
+            release()
@@ -0,0 +1,121 @@
+"""Фасеты списка рецептов: счетчики для боковой панели фильтров.
+
+Счетчики получаются двумя запросами: корзины времени приготовления
+и флаги — одним aggregate() с условными Count(filter=Q(...)), а авторы
+с наибольшим числом рецептов — GROUP BY с сортировкой и LIMIT, поэтому
+в процесс приходит не больше FACET_AUTHORS_LIMIT строк.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from foodgram.constants import (
+    FACET_AUTHORS_LIMIT,
+    FACET_COOKING_TIME_BOUNDS,
+    FACETS_CACHE_TIMEOUT,
+)
+from recipes.caching import aget_list_version, get_list_version
+
+FACETS_QUERY_PARAM = 'facets'
+NON_FILTER_QUERY_PARAMS = frozenset(('page', 'limit', FACETS_QUERY_PARAM))
+COOKING_TIME_BUCKETS = tuple(zip(
+    (None, *FACET_COOKING_TIME_BOUNDS), (*FACET_COOKING_TIME_BOUNDS, None)))
+"""Корзины времени приготовления: (больше, не больше)."""
+
+
+def is_facets_requested(request):
+    return request.GET.get(FACETS_QUERY_PARAM, '').lower() in ('1', 'true')
+
+
+def get_totals_aggregates():
+    aggregates = {}
+    for index, (lower, upper) in enumerate(COOKING_TIME_BUCKETS):
+        condition = Q()
+        if lower is not None:
+            condition &= Q(cooking_time__gt=lower)
+        if upper is not None:
+            condition &= Q(cooking_time__lte=upper)
+        aggregates[f'cooking_time_{index}'] = Count('pk', filter=condition)
+    # Имена агрегатов не совпадают с аннотациями, иначе Django
+    # подставит агрегат вместо аннотации в условие filter.
+    aggregates['favorited_count'] = Count(
+        'pk', filter=Q(is_favorited=True))
+    aggregates['in_shopping_cart_count'] = Count(
+        'pk', filter=Q(is_in_shopping_cart=True))
+    return aggregates
+
+
+def get_authors_queryset(queryset):
+    """FACET_AUTHORS_LIMIT авторов с наибольшим числом рецептов."""
+    return queryset.order_by().values('author_id').annotate(
+        recipes_count=Count('pk'),
+    ).order_by('-recipes_count', 'author_id').values_list(
+        'author_id', 'recipes_count')[:FACET_AUTHORS_LIMIT]
+
+
+def build_facets(totals, authors):
+    return {
+        'author': [
+            {'id': author_id, 'count': count}
+            for author_id, count in authors
+        ],
+        'cooking_time': [
+            {
+                'min': 1 if lower is None else lower + 1,
+                'max': upper,
+                'count': totals[f'cooking_time_{index}'],
+            }
+            for index, (lower, upper) in enumerate(COOKING_TIME_BUCKETS)
+        ],
+        'is_favorited': totals['favorited_count'],
+        'is_in_shopping_cart': totals['in_shopping_cart_count'],
+    }
+
+
+def count_facets(queryset):
+    return build_facets(
+        queryset.order_by().aggregate(**get_totals_aggregates()),
+        list(get_authors_queryset(queryset)),
+    )
+
+
+async def acount_facets(queryset):
+    return build_facets(
+        await queryset.order_by().aaggregate(**get_totals_aggregates()),
+        [row async for row in get_authors_queryset(queryset)],
+    )
+
+
+def get_facets_cache_key(request, list_version):
+    """Ключ фасетов анонимного пользователя для параметров фильтрации."""
+    params = sorted(
+        (key, value) for key, values in request.GET.lists()
+        if key not in NON_FILTER_QUERY_PARAMS for value in values
+    )
+    return 'recipes:facets:{}:{}'.format(
+        list_version,
+        hashlib.sha256(repr(params).encode()).hexdigest(),
+    )
+
+
+def get_facets(request, queryset):
+    if request.user.is_authenticated:
+        return count_facets(queryset)
+    cache_key = get_facets_cache_key(request, get_list_version())
+    facets = cache.get(cache_key)
+    if facets is None:
+        facets = count_facets(queryset)
+        cache.set(cache_key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+async def aget_facets(request, user, queryset):
+    if user.is_authenticated:
+        return await acount_facets(queryset)
+    cache_key = get_facets_cache_key(request, await aget_list_version())
+    facets = await cache.aget(cache_key)
+    if facets is None:
+        facets = await acount_facets(queryset)
+        await cache.aset(cache_key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
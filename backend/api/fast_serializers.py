@@ -0,0 +1,186 @@
+"""Сериализация рецептов без полей DRF.
+
+Ответ собирается напрямую из строк values_list() и документов рецептов
+(RecipeDocument) и совпадает с выводом RecipeSerializer байт в байт.
+"""
+from recipes.documents import get_file_url, rebuild_recipe_documents
+from recipes.models import Recipe
+from users.models import Subscribe
+
+RECIPE_ROW_FIELDS = (
+    'pk',
+    'author_id',
+    'document__data',
+    'is_favorited',
+    'is_in_shopping_cart',
+)
+"""Поля строки рецепта для serialize_recipe_rows()."""
+RECIPE_FIELDS = (
+    'id',
+    'author',
+    'ingredients',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'name',
+    'image',
+    'text',
+    'cooking_time',
+)
+"""Поля ответа с рецептом в порядке вывода."""
+RECIPE_FLAGS = ('is_favorited', 'is_in_shopping_cart')
+RECIPE_COLUMN_FIELDS = ('name', 'image', 'cooking_time')
+"""Поля, которые можно взять из таблицы рецептов без документа."""
+RECIPE_DOCUMENT_FIELDS = frozenset(('author', 'ingredients', 'text'))
+"""Поля, для которых нужен документ рецепта."""
+
+
+def needs_document(fields):
+    return fields is None or bool(fields & RECIPE_DOCUMENT_FIELDS)
+
+
+def get_recipe_row_fields(fields=None):
+    """Поля values_list() для ответа с полями fields (None — все поля).
+
+    Документ выбирается, только если нужны его поля, а флаги
+    is_favorited и is_in_shopping_cart — только если они запрошены:
+    невыбранные аннотации не попадают в запрос.
+    """
+    if fields is None:
+        return RECIPE_ROW_FIELDS
+    row_fields = ['pk', 'author_id']
+    if needs_document(fields):
+        row_fields.append('document__data')
+    else:
+        row_fields.extend(
+            field for field in RECIPE_COLUMN_FIELDS if field in fields)
+    row_fields.extend(flag for flag in RECIPE_FLAGS if flag in fields)
+    return tuple(row_fields)
+
+
+def get_url_builder(request):
+    """Аналог request.build_absolute_uri с заранее вычисленным префиксом."""
+    if request is None:
+        return lambda url: url
+    origin = request.build_absolute_uri('/')[:-1]
+
+    def build_url(url):
+        if not url:
+            return url
+        if url.startswith('/') and not url.startswith('//'):
+            return origin + url
+        return request.build_absolute_uri(url)
+
+    return build_url
+
+
+def render_ingredients(ingredients):
+    """Ингредиенты документа с ключами в порядке RecipeIngredientSerializer:
+    jsonb в PostgreSQL хранит ключи объектов в своем порядке."""
+    return [
+        {
+            'id': ingredient['id'],
+            'name': ingredient['name'],
+            'measurement_unit': ingredient['measurement_unit'],
+            'amount': ingredient['amount'],
+        }
+        for ingredient in ingredients
+    ]
+
+
+def render_recipe(document, build_url, is_subscribed, flags=()):
+    author = document['author']
+    representation = {
+        'id': document['id'],
+        'author': {
+            'email': author['email'],
+            'id': author['id'],
+            'username': author['username'],
+            'first_name': author['first_name'],
+            'last_name': author['last_name'],
+            'is_subscribed': is_subscribed,
+            'avatar': build_url(author['avatar']),
+        },
+        'ingredients': render_ingredients(document['ingredients']),
+    }
+    for flag, value in flags:
+        representation[flag] = value
+    representation['name'] = document['name']
+    representation['image'] = build_url(document['image'])
+    representation['text'] = document['text']
+    representation['cooking_time'] = document['cooking_time']
+    return representation
+
+
+def render_recipe_fields(values, build_url, is_subscribed, fields):
+    """Поля fields рецепта из словаря со значениями get_recipe_row_fields().
+    """
+    flags = [(flag, values[flag]) for flag in RECIPE_FLAGS if flag in values]
+    if 'document__data' in values:
+        representation = render_recipe(
+            values['document__data'], build_url, is_subscribed, flags)
+    else:
+        representation = dict(flags, id=values['pk'])
+        for field in RECIPE_COLUMN_FIELDS:
+            if field in values:
+                representation[field] = values[field]
+        if 'image' in values:
+            representation['image'] = build_url(
+                get_file_url(values['image']))
+    return {
+        field: representation[field]
+        for field in RECIPE_FIELDS
+        if field in fields and field in representation
+    }
+
+
+def fill_missing_documents(rows, row_fields=RECIPE_ROW_FIELDS):
+    """Собирает документы для строк, у которых их еще нет."""
+    if 'document__data' not in row_fields:
+        return rows
+    missing = [row[0] for row in rows if row[2] is None]
+    if not missing:
+        return rows
+    documents = {
+        document.recipe_id: document.data
+        for document in rebuild_recipe_documents(
+            Recipe.objects.filter(pk__in=missing))
+    }
+    return [
+        row if row[2] is not None
+        else (*row[:2], documents[row[0]], *row[3:])
+        for row in rows
+    ]
+
+
+def get_subscribed_authors(user, rows):
+    if not user.is_authenticated:
+        return set()
+    return set(Subscribe.objects.filter(
+        user=user, author_id__in={row[1] for row in rows}
+    ).values_list('author_id', flat=True))
+
+
+def serialize_recipe_rows(rows, request, subscribed_authors, fields=None):
+    build_url = get_url_builder(request)
+    if fields is not None:
+        row_fields = get_recipe_row_fields(fields)
+        return [
+            render_recipe_fields(
+                dict(zip(row_fields, row)),
+                build_url,
+                row[1] in subscribed_authors,
+                fields,
+            )
+            for row in rows
+        ]
+    return [
+        render_recipe(
+            document,
+            build_url,
+            author_id in subscribed_authors,
+            (('is_favorited', is_favorited),
+             ('is_in_shopping_cart', is_in_shopping_cart)),
+        )
+        for _, author_id, document, is_favorited, is_in_shopping_cart
+        in rows
+    ]
@@ -0,0 +1,38 @@
+"""Выбор полей ответа: ?fields=id,name или ?omit=text,ingredients."""
+from rest_framework.exceptions import ValidationError
+
+FIELDS_QUERY_PARAM = 'fields'
+OMIT_QUERY_PARAM = 'omit'
+
+
+def parse_field_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def get_requested_fields(request, available_fields):
+    """Набор полей ответа; None, если параметры не переданы.
+
+    Работает и с запросом DRF, и с HttpRequest (асинхронные view).
+    """
+    fields = request.GET.get(FIELDS_QUERY_PARAM)
+    omit = request.GET.get(OMIT_QUERY_PARAM)
+    if fields is None and omit is None:
+        return None
+    errors = {}
+    requested = set(available_fields)
+    for param, value in ((FIELDS_QUERY_PARAM, fields),
+                         (OMIT_QUERY_PARAM, omit)):
+        if value is None:
+            continue
+        names = parse_field_names(value)
+        unknown = names.difference(available_fields)
+        if unknown:
+            errors[param] = [
+                f'Неизвестные поля: {", ".join(sorted(unknown))}.']
+        elif param == FIELDS_QUERY_PARAM:
+            requested &= names
+        else:
+            requested -= names
+    if errors:
+        raise ValidationError(errors)
+    return frozenset(requested)
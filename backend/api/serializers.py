@@ -2,12 +2,32 @@ import base64
 
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
-from django.db import transaction
+from django.db import models, transaction
 from django_filters import rest_framework as filters
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
-from foodgram.constants import COOKING_MIN_VALUE, MAX_IMAGE_SIZE
+from api.fast_serializers import (
+    RECIPE_COLUMN_FIELDS,
+    RECIPE_FLAGS,
+    get_url_builder,
+    needs_document,
+    render_recipe,
+    render_recipe_fields,
+)
+from foodgram.constants import (
+    COOKING_MIN_VALUE,
+    MAX_IMAGE_SIZE,
+    PANTRY_MAX_INGREDIENTS,
+    PANTRY_MAX_MISSING,
+    RECIPE_IDS_MAX_COUNT,
+    SYNC_MAX_PAGE_SIZE,
+    SYNC_PAGE_SIZE,
+)
+from foodgram.staging import StagedFile, atomic_with_files
+from recipes.catalog import resolve_ingredients
+from recipes.documents import attach_recipe_documents
+from recipes.feed import fan_out_recipe
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -15,6 +35,7 @@ from recipes.models import (
     RecipeIngredient,
     ShoppingCart,
 )
+from tasks.queue import enqueue
 from users.models import Subscribe
 
 User = get_user_model()
@@ -64,7 +85,24 @@ class UserSerializer(UserSerializer):
         )
         read_only_fields = fields
 
+    def __init__(self, *args, fields=None, **kwargs):
+        """fields — набор полей ответа, None — все поля."""
+        self.requested_fields = fields
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.requested_fields is None:
+            return fields
+        return {
+            name: field for name, field in fields.items()
+            if name in self.requested_fields
+        }
+
     def get_is_subscribed(self, obj):
+        subscribed_authors = self.context.get('subscribed_authors')
+        if subscribed_authors is not None:
+            return obj.id in subscribed_authors
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Subscribe.objects.filter(user=request.user,
@@ -109,16 +147,42 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+def validate_ingredients_exist(ingredient_ids):
+    try:
+        ingredient_ids = [int(pk) for pk in ingredient_ids]
+    except (TypeError, ValueError):
+        ingredient_ids = None
+    if (ingredient_ids is None
+            or None in resolve_ingredients(ingredient_ids).values()):
+        raise serializers.ValidationError(
+            'Указаны несуществующие ингредиенты')
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.ReadOnlyField(source='ingredient.id')
-    name = serializers.ReadOnlyField(source='ingredient.name')
-    measurement_unit = serializers.ReadOnlyField(
-        source='ingredient.measurement_unit')
+    id = serializers.ReadOnlyField(source='ingredient_id')
+    name = serializers.SerializerMethodField()
+    measurement_unit = serializers.SerializerMethodField()
 
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
+    def get_name(self, obj):
+        return resolve_ingredients((obj.ingredient_id,))[obj.ingredient_id][0]
+
+    def get_measurement_unit(self, obj):
+        return resolve_ingredients((obj.ingredient_id,))[obj.ingredient_id][1]
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.manager.BaseManager)
+            else data
+        )
+        attach_recipe_documents(recipes)
+        return super().to_representation(recipes)
+
 
 class RecipeSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
@@ -142,6 +206,50 @@ class RecipeSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time',
         )
+        list_serializer_class = RecipeListSerializer
+
+    def __init__(self, *args, fields=None, **kwargs):
+        """fields — набор полей ответа, None — все поля."""
+        self.requested_fields = fields
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, instance):
+        """Собирает ответ из документа рецепта (RecipeDocument).
+
+        Из документа берется все, кроме флагов, зависящих от пользователя:
+        is_favorited, is_in_shopping_cart и author.is_subscribed.
+        """
+        fields = self.requested_fields
+        flags = [
+            (flag, getattr(instance, flag)) for flag in RECIPE_FLAGS
+            if hasattr(instance, flag)
+        ]
+        build_url = get_url_builder(self.context.get('request'))
+        if fields is None:
+            attach_recipe_documents((instance,))
+            return render_recipe(
+                instance.document.data,
+                build_url,
+                self.fields['author'].get_is_subscribed(instance.author),
+                flags,
+            )
+        values = dict(flags, pk=instance.pk)
+        if needs_document(fields):
+            attach_recipe_documents((instance,))
+            values['document__data'] = instance.document.data
+        else:
+            values.update(
+                (field, getattr(instance, field))
+                for field in RECIPE_COLUMN_FIELDS
+            )
+            values['image'] = instance.image.name
+        return render_recipe_fields(
+            values,
+            build_url,
+            'author' in fields
+            and self.fields['author'].get_is_subscribed(instance.author),
+            fields,
+        )
 
     def validate(self, attrs):
         ingredients = self.initial_data.get('ingredients', [])
@@ -154,10 +262,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Ингредиенты не должны повторяться')
 
-        existing_ingredients = Ingredient.objects.filter(id__in=ingredient_ids)
-        if len(existing_ingredients) != len(ingredient_ids):
-            raise serializers.ValidationError(
-                'Указаны несуществующие ингредиенты')
+        validate_ingredients_exist(ingredient_ids)
 
         return attrs
 
@@ -290,6 +395,8 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     'Ингредиенты должны быть уникальны.')
 
+            validate_ingredients_exist(ingredient_ids)
+
             for ingredient in ingredients:
                 if int(ingredient.get('amount', 0)) <= 0:
                     raise serializers.ValidationError(
@@ -310,21 +417,37 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ]
         RecipeIngredient.objects.bulk_create(ingredients)
 
-    @transaction.atomic
+    def stage_image(self, validated_data, instance=None):
+        """Записывает картинку до транзакции; в validated_data остается
+        только имя файла (см. foodgram.staging)."""
+        if 'image' not in validated_data:
+            return []
+        image = StagedFile(
+            Recipe._meta.get_field('image'),
+            validated_data['image'],
+            instance,
+        )
+        validated_data['image'] = image.name
+        return [image]
+
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(
-            author=self.context['request'].user, **validated_data
-        )
-        self.create_ingredients(recipe, ingredients_data)
+        staged_files = self.stage_image(validated_data)
+        with atomic_with_files(staged_files):
+            recipe = Recipe.objects.create(
+                author=self.context['request'].user, **validated_data
+            )
+            self.create_ingredients(recipe, ingredients_data)
+            enqueue(fan_out_recipe, recipe.id, key=f'fan-out:{recipe.id}')
         return recipe
 
-    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients', None)
-        instance = super().update(instance, validated_data)
-        instance.recipe_ingredients.all().delete()
-        self.create_ingredients(instance, ingredients_data)
+        staged_files = self.stage_image(validated_data, instance)
+        with atomic_with_files(staged_files):
+            instance = super().update(instance, validated_data)
+            instance.recipe_ingredients.all().delete()
+            self.create_ingredients(instance, ingredients_data)
 
         return instance
 
@@ -347,6 +470,41 @@ class ShoppingCartCountSerializer(serializers.ModelSerializer):
         }
 
 
+class PantrySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=PANTRY_MAX_INGREDIENTS,
+    )
+    missing = serializers.IntegerField(
+        min_value=0, max_value=PANTRY_MAX_MISSING, default=0)
+
+    def validate_ingredients(self, value):
+        return sorted(set(value))
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.CharField()
+
+    def validate_ids(self, value):
+        """Разбирает id через запятую, сохраняя порядок без повторов."""
+        ids = [pk.strip() for pk in value.split(',')]
+        if not all(pk.isdigit() and int(pk) > 0 for pk in ids):
+            raise serializers.ValidationError(
+                'Укажите id рецептов через запятую.')
+        ids = list(dict.fromkeys(map(int, ids)))
+        if len(ids) > RECIPE_IDS_MAX_COUNT:
+            raise serializers.ValidationError(
+                f'Не больше {RECIPE_IDS_MAX_COUNT} рецептов за запрос.')
+        return ids
+
+
+class SyncSerializer(serializers.Serializer):
+    since = serializers.IntegerField(min_value=0, required=False)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=SYNC_MAX_PAGE_SIZE, default=SYNC_PAGE_SIZE)
+
+
 class BaseUserRelationCreateSerializer(serializers.ModelSerializer):
     error_message = None
     relation_field = None
@@ -412,10 +570,24 @@ class SubscribeCreateSerializer(BaseUserRelationCreateSerializer):
         return value
 
 
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
 class RecipeFilter(filters.FilterSet):
     author = filters.NumberFilter(field_name='author__id')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(method='filter_in_cart')
+    min_cooking_time = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='gte')
+    max_cooking_time = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte')
+    ingredients = NumberInFilter(method='filter_ingredients')
+    exclude_ingredients = NumberInFilter(method='filter_exclude_ingredients')
+    ordering = filters.ChoiceFilter(
+        choices=(('trending', 'По популярности'),),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
@@ -432,3 +604,19 @@ class RecipeFilter(filters.FilterSet):
         if value and user.is_authenticated:
             return queryset.filter(shopping_carts__user=user)
         return queryset
+
+    def filter_ingredients(self, queryset, name, value):
+        ingredient_ids = {int(ingredient_id) for ingredient_id in value}
+        return queryset.filter(pk__in=RecipeIngredient.objects.filter(
+            ingredient_id__in=ingredient_ids
+        ).values('recipe_id').annotate(
+            matched=models.Count('id')
+        ).filter(matched=len(ingredient_ids)).values('recipe_id'))
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        return queryset.exclude(pk__in=RecipeIngredient.objects.filter(
+            ingredient_id__in={int(ingredient_id) for ingredient_id in value}
+        ).values('recipe_id'))
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by('-trending_score', '-pub_date')
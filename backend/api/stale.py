@@ -0,0 +1,79 @@
+"""Последние успешные ответы чтений для отдачи при сбоях базы.
+
+Ответ хранится в общем кеше по заголовку Authorization, пути с
+параметрами и Accept. Устаревший ответ отдается с заголовками Age
+и X-Cache: STALE; ответ пользователю с токеном отдается, только если
+токен известен процессу без обращения к базе (см. users.tokens).
+"""
+import hashlib
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from foodgram.constants import (
+    STALE_RESPONSE_LRU_SIZE,
+    STALE_RESPONSE_REFRESH_INTERVAL,
+    STALE_RESPONSE_TIMEOUT,
+)
+from users.tokens import get_cached_token_user
+
+counters = Counter()
+"""Счетчики процесса: fresh — ответ из базы, stale — сохраненный ответ,
+miss — сбой без сохраненного ответа, revalidated и revalidation_failed —
+обновления в фоне."""
+
+_stored_at = OrderedDict()
+"""Ключ -> время последнего сохранения ответа процессом: чаще
+STALE_RESPONSE_REFRESH_INTERVAL ответ не перезаписывается."""
+
+
+def get_stale_key(request):
+    digest = hashlib.sha256('\n'.join((
+        request.headers.get('Authorization', ''),
+        request.get_full_path(),
+        request.headers.get('Accept', ''),
+    )).encode()).hexdigest()
+    return f'stale:{digest}'
+
+
+async def astore_response(key, response):
+    now = time.monotonic()
+    stored_at = _stored_at.get(key)
+    if (stored_at is not None
+            and now - stored_at < STALE_RESPONSE_REFRESH_INTERVAL):
+        return
+    _stored_at[key] = now
+    _stored_at.move_to_end(key)
+    if len(_stored_at) > STALE_RESPONSE_LRU_SIZE:
+        _stored_at.popitem(last=False)
+    await cache.aset(
+        key,
+        (response.content, response['Content-Type'], time.time()),
+        STALE_RESPONSE_TIMEOUT,
+    )
+
+
+def is_known_client(request):
+    auth = request.headers.get('Authorization', '').split()
+    if not auth:
+        return True
+    if len(auth) != 2 or auth[0].lower() != 'token':
+        return False
+    user = get_cached_token_user(auth[1])
+    return user is not None and user.is_active
+
+
+async def aget_stale_response(request, key):
+    """Сохраненный ответ или None."""
+    if not is_known_client(request):
+        return None
+    entry = await cache.aget(key)
+    if entry is None:
+        return None
+    content, content_type, stored_at = entry
+    response = HttpResponse(content, content_type=content_type)
+    response['Age'] = max(0, int(time.time() - stored_at))
+    response['X-Cache'] = 'STALE'
+    return response
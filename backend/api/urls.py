@@ -1,7 +1,23 @@
 from django.urls import include, path
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.routers import DefaultRouter
 
-from api.views import IngredientViewSet, RecipeViewSet, UserViewSet
+from api.async_views import (
+    BootstrapView,
+    EventsView,
+    IngredientDetailView,
+    IngredientListView,
+    RecipeDetailView,
+    RecipeListView,
+    ShoppingCartCountView,
+)
+from api.views import (
+    HealthView,
+    IngredientViewSet,
+    RecipeViewSet,
+    SyncView,
+    UserViewSet,
+)
 
 app_name = 'api'
 
@@ -10,7 +26,21 @@ router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 router.register(r'users', UserViewSet, basename='users')
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 
+async_urlpatterns = (
+    path('ingredients/', csrf_exempt(IngredientListView.as_view())),
+    path('ingredients/<int:pk>/', csrf_exempt(IngredientDetailView.as_view())),
+    path('recipes/', csrf_exempt(RecipeListView.as_view())),
+    path('recipes/shopping_cart_count/',
+         csrf_exempt(ShoppingCartCountView.as_view())),
+    path('recipes/<int:pk>/', csrf_exempt(RecipeDetailView.as_view())),
+    path('bootstrap/', BootstrapView.as_view(), name='bootstrap'),
+    path('events/', EventsView.as_view(), name='events'),
+)
+
 urlpatterns = (
+    *async_urlpatterns,
     path('', include(router.urls)),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('health/', HealthView.as_view(), name='health'),
     path('auth/', include('djoser.urls.authtoken')),
 )
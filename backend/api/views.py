@@ -1,16 +1,27 @@
+import hashlib
+import os
+from datetime import datetime
 from http import HTTPStatus
 from io import BytesIO
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db import models
 from django.db.models import Count, Exists, OuterRef, Sum
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import filters, serializers, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
 from rest_framework.permissions import (
     AllowAny,
     IsAuthenticated,
@@ -18,20 +29,34 @@ from rest_framework.permissions import (
 )
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
-
+from rest_framework.views import APIView
+
+from api import stale
+from api.facets import get_facets, is_facets_requested
+from api.fast_serializers import (
+    RECIPE_FIELDS,
+    fill_missing_documents,
+    get_recipe_row_fields,
+    get_subscribed_authors,
+    serialize_recipe_rows,
+)
+from api.fields import get_requested_fields
 from api.permissions import IsAuthorOrReadOnly
 from api.serializers import (
     Base64ImageField,
     FavoriteCreateSerializer,
     IngredientSerializer,
+    PantrySerializer,
     RecipeCreateSerializer,
     RecipeFilter,
+    RecipeIdsSerializer,
     RecipeSerializer,
     RecipeShortSerializer,
     ShoppingCartCountSerializer,
     ShoppingCartCreateSerializer,
     SubscribeCreateSerializer,
     SubscribeSerializer,
+    SyncSerializer,
     UserCreateSerializer,
     UserSerializer,
 )
@@ -39,15 +64,36 @@ from foodgram.constants import (
     DOWNLOAD_SHOPPING_CART_FILE_NAME,
     PAGINATION_MAX_PAGE_SIZE,
     PAGINATION_PAGE_SIZE,
+    PANTRY_CACHE_TIMEOUT,
+    SIMILAR_RECIPES_LIMIT,
+)
+from foodgram.resilience import database_breaker
+from recipes.catalog import (
+    SNAPSHOT_ENCODINGS,
+    get_catalog_version,
+    get_snapshot_path,
+    rebuild_catalog_snapshot,
+    resolve_ingredients,
 )
+from recipes.change_log import (
+    get_compacted_token,
+    get_current_token,
+    get_user_changes,
+)
+from recipes.feed import backfill_timeline, get_feed_page, remove_from_timeline
+from recipes.ingredient_index import find_pantry_recipes, find_similar_recipes
 from recipes.models import (
+    ChangeLogEntry,
     Favorite,
     Ingredient,
     Recipe,
     RecipeIngredient,
     ShoppingCart,
 )
-from users.models import Subscribe
+from recipes.sampling import sample_recipe_ids
+from recipes.short_links import ensure_short_code
+from tasks.queue import enqueue
+from users.models import AuthorSuggestion, Subscribe
 
 User = get_user_model()
 
@@ -59,14 +105,117 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = PAGINATION_MAX_PAGE_SIZE
 
 
+class FeedPagination(CursorPagination):
+    """Курсор по ключам ленты (pub_date, recipe_id), см. get_feed_page().
+
+    Страница выбирается по индексам записей ленты и рецептов, без
+    сортировки всей ленты, а рецепты страницы затем читаются по id.
+    """
+
+    page_size = PAGINATION_PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = PAGINATION_MAX_PAGE_SIZE
+
+    def paginate_feed(self, request, user):
+        """id рецептов страницы ленты в порядке вывода."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        position, reverse = None, False
+        if cursor is not None:
+            position = self.decode_position(cursor.position)
+            reverse = cursor.reverse
+        keys = get_feed_page(user, self.page_size, position, reverse)
+        has_more = len(keys) > self.page_size
+        self.keys = keys[:self.page_size]
+        if reverse:
+            self.keys.reverse()
+        self.has_next = bool(self.keys) and (
+            position is not None if reverse else has_more)
+        self.has_previous = bool(self.keys) and (
+            has_more if reverse else position is not None)
+        return [recipe_id for _, recipe_id in self.keys]
+
+    def decode_position(self, position):
+        try:
+            recipe_id, pub_date = position.split(' ', 1)
+            return datetime.fromisoformat(pub_date), int(recipe_id)
+        except (AttributeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_position(self, key):
+        pub_date, recipe_id = key
+        return f'{recipe_id} {pub_date.isoformat()}'
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=self.encode_position(self.keys[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True,
+            position=self.encode_position(self.keys[0])))
+
+
+def get_accepted_encoding(accept_encoding):
+    accepted = {}
+    for item in accept_encoding.split(','):
+        encoding, _, quality = item.strip().partition(';q=')
+        try:
+            accepted[encoding.strip().lower()] = float(quality or 1)
+        except ValueError:
+            continue
+    for encoding in SNAPSHOT_ENCODINGS:
+        if accepted.get(encoding, 0) > 0:
+            return encoding
+    return None
+
+
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (filters.SearchFilter,)
     permission_classes = (AllowAny,)
-    search_fields = ('^name')
+    search_fields = ('^name',)
     pagination_class = None
 
+    @action(detail=False, methods=['get'])
+    def snapshot(self, request):
+        """Весь каталог одним заранее собранным (и сжатым) файлом.
+
+        Запрос с ?version=<текущая версия> кешируется навсегда, без версии
+        ответ нужно перепроверять по ETag.
+        """
+        version = get_catalog_version()
+        encoding = get_accepted_encoding(
+            request.headers.get('Accept-Encoding', ''))
+        etag = f'"{version}-{encoding}"' if encoding else f'"{version}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponse(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            try:
+                content = get_snapshot_path(version, encoding).read_bytes()
+            except FileNotFoundError:
+                version = rebuild_catalog_snapshot()
+                content = get_snapshot_path(version, encoding).read_bytes()
+            response = HttpResponse(content, content_type='application/json')
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        response['X-Catalog-Version'] = version
+        if request.query_params.get('version') == version:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'public, no-cache'
+        return response
+
 
 class UserViewSet(DjoserUserViewSet):
     serializer_class = UserSerializer
@@ -79,6 +228,25 @@ class UserViewSet(DjoserUserViewSet):
             return UserCreateSerializer
         return super().get_serializer_class()
 
+    @cached_property
+    def requested_fields(self):
+        """Поля ответа из ?fields= и ?omit=; None — все поля."""
+        if self.request.method != 'GET':
+            return None
+        return get_requested_fields(self.request, UserSerializer.Meta.fields)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.requested_fields
+        if fields is not None and self.action in ('list', 'retrieve'):
+            queryset = queryset.only('id', *fields - {'is_subscribed'})
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.get_serializer_class() is UserSerializer:
+            kwargs.setdefault('fields', self.requested_fields)
+        return super().get_serializer(*args, **kwargs)
+
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def me(self, request):
@@ -106,6 +274,7 @@ class UserViewSet(DjoserUserViewSet):
                     {'error': str(e)},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            enqueue(backfill_timeline, user.id, author.id)
 
             subscription = Subscribe.objects.filter(
                 user=request.user, author=author
@@ -129,6 +298,7 @@ class UserViewSet(DjoserUserViewSet):
                 {'error': 'Вы не подписаны на этого пользователя'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        remove_from_timeline(user.id, author.id)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -139,12 +309,29 @@ class UserViewSet(DjoserUserViewSet):
             user=request.user
         ).annotate(
             recipes_count=Count('author__recipes')
-        )
+        ).order_by('-id')
         page = self.paginate_queryset(subscriptions)
         serializer = SubscribeSerializer(
             page, many=True, context={'request': request})
         return self.get_paginated_response(serializer.data)
 
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated])
+    def suggestions(self, request):
+        suggestions = AuthorSuggestion.objects.filter(
+            user=request.user
+        ).exclude(
+            author__subscribers__user=request.user
+        ).select_related('author').order_by('-score', 'author_id')
+        page = self.paginate_queryset(suggestions)
+        serializer = UserSerializer(
+            [suggestion.author for suggestion in page],
+            many=True,
+            fields=self.requested_fields,
+            context={'request': request, 'subscribed_authors': set()},
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=True, methods=['put', 'delete'],
         permission_classes=[IsAuthenticated]
@@ -207,13 +394,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action == 'create':
             return [IsAuthenticated()]
-        return [IsAuthorOrReadOnly()]
+        if self.action in ('list', 'retrieve', 'update', 'partial_update',
+                           'destroy'):
+            return [IsAuthorOrReadOnly()]
+        return super().get_permissions()
 
     def get_queryset(self):
         user = self.request.user
-        queryset = Recipe.objects.select_related('author').prefetch_related(
-            'recipe_ingredients__ingredient'
-        )
+        queryset = Recipe.objects.select_related('author', 'document')
 
         if user.is_authenticated:
             favorite_subquery = Favorite.objects.filter(
@@ -238,6 +426,81 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    @cached_property
+    def requested_fields(self):
+        """Поля ответа из ?fields= и ?omit=; None — все поля."""
+        if self.request.method != 'GET':
+            return None
+        return get_requested_fields(self.request, RECIPE_FIELDS)
+
+    def list(self, request, *args, **kwargs):
+        if 'ids' in request.query_params:
+            return self.list_by_ids(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        response = self.get_recipe_rows_response(queryset)
+        if is_facets_requested(request):
+            response.data['facets'] = get_facets(request, queryset)
+        return response
+
+    def list_by_ids(self, request):
+        """Рецепты по списку ?ids=1,2,3 в порядке запроса.
+
+        Заменяет несколько запросов к отдельным рецептам: данные берутся
+        из документов рецептов одним запросом, остальные фильтры
+        и пагинация не применяются. Ненайденные id перечисляются
+        в missing.
+        """
+        serializer = RecipeIdsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['ids']
+        rows = self.get_ordered_recipe_rows(recipe_ids)
+        found = {row[0] for row in rows}
+        return Response({
+            'results': self.serialize_recipe_rows(rows),
+            'missing': [pk for pk in recipe_ids if pk not in found],
+        })
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.requested_fields is None:
+            return super().retrieve(request, *args, **kwargs)
+        rows = self.get_recipe_rows(self.filter_queryset(
+            self.get_queryset()).filter(pk=kwargs['pk']))
+        if not rows:
+            raise NotFound
+        return Response(self.serialize_recipe_rows(rows)[0])
+
+    def get_recipe_rows(self, queryset):
+        """Строки рецептов для serialize_recipe_rows() с учетом
+        запрошенных полей."""
+        row_fields = get_recipe_row_fields(self.requested_fields)
+        return fill_missing_documents(
+            list(queryset.values_list(*row_fields)), row_fields)
+
+    def serialize_recipe_rows(self, rows):
+        fields = self.requested_fields
+        subscribed_authors = set()
+        if fields is None or 'author' in fields:
+            subscribed_authors = get_subscribed_authors(
+                self.request.user, rows)
+        return serialize_recipe_rows(
+            rows, self.request, subscribed_authors, fields)
+
+    def get_recipe_rows_response(self, queryset):
+        row_fields = get_recipe_row_fields(self.requested_fields)
+        rows = fill_missing_documents(
+            self.paginate_queryset(queryset.values_list(*row_fields)),
+            row_fields,
+        )
+        return self.get_paginated_response(self.serialize_recipe_rows(rows))
+
+    def get_ordered_recipe_rows(self, recipe_ids):
+        """Строки рецептов в порядке recipe_ids, без удаленных."""
+        rows = {
+            row[0]: row for row in self.get_recipe_rows(
+                self.get_queryset().filter(pk__in=recipe_ids))
+        }
+        return [rows[pk] for pk in recipe_ids if pk in rows]
+
     def _handle_relation_action(self, request, pk,
                                 relation_model, create_serializer,
                                 error_message, return_count=False):
@@ -293,18 +556,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def favorites(self, request):
-        favorite_recipes = self.get_queryset().filter(is_favorited=True)
-
-        page = self.paginate_queryset(favorite_recipes)
-        if page is not None:
-            serializer = RecipeSerializer(
-                page, many=True, context={'request': request})
-            return self.get_paginated_response(serializer.data)
+        return self.get_recipe_rows_response(
+            self.get_queryset().filter(is_favorited=True))
 
-        serializer = RecipeSerializer(
-            favorite_recipes, many=True, context={'request': request}
-        )
-        return Response(serializer.data)
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        paginator = FeedPagination()
+        recipe_ids = paginator.paginate_feed(request, request.user)
+        return paginator.get_paginated_response(self.serialize_recipe_rows(
+            self.get_ordered_recipe_rows(recipe_ids)))
 
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
@@ -334,27 +595,24 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @staticmethod
     def generate_shopping_list(user):
-        ingredients = (
+        totals = dict(
             RecipeIngredient.objects.filter(
                 recipe__shopping_carts__user=user
             )
-            .values(
-                'ingredient__name',
-                'ingredient__measurement_unit'
-            )
+            .values('ingredient_id')
             .annotate(total_amount=Sum('amount'))
-            .order_by('ingredient__name')
+            .values_list('ingredient_id', 'total_amount')
+        )
+        ingredients = sorted(
+            (*ingredient, totals[pk])
+            for pk, ingredient in resolve_ingredients(totals).items()
         )
 
         content = BytesIO()
         content.write('Список покупок:\n'.encode('utf-8'))
 
-        for item in ingredients:
-            line = (
-                f'{item["ingredient__name"]} - '
-                f'{item["total_amount"]} '
-                f'{item["ingredient__measurement_unit"]}\n'
-            )
+        for name, measurement_unit, total_amount in ingredients:
+            line = f'{name} - {total_amount} {measurement_unit}\n'
             content.write(line.encode('utf-8'))
         content.seek(0)
         filename = DOWNLOAD_SHOPPING_CART_FILE_NAME
@@ -371,14 +629,131 @@ class RecipeViewSet(viewsets.ModelViewSet):
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
 
+    @action(detail=False, methods=['get'])
+    def random(self, request):
+        rows = self.get_ordered_recipe_rows(sample_recipe_ids(
+            self.paginator.get_page_size(request)))
+        return Response(self.serialize_recipe_rows(rows))
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        recipe = get_object_or_404(Recipe, pk=pk)
+        # С запасом: удаленные после сборки индекса рецепты отсеиваются.
+        rows = self.get_ordered_recipe_rows(
+            find_similar_recipes(recipe.pk, 2 * SIMILAR_RECIPES_LIMIT)
+        )[:SIMILAR_RECIPES_LIMIT]
+        return Response(self.serialize_recipe_rows(rows))
+
+    @action(detail=False, methods=['get'])
+    def pantry(self, request):
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ingredient_ids = serializer.validated_data['ingredients']
+        missing = serializer.validated_data['missing']
+        cache_key = 'pantry:{}:{}'.format(
+            hashlib.sha256(
+                ','.join(map(str, ingredient_ids)).encode()).hexdigest(),
+            missing,
+        )
+        recipe_ids = cache.get(cache_key)
+        if recipe_ids is None:
+            recipe_ids = find_pantry_recipes(ingredient_ids, missing)
+            cache.set(cache_key, recipe_ids, PANTRY_CACHE_TIMEOUT)
+        rows = self.get_ordered_recipe_rows(
+            self.paginate_queryset(recipe_ids))
+        return self.get_paginated_response(self.serialize_recipe_rows(rows))
+
     @action(methods=['get'], detail=True, url_path='get-link')
     def get_link(self, request, pk=None):
         recipe = self.get_object()
         return Response(
             {
-                'short-link': request.build_absolute_uri(
-                    reverse('api:recipes-detail', kwargs={'pk': recipe.pk})
-                )
+                'short-link': request.build_absolute_uri(reverse(
+                    'short-link', kwargs={'code': ensure_short_code(recipe)}
+                ))
             },
             status=HTTPStatus.OK,
         )
+
+
+class SyncView(APIView):
+    """Изменения для офлайн-клиентов после токена синхронизации.
+
+    Без since возвращает только текущий токен: клиент загружает данные
+    через обычные эндпоинты и дальше получает изменения. Изменения
+    рецептов приходят с данными, удаления — с deleted: true, избранное,
+    корзина и подписки — только с id рецепта или автора. После новой
+    подписки рецепты автора загружаются через /api/recipes/?author=.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        serializer = SyncSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        since = serializer.validated_data.get('since')
+        if since is None:
+            return Response({
+                'changes': [],
+                'next': str(get_current_token()),
+                'has_more': False,
+            })
+        if since < get_compacted_token():
+            return Response(
+                {'detail': 'Токен синхронизации устарел, '
+                           'загрузите данные заново.'},
+                status=status.HTTP_410_GONE,
+            )
+        entries, next_token, has_more = get_user_changes(
+            request.user, since, serializer.validated_data['limit'])
+        recipes = self.get_recipes([
+            object_id for kind, object_id, deleted in entries
+            if kind == ChangeLogEntry.Kind.RECIPE and not deleted
+        ])
+        changes = []
+        for kind, object_id, deleted in entries:
+            change = {'type': kind, 'id': object_id, 'deleted': deleted}
+            if kind == ChangeLogEntry.Kind.RECIPE and not deleted:
+                if object_id in recipes:
+                    change['data'] = recipes[object_id]
+                else:
+                    change['deleted'] = True
+            changes.append(change)
+        return Response({
+            'changes': changes,
+            'next': str(next_token),
+            'has_more': has_more,
+        })
+
+    def get_recipes(self, recipe_ids):
+        """id рецепта -> рецепт в том же виде, что и в /api/recipes/."""
+        if not recipe_ids:
+            return {}
+        view = RecipeViewSet(
+            request=self.request,
+            args=(),
+            kwargs={},
+            format_kwarg=None,
+            action='list',
+        )
+        rows = view.get_recipe_rows(
+            view.get_queryset().filter(pk__in=recipe_ids))
+        return {
+            row[0]: recipe
+            for row, recipe in zip(rows, view.serialize_recipe_rows(rows))
+        }
+
+
+class HealthView(APIView):
+    """Состояние автомата базы и счетчики ответов чтения текущего
+    процесса для мониторинга; к базе не обращается."""
+
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'database': database_breaker.get_status(),
+            'responses': dict(stale.counters),
+        })
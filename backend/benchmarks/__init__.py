@@ -0,0 +1,47 @@
+"""Замеры производительности.
+
+Запускаются из каталога backend, например
+``python -m benchmarks.render_recipes``. Данные создаются в отдельной
+тестовой базе с настройками тестов (tests.settings): по умолчанию это
+SQLite в памяти, с DB_ENGINE=postgresql и DATABASE_* — тестовая база
+рядом с указанной. Результаты последних прогонов — в README.md.
+"""
+import atexit
+import os
+import time
+
+
+def setup():
+    """Настраивает Django и создает тестовую базу на время прогона."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    atexit.register(
+        connection.creation.destroy_test_db, old_name, verbosity=0)
+
+
+def measure(func, repeat=5):
+    """Лучшее из repeat время выполнения func(), с."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def report(title, rows):
+    """Печатает таблицу: rows — пары (название, значение)."""
+    print(title)
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print(f'  {name:<{width}}  {value}')
@@ -0,0 +1,150 @@
+"""Пропускная способность чтений: асинхронные view и синхронные ViewSet.
+
+Запросы подаются в ASGI-приложение проекта (как в uvicorn) без сети:
+по concurrency одновременных запросов, всего --requests на каждый
+замер. Синхронные ViewSet подключены под префиксом /sync/
+(benchmarks.urls) и выполняются Django в потоках, как под uvicorn.
+С --latency каждому SQL-запросу добавляется задержка — время ответа
+сетевой базы, которой нет у SQLite.
+
+    python -m benchmarks.async_views [--latency 2] [--concurrency 1 20]
+"""
+import argparse
+import asyncio
+import time
+from urllib.parse import quote
+
+from benchmarks import report, setup
+
+
+def get_scope(path, token):
+    path, _, query = path.partition('?')
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': quote(query, safe='=&').encode(),
+        'root_path': '',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'authorization', f'Token {token}'.encode()),
+        ],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+
+
+async def request(application, scope):
+    received = False
+    disconnected = asyncio.Event()
+    status = None
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b''}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    disconnected.set()
+    return status
+
+
+async def run(application, scope, total, concurrency):
+    """Запросов в секунду при concurrency одновременных запросах."""
+    queue = iter(range(total))
+
+    async def client():
+        for _ in queue:
+            status = await request(application, scope)
+            assert status == 200, (scope['path'], status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=(1, 20))
+    parser.add_argument('--latency', type=float, default=0,
+                        help='задержка каждого SQL-запроса, мс')
+    options = parser.parse_args()
+    setup()
+
+    from django.conf import settings
+    from django.core.asgi import get_asgi_application
+    from django.db.backends.signals import connection_created
+    from rest_framework.authtoken.models import Token
+
+    from benchmarks.data import (
+        create_ingredients,
+        create_recipes,
+        create_users,
+    )
+    from recipes.documents import rebuild_recipe_documents
+    from recipes.models import Recipe
+
+    authors = create_users(20, prefix='author')
+    reader, = create_users(1, prefix='reader')
+    create_recipes(500, authors, create_ingredients(200), 8)
+    rebuild_recipe_documents(Recipe.objects.all())
+    token = Token.objects.create(user=reader).key
+    recipe_id = Recipe.objects.values_list('pk', flat=True).first()
+
+    if options.latency:
+        def delay(execute, sql, params, many, context):
+            time.sleep(options.latency / 1000)
+            return execute(sql, params, many, context)
+
+        def install_delay(connection, **kwargs):
+            connection.execute_wrappers.append(delay)
+
+        connection_created.connect(install_delay, weak=False)
+
+    settings.ROOT_URLCONF = 'benchmarks.urls'
+    application = get_asgi_application()
+    paths = (
+        '/api/recipes/?limit=10',
+        f'/api/recipes/{recipe_id}/',
+        '/api/ingredients/?search=ингредиент',
+    )
+
+    async def measure_all():
+        rows = []
+        for path in paths:
+            for concurrency in options.concurrency:
+                results = []
+                for prefix in ('', '/sync'):
+                    scope = get_scope(prefix + path, token)
+                    await run(application, scope, 20, concurrency)
+                    results.append(await run(
+                        application, scope, options.requests, concurrency))
+                rows.append((
+                    f'{path} ×{concurrency}',
+                    '{:,.0f} / {:,.0f} запросов/с'.format(*results),
+                ))
+        return rows
+
+    report(
+        'Асинхронный view / синхронный ViewSet, задержка SQL '
+        f'{options.latency:g} мс',
+        asyncio.run(measure_all()),
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Соединения с PostgreSQL под ASGI: новое на запрос, пул и постоянные.
+
+Запросы к синхронному ViewSet подаются в ASGI-приложение проекта, как
+в benchmarks.async_views; Django выполняет их в потоках. Для каждого
+режима — запросов в секунду при 1 и --concurrency одновременных
+запросах, число ответов с ошибкой и наибольшее число соединений
+с базой во время прогона:
+    новое на запрос   CONN_MAX_AGE = 0 (по умолчанию без пула);
+    пул psycopg       DATABASE_POOL=True;
+    постоянные        CONN_MAX_AGE = 60 — соединения остаются
+                      в каждом потоке, через который прошел запрос.
+Отдельно — время установки одного соединения. Нужен PostgreSQL:
+
+    DB_ENGINE=postgresql DATABASE_...=... python -m benchmarks.connections
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import time
+
+from benchmarks import measure, report, setup
+from benchmarks.async_views import get_scope, request
+
+PATH = '/sync/api/ingredients/?search=ингредиент'
+
+
+async def run(application, scope, total, concurrency):
+    """Запросов в секунду при concurrency одновременных запросах
+    и число ответов с ошибкой."""
+    queue = iter(range(total))
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        for _ in queue:
+            if await request(application, scope) != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--pool-size', type=int, default=10)
+    options = parser.parse_args()
+    setup()
+
+    from django.conf import settings
+    from django.core.asgi import get_asgi_application
+    from django.db import connection, connections
+    from rest_framework.authtoken.models import Token
+
+    from benchmarks.data import create_ingredients, create_users
+
+    if connection.vendor != 'postgresql':
+        sys.exit('Нужен PostgreSQL (DB_ENGINE=postgresql)')
+
+    reader, = create_users(1, prefix='reader')
+    create_ingredients(200)
+    token = Token.objects.create(user=reader).key
+    database = connections.settings['default']
+    connection.close()
+
+    # Отдельное соединение заранее: при нехватке соединений оно
+    # не откроется.
+    monitor = connection.get_new_connection(
+        connection.get_connection_params())
+    monitor.autocommit = True
+
+    def watch_connections(stop, peak):
+        """Наибольшее число соединений с тестовой базой, кроме
+        соединения монитора, пока не выставлен stop."""
+        while not stop.wait(0.005):
+            count, = monitor.execute(
+                'SELECT count(*) FROM pg_stat_activity '
+                'WHERE datname = current_database() '
+                'AND pid <> pg_backend_pid()').fetchone()
+            peak[0] = max(peak[0], count)
+
+    def connect():
+        connection.connect()
+        connection.close()
+
+    connect_time = measure(connect, 50)
+
+    settings.ROOT_URLCONF = 'benchmarks.urls'
+    application = get_asgi_application()
+    scope = get_scope(PATH, token)
+    modes = (
+        ('новое на запрос', {'CONN_MAX_AGE': 0}),
+        ('пул psycopg', {'CONN_MAX_AGE': 0, 'OPTIONS': {
+            **database['OPTIONS'],
+            'pool': {'min_size': 2, 'max_size': options.pool_size},
+        }}),
+        # Последним: соединения потоков закрываются только на сервере.
+        ('постоянные', {'CONN_MAX_AGE': 60}),
+    )
+    rows = [('установка соединения', f'{connect_time * 1000:.2f} мс')]
+    original = {key: database[key] for key in ('CONN_MAX_AGE', 'OPTIONS')}
+    for name, overrides in modes:
+        database.update(overrides)
+        results = []
+        errors = 0
+        stop, peak = threading.Event(), [0]
+        watcher = threading.Thread(
+            target=watch_connections, args=(stop, peak))
+        watcher.start()
+        for concurrency in (1, options.concurrency):
+            asyncio.run(run(application, scope, 20, concurrency))
+            rate, failed = asyncio.run(run(
+                application, scope, options.requests, concurrency))
+            results.append(rate)
+            errors += failed
+        stop.set()
+        watcher.join()
+        rows.append((name, '{:,.0f} / {:,.0f} запросов/с, ошибок: {}, '
+                           'соединений до {}'.format(
+                               *results, errors, peak[0])))
+        if 'pool' in database['OPTIONS']:
+            connection.close_pool()
+        database.update(original)
+    # Иначе тестовую базу не удалить.
+    monitor.execute(
+        'SELECT pg_terminate_backend(pid) FROM pg_stat_activity '
+        'WHERE datname = current_database() AND pid <> pg_backend_pid()')
+    monitor.close()
+    report(f'×1 / ×{options.concurrency}, {PATH}', rows)
+
+
+if __name__ == '__main__':
+    main()
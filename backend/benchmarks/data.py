@@ -0,0 +1,67 @@
+"""Синтетические данные для замеров."""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import User
+
+BATCH_SIZE = 5000
+
+
+def create_users(count, prefix='user'):
+    return User.objects.bulk_create(
+        (
+            User(
+                email=f'{prefix}{number}@example.com',
+                username=f'{prefix}{number}',
+                first_name='Имя',
+                last_name='Фамилия',
+                avatar=f'users/аватар {number}.png',
+            )
+            for number in range(count)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def create_ingredients(count):
+    return Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(count)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def create_recipes(count, authors, ingredients=(), per_recipe=0):
+    """count рецептов авторов authors с per_recipe ингредиентами
+    из ingredients; рецепты создаются пачками, без документов."""
+    now = timezone.now()
+    created = 0
+    while created < count:
+        batch = Recipe.objects.bulk_create(
+            Recipe(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}',
+                image=f'recipes/images/фото {number}.png',
+                text='Описание рецепта. ' * 10,
+                cooking_time=number % 120 + 1,
+                pub_date=now - timedelta(seconds=number),
+            )
+            for number in range(created, min(count, created + BATCH_SIZE))
+        )
+        if per_recipe:
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredients[
+                        (recipe.pk * 7 + offset) % len(ingredients)],
+                    amount=offset + 1,
+                )
+                for recipe in batch
+                for offset in range(per_recipe)
+            )
+        created += len(batch)
+    return created
@@ -0,0 +1,107 @@
+"""Запросы к индексу ингредиентов на миллионе рецептов.
+
+Индекс собирается write_index() из синтетических пар (рецепт,
+ингредиент) во временный каталог: популярность ингредиентов убывает
+по закону Ципфа, как у соли и муки против редких специй. Замеряется
+то, что find_similar_recipes() и find_pantry_recipes() делают
+поверх индекса: подсчет совпадений, ранжирование и выбор лучших.
+Запросы к базе (ингредиенты рецепта, измененные рецепты, строки
+ответа) от размера каталога почти не зависят и не замеряются.
+
+    python -m benchmarks.ingredient_index [--recipes 1000000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import report, setup
+
+
+def create_pairs(recipes, ingredients, per_recipe, rng):
+    """Пары (id рецепта, id ингредиента) без повторов в рецепте."""
+    weights = 1 / np.arange(1, ingredients + 1)
+    ingredient_ids = rng.choice(
+        np.arange(1, ingredients + 1), size=recipes * per_recipe,
+        p=weights / weights.sum())
+    recipe_ids = np.repeat(np.arange(1, recipes + 1), per_recipe)
+    keys = np.unique(recipe_ids * (ingredients + 1) + ingredient_ids)
+    return np.column_stack(np.divmod(keys, ingredients + 1))
+
+
+def percentiles(timings):
+    """Медиана, 95-й перцентиль и максимум времени запроса."""
+    p50, p95, p100 = np.percentile(timings, (50, 95, 100)) * 1000
+    return f'p50 {p50:7.2f} мс  p95 {p95:7.2f} мс  max {p100:7.2f} мс'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=1_000_000)
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--per-recipe', type=int, default=8)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=6)
+    parser.add_argument('--max-missing', type=int, default=2)
+    options = parser.parse_args()
+    setup()
+
+    from django.utils import timezone
+
+    from recipes.ingredient_index import (
+        IngredientIndex,
+        rank_pantry_recipes,
+        rank_similar_recipes,
+        write_index,
+    )
+
+    rng = np.random.default_rng(0)
+    pairs = create_pairs(
+        options.recipes, options.ingredients, options.per_recipe, rng)
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'ingredients.index'
+        started = time.perf_counter()
+        write_index(pairs, timezone.now(), path)
+        build_time = time.perf_counter() - started
+        index = IngredientIndex(path)
+
+        similar, pantry = [], []
+        for recipe_id in rng.integers(
+                1, options.recipes + 1, size=options.queries):
+            start, end = np.searchsorted(
+                pairs[:, 0], [recipe_id, recipe_id + 1])
+            ingredient_ids = set(pairs[start:end, 1].tolist())
+
+            started = time.perf_counter()
+            rank_similar_recipes(
+                recipe_id, ingredient_ids, index.match(ingredient_ids),
+                options.limit)
+            similar.append(time.perf_counter() - started)
+
+            # Кладовая: ингредиенты рецепта и столько же случайных.
+            ingredient_ids |= set(rng.integers(
+                1, options.ingredients + 1, size=len(ingredient_ids)
+            ).tolist())
+            started = time.perf_counter()
+            rank_pantry_recipes(
+                index.match(ingredient_ids, max_size=options.max_missing),
+                options.max_missing)
+            pantry.append(time.perf_counter() - started)
+
+        report(
+            f'Рецептов: {len(index):,}, пар: {len(pairs):,}, '
+            f'запросов: {options.queries}',
+            [
+                ('сборка индекса', f'{build_time:.2f} с'),
+                ('размер файла',
+                 f'{path.stat().st_size / 2 ** 20:.1f} МиБ'),
+                ('похожие рецепты', percentiles(similar)),
+                ('из того, что есть', percentiles(pantry)),
+            ],
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Случайные рецепты: выборка по диапазону id против ORDER BY RANDOM().
+
+В таблице из --recipes рецептов удаляется каждый --gap-й, чтобы в id
+были пропуски. Сравниваются sample_recipe_ids() (поиск по первичному
+ключу), MIN и MAX одним запросом (так было до разделения на два
+поиска по индексу) и order_by('?'); отдельно — страница
+/api/recipes/random/ целиком.
+
+    python -m benchmarks.random_recipes [--recipes 1500000] [--gap 3]
+"""
+import argparse
+
+from benchmarks import measure, report, setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=1_500_000)
+    parser.add_argument('--gap', type=int, default=3,
+                        help='удаляется каждый gap-й рецепт')
+    parser.add_argument('--limit', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+    setup()
+
+    from django.db import connection
+    from django.db.models import Max, Min
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    from benchmarks.data import create_recipes, create_users
+    from recipes.models import Recipe
+    from recipes.sampling import sample_recipe_ids
+
+    create_recipes(options.recipes, create_users(50, prefix='author'))
+    # Без сборщика связанных объектов: удаление миллиона моделей
+    # через ORM занимает больше, чем сам замер.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {Recipe._meta.db_table} '
+            f'WHERE {Recipe._meta.pk.column} %% %s = 0', [options.gap])
+    count = Recipe.objects.count()
+    recipes = Recipe.objects.values_list('pk', flat=True)
+    limit = options.limit
+
+    def count_queries(func):
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context.captured_queries)
+
+    def min_max():
+        return recipes.aggregate(low=Min('pk'), high=Max('pk'))
+
+    def order_by_random():
+        return list(recipes.order_by('?')[:limit])
+
+    client = Client()
+    path = f'/api/recipes/random/?limit={limit}'
+    assert client.get(path).status_code == 200
+
+    rows = []
+    for name, func in (
+        ('sample_recipe_ids()', lambda: sample_recipe_ids(limit)),
+        ('MIN и MAX одним запросом', min_max),
+        ("order_by('?')", order_by_random),
+        (path, lambda: client.get(path)),
+    ):
+        seconds = measure(func, options.repeat)
+        rows.append((name, '{:9.2f} мс  запросов: {}'.format(
+            seconds * 1000, count_queries(func))))
+    report(
+        f'Рецептов: {count:,} ({connection.vendor}), выборка {limit}',
+        rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Скорость сериализации списка рецептов: быстрый путь и DRF.
+
+Сравнивается вывод рецептов строками values_list() и документами
+(api.fast_serializers) с эталонными сериализаторами DRF
+(tests.serializers) — отдельно сериализация с рендерингом в JSON и вместе
+с запросами к базе, а также страница /api/recipes/?limit=50 целиком.
+
+    python -m benchmarks.render_recipes [--recipes 5000]
+"""
+import argparse
+
+from benchmarks import measure, report, setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=5000)
+    parser.add_argument('--ingredients', type=int, default=8,
+                        help='ингредиентов в рецепте')
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args()
+    setup()
+
+    from django.test import Client, RequestFactory
+    from rest_framework.authtoken.models import Token
+    from rest_framework.request import Request
+
+    from api.fast_serializers import (
+        RECIPE_ROW_FIELDS,
+        fill_missing_documents,
+        get_subscribed_authors,
+        serialize_recipe_rows,
+    )
+    from api.renderers import ORJSONRenderer
+    from api.views import RecipeViewSet
+    from benchmarks.data import (
+        create_ingredients,
+        create_recipes,
+        create_users,
+    )
+    from recipes.documents import rebuild_recipe_documents
+    from recipes.models import Favorite, Recipe, ShoppingCart
+    from tests.serializers import (
+        ReferenceRecipeSerializer,
+        ReferenceRecipeViewSet,
+        prefetch_ingredients,
+    )
+    from users.models import Subscribe
+
+    authors = create_users(50, prefix='author')
+    reader, = create_users(1, prefix='reader')
+    count = create_recipes(
+        options.recipes, authors, create_ingredients(200),
+        options.ingredients)
+    rebuild_recipe_documents(Recipe.objects.all())
+    recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+    Favorite.objects.bulk_create(
+        Favorite(user=reader, recipe_id=pk) for pk in recipe_ids[::3])
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=reader, recipe_id=pk) for pk in recipe_ids[::5])
+    Subscribe.objects.bulk_create(
+        Subscribe(user=reader, author=author) for author in authors[::2])
+    token = Token.objects.create(user=reader)
+
+    request = Request(RequestFactory().get('/api/recipes/'))
+    request.user = reader
+    view = RecipeViewSet(
+        request=request, format_kwarg=None, action='list', kwargs={})
+    queryset = view.get_queryset()
+    renderer = ORJSONRenderer()
+
+    def fetch_rows():
+        return fill_missing_documents(
+            list(queryset.values_list(*RECIPE_ROW_FIELDS)))
+
+    def render_rows(rows):
+        return renderer.render(serialize_recipe_rows(
+            rows, request, get_subscribed_authors(reader, rows)))
+
+    def fetch_recipes():
+        return list(prefetch_ingredients(queryset))
+
+    def render_recipes(recipes):
+        subscribed_authors = set(Subscribe.objects.filter(
+            user=reader).values_list('author_id', flat=True))
+        return renderer.render(ReferenceRecipeSerializer(
+            recipes, many=True, context={
+                'request': request,
+                'subscribed_authors': subscribed_authors,
+            }).data)
+
+    rows = fetch_rows()
+    recipes = fetch_recipes()
+    assert render_rows(rows) == render_recipes(recipes)
+
+    timings = {
+        'быстрый путь: сериализация': measure(
+            lambda: render_rows(rows), options.repeat),
+        'DRF: сериализация': measure(
+            lambda: render_recipes(recipes), options.repeat),
+        'быстрый путь: с запросами': measure(
+            lambda: render_rows(fetch_rows()), options.repeat),
+        'DRF: с запросами': measure(
+            lambda: render_recipes(fetch_recipes()), options.repeat),
+    }
+    report(
+        f'Рецептов: {count}, ингредиентов в рецепте: {options.ingredients}',
+        [(name, f'{count / seconds:,.0f} строк/с')
+         for name, seconds in timings.items()],
+    )
+
+    pages = 20
+    path = '/api/recipes/?limit=50'
+    client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+    factory_request = RequestFactory().get(
+        path, HTTP_AUTHORIZATION=f'Token {token.key}')
+    reference_view = ReferenceRecipeViewSet.as_view({'get': 'list'})
+
+    def get_reference_page():
+        reference_view(factory_request).render()
+
+    report(f'Страница {path}', [
+        ('быстрый путь (асинхронный view)', '{:.2f} мс'.format(measure(
+            lambda: [client.get(path) for _ in range(pages)],
+            options.repeat) / pages * 1000)),
+        ('DRF', '{:.2f} мс'.format(measure(
+            lambda: [get_reference_page() for _ in range(pages)],
+            options.repeat) / pages * 1000)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
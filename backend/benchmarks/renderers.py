@@ -0,0 +1,81 @@
+"""Скорость кодирования и размер ответов: JSONRenderer DRF, orjson
+и MessagePack.
+
+Кодируются реальные ответы API — страницы списка рецептов и список
+ингредиентов, — собранные из тестовой базы. Размер приводится также
+после gzip (как отдает сжимающий прокси).
+
+    python -m benchmarks.renderers [--repeat 20]
+"""
+import argparse
+import gzip
+
+from benchmarks import measure, report, setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+    setup()
+
+    from django.test import RequestFactory
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+
+    from api.fast_serializers import (
+        fill_missing_documents,
+        serialize_recipe_rows,
+    )
+    from api.renderers import MessagePackRenderer, ORJSONRenderer
+    from api.serializers import IngredientSerializer
+    from benchmarks.data import (
+        create_ingredients,
+        create_recipes,
+        create_users,
+    )
+    from recipes.models import Ingredient, Recipe
+
+    authors = create_users(20, prefix='author')
+    create_recipes(100, authors, create_ingredients(2000), 8)
+    request = Request(RequestFactory().get('/api/recipes/'))
+    # Строки в формате RECIPE_ROW_FIELDS, документы собираются заново.
+    recipe_rows = fill_missing_documents([
+        (pk, author_id, None, False, False)
+        for pk, author_id in Recipe.objects.values_list('pk', 'author_id')
+    ])
+    recipes = serialize_recipe_rows(recipe_rows, request, set())
+    payloads = {
+        'рецепты, страница 6': {
+            'count': len(recipes), 'next': None, 'previous': None,
+            'results': recipes[:6]},
+        'рецепты, страница 100': {
+            'count': len(recipes), 'next': None, 'previous': None,
+            'results': recipes},
+        'ингредиенты, 2000': IngredientSerializer(
+            Ingredient.objects.all(), many=True).data,
+    }
+    renderers = {
+        'JSONRenderer': JSONRenderer(),
+        'orjson': ORJSONRenderer(),
+        'MessagePack': MessagePackRenderer(),
+    }
+    assert all(
+        renderers['JSONRenderer'].render(payload)
+        == renderers['orjson'].render(payload)
+        for payload in payloads.values()
+    )
+
+    for title, payload in payloads.items():
+        rows = []
+        for name, renderer in renderers.items():
+            content = renderer.render(payload)
+            seconds = measure(lambda: renderer.render(payload), options.repeat)
+            rows.append((name, '{:8.3f} мс  {:>7,} Б  gzip {:>6,} Б'.format(
+                seconds * 1000, len(content),
+                len(gzip.compress(content)))))
+        report(title, rows)
+
+
+if __name__ == '__main__':
+    main()
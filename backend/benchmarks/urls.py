@@ -0,0 +1,16 @@
+"""Маршруты проекта и синхронные ViewSet под префиксом sync/ для
+сравнения с асинхронными view (benchmarks.async_views)."""
+from django.urls import include, path
+
+from api.async_views import (
+    IngredientListView,
+    RecipeDetailView,
+    RecipeListView,
+)
+
+urlpatterns = [
+    path('sync/api/recipes/', RecipeListView.get_sync_view()),
+    path('sync/api/recipes/<int:pk>/', RecipeDetailView.get_sync_view()),
+    path('sync/api/ingredients/', IngredientListView.get_sync_view()),
+    path('', include('foodgram.urls')),
+]
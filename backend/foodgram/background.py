@@ -0,0 +1,25 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
+
+from foodgram.constants import BACKGROUND_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=BACKGROUND_MAX_WORKERS, thread_name_prefix='background')
+
+
+def run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Ошибка фоновой задачи %s', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def run_in_background(func, *args):
+    """Выполняет func в фоновом потоке после фиксации транзакции."""
+    transaction.on_commit(lambda: executor.submit(run_task, func, *args))
@@ -27,3 +27,132 @@ PAGINATION_MAX_PAGE_SIZE = 50
 """Максимальное разрешенное количество объектов на странице."""
 DOWNLOAD_SHOPPING_CART_FILE_NAME = 'shopping_list.txt'
 """Имя файла для загрузки списка покупок."""
+
+FEED_FANOUT_MAX_SUBSCRIBERS = 10000
+"""Порог подписчиков, выше которого рецепты автора не раскладываются
+по лентам, а подмешиваются в ленту при чтении."""
+FEED_FANOUT_BATCH_SIZE = 1000
+"""Размер пачки записей ленты при раскладке рецепта."""
+FEED_BACKFILL_LIMIT = 100
+"""Сколько последних рецептов автора добавляется в ленту при подписке."""
+FEED_CELEBRITIES_CACHE_TIMEOUT = 300
+"""Время кеширования списка авторов с большим числом подписчиков (с)."""
+BACKGROUND_MAX_WORKERS = 4
+"""Количество потоков для фоновых задач процесса."""
+
+INGREDIENT_INDEX_MAX_CHANGES = 1000
+"""Число рецептов, измененных после сборки индекса ингредиентов,
+при котором индекс пересобирается."""
+INGREDIENT_INDEX_CHANGES_MARGIN = 60
+"""Запас (с) при выборке рецептов, измененных после сборки индекса:
+покрывает транзакции, зафиксированные уже во время сборки."""
+INGREDIENT_INDEX_REBUILD_TIMEOUT = 600
+"""Время (с), в течение которого индекс не пересобирается повторно."""
+SIMILAR_RECIPES_LIMIT = 10
+"""Количество похожих рецептов в ответе."""
+PANTRY_MAX_INGREDIENTS = 100
+"""Максимальное количество ингредиентов в запросе подбора рецептов."""
+PANTRY_MAX_MISSING = 10
+"""Максимальное число недостающих ингредиентов при подборе рецептов."""
+PANTRY_CACHE_TIMEOUT = 300
+"""Время кеширования результатов подбора рецептов по ингредиентам (с)."""
+RECIPE_IDS_MAX_COUNT = 100
+"""Максимальное количество id в запросе рецептов по списку (?ids=)."""
+TRENDING_HALF_LIFE = 24 * 60 * 60
+"""Период полураспада вклада добавления в популярность рецепта (с)."""
+TRENDING_FAVORITE_WEIGHT = 1
+"""Вес добавления рецепта в избранное."""
+TRENDING_SHOPPING_CART_WEIGHT = 2
+"""Вес добавления рецепта в корзину."""
+TRENDING_BATCH_SIZE = 5000
+"""Количество событий, обрабатываемых за одну транзакцию."""
+SHORT_LINK_LENGTH = 6
+"""Длина короткого кода ссылки на рецепт."""
+SHORT_LINK_MAX_LENGTH = 16
+"""Максимальная длина короткого кода ссылки на рецепт."""
+SHORT_LINK_LRU_SIZE = 10000
+"""Количество коротких ссылок в кеше процесса."""
+SHORT_LINK_MAX_AGE = 24 * 60 * 60
+"""Время кеширования перенаправления по короткой ссылке клиентом (с)."""
+FACET_COOKING_TIME_BOUNDS = (15, 30, 60)
+"""Верхние границы корзин времени приготовления в фасетах (мин)."""
+FACET_AUTHORS_LIMIT = 20
+"""Количество авторов с наибольшим числом рецептов в фасетах."""
+FACETS_CACHE_TIMEOUT = 300
+"""Время кеширования фасетов для анонимных пользователей (с)."""
+BOOTSTRAP_CACHE_TIMEOUT = 300
+"""Время кеширования разделов ответа /api/bootstrap/ (с)."""
+RANDOM_SAMPLE_OVERSAMPLING = 4
+"""Во сколько раз больше случайных id, чем нужно рецептов, запрашивается
+за одну попытку: покрывает пропуски в последовательности id."""
+RANDOM_SAMPLE_ATTEMPTS = 3
+"""Количество попыток добрать случайные рецепты по случайным id."""
+AUTHOR_SUGGESTIONS_LIMIT = 50
+"""Количество рекомендуемых авторов, сохраняемых для пользователя."""
+AUTHOR_SUGGESTIONS_BATCH_SIZE = 1000
+"""Количество пользователей, рекомендации которых сохраняются за раз."""
+PUBSUB_QUEUE_SIZE = 16
+"""Размер очереди подписчика: при переполнении вытесняются старые
+сообщения."""
+PUBSUB_RECONNECT_DELAY = 5
+"""Пауза перед повторным подключением LISTEN к PostgreSQL (с)."""
+EVENTS_HEARTBEAT_INTERVAL = 15
+"""Интервал комментариев-пингов в потоке событий без событий (с)."""
+EVENTS_RETRY_INTERVAL = 5000
+"""Задержка переподключения клиента к потоку событий (мс)."""
+EVENTS_MAX_CONNECTIONS_PER_USER = 5
+"""Максимальное число открытых потоков событий пользователя в одном
+процессе."""
+CHANGE_LOG_LOCK_ID = 4601
+"""Ключ advisory-блокировки PostgreSQL, под которой записям журнала
+изменений назначаются позиции."""
+CHANGE_LOG_RETENTION_DAYS = 30
+"""Сколько дней хранятся записи журнала изменений."""
+CHANGE_LOG_BATCH_SIZE = 1000
+"""Количество записей журнала изменений, создаваемых за раз."""
+SYNC_PAGE_SIZE = 500
+"""Количество изменений в ответе /api/sync/ по умолчанию."""
+SYNC_MAX_PAGE_SIZE = 2000
+"""Максимальное количество изменений в ответе /api/sync/."""
+INVALIDATION_SLOTS = 4096
+"""Количество счетчиков поколений в шине инвалидации."""
+AUTH_TOKEN_CACHE_SIZE = 10000
+"""Количество пользователей по токенам в кеше процесса."""
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+"""Количество ошибок базы подряд, после которого чтения из нее
+приостанавливаются."""
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+"""Через сколько секунд после размыкания автомата выполняется пробное
+чтение из базы."""
+STALE_RESPONSE_TIMEOUT = 24 * 60 * 60
+"""Сколько секунд хранится последний успешный ответ чтения."""
+STALE_RESPONSE_REFRESH_INTERVAL = 10
+"""Как часто процесс перезаписывает сохраненный ответ чтения (с)."""
+STALE_RESPONSE_LRU_SIZE = 10000
+"""Количество ключей ответов, время сохранения которых помнит
+процесс."""
+TASKS_WORKER_PROCESSES = 2
+"""Количество процессов обработчиков очереди задач по умолчанию."""
+TASKS_WORKER_THREADS = 4
+"""Количество потоков в процессе обработчиков очереди задач."""
+TASKS_POLL_INTERVAL = 1
+"""Период опроса очереди задач, когда она пуста (с)."""
+TASKS_LOCK_TIMEOUT = 600
+"""Через сколько секунд задача, обработчик которой не сообщил
+результат, выполняется снова."""
+TASKS_MAX_ATTEMPTS = 5
+"""Количество попыток выполнения задачи по умолчанию."""
+TASKS_RETRY_BASE_DELAY = 10
+"""Задержка перед первым повтором задачи (с); дальше она удваивается."""
+TASKS_RETRY_MAX_DELAY = 60 * 60
+"""Максимальная задержка перед повтором задачи (с)."""
+TASKS_CLAIM_CANDIDATES = 10
+"""Сколько готовых задач перебирает обработчик при захвате без
+SKIP LOCKED (SQLite)."""
+TASKS_RETENTION_DAYS = 7
+"""Сколько дней хранятся завершенные задачи."""
+FILE_STAGING_DIR = '.staging'
+"""Каталог хранилища для файлов, записанных до фиксации транзакции."""
+STAGED_FILE_TIMEOUT = 60 * 60
+"""Через сколько секунд удаляется временный файл, не перенесенный
+на место."""
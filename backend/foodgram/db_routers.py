@@ -0,0 +1,89 @@
+import itertools
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+use_primary = ContextVar('use_primary', default=False)
+"""Флаг текущего запроса: все чтения идут в основную базу."""
+
+LOCAL_CACHE_BACKENDS = frozenset((
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+))
+"""Кеши, не общие для процессов: закрепление клиента за основной базой
+после записи в них не видят другие воркеры."""
+
+
+class ReplicaPool:
+    """Реплики с выбором по кругу и исключением отстающих."""
+
+    def __init__(self, aliases):
+        self.aliases = tuple(aliases)
+        self._counter = itertools.count()
+        self._lag_checked = {}
+
+    def is_available(self, alias):
+        checked_at, available = self._lag_checked.get(alias, (None, True))
+        now = time.monotonic()
+        if (checked_at is None
+                or now - checked_at > settings.REPLICA_LAG_CHECK_INTERVAL):
+            available = self.get_lag(alias) <= settings.REPLICA_MAX_LAG
+            self._lag_checked[alias] = (now, available)
+        return available
+
+    @staticmethod
+    def get_lag(alias):
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT CASE WHEN pg_is_in_recovery() THEN COALESCE('
+                    'EXTRACT(EPOCH FROM now() - '
+                    'pg_last_xact_replay_timestamp()), 0) ELSE 0 END'
+                )
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            return float('inf')
+
+    def choose(self):
+        for _ in range(len(self.aliases)):
+            alias = self.aliases[next(self._counter) % len(self.aliases)]
+            if self.is_available(alias):
+                return alias
+        return None
+
+
+class PrimaryReplicaRouter:
+    """Чтения уходят на реплики, записи — в основную базу.
+
+    Основная база используется и для чтений, если запрос изменяющий,
+    пользователь недавно что-то записывал (см.
+    foodgram.middleware.replica_routing_middleware) или чтение выполняется
+    внутри транзакции.
+    """
+
+    def __init__(self):
+        if (settings.DATABASE_REPLICAS and settings.CACHES['default'][
+                'BACKEND'] in LOCAL_CACHE_BACKENDS):
+            raise ImproperlyConfigured(
+                'Для реплик (DATABASE_REPLICA_HOSTS) нужен общий кеш '
+                '(REDIS_URL): иначе чтения после записи в другом воркере '
+                'могут уйти на отстающую реплику.')
+        self.replicas = ReplicaPool(settings.DATABASE_REPLICAS)
+
+    def db_for_read(self, model, **hints):
+        if (not self.replicas.aliases or use_primary.get()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return self.replicas.choose() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
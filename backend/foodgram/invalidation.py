@@ -0,0 +1,220 @@
+"""Шина инвалидации кешей в памяти процессов.
+
+Кеш в памяти процесса (LocalCache, справочник и индекс ингредиентов)
+хранит вместе с данными поколение своего имени — пространства имен или
+ключа. Изменение данных после фиксации транзакции увеличивает
+поколение во всех процессах, и кеш видит это одним чтением счетчика.
+
+Счетчики хранит транспорт INVALIDATION_TRANSPORT:
+
+* file — общий файл, отображенный в память: для воркеров одного хоста;
+* postgres — копия счетчиков в каждом процессе, изменения рассылаются
+  через LISTEN/NOTIFY: для нескольких хостов;
+* local — счетчики только текущего процесса: для разработки и команд.
+
+Имена отображаются на INVALIDATION_SLOTS счетчиков по хешу; совпадение
+хешей приводит лишь к лишней инвалидации.
+"""
+import fcntl
+import logging
+import mmap
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from foodgram.constants import INVALIDATION_SLOTS, PUBSUB_RECONNECT_DELAY
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTransport:
+    def __init__(self, slots):
+        self._counters = [0] * slots
+        self._lock = threading.Lock()
+
+    def generation(self, slot):
+        return self._counters[slot]
+
+    def publish(self, slot):
+        with self._lock:
+            self._counters[slot] += 1
+
+
+class FileTransport:
+    """Счетчики int64 в файле, который все процессы хоста отображают
+    в память; увеличение — под блокировкой файла."""
+
+    def __init__(self, slots, path=None):
+        path = Path(path or settings.INVALIDATION_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * 8
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._mmap = mmap.mmap(self._fd, size)
+        self._counters = memoryview(self._mmap).cast('q')
+
+    def generation(self, slot):
+        return self._counters[slot]
+
+    def publish(self, slot):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._counters[slot] += 1
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class PostgresTransport(LocalTransport):
+    """Счетчики процесса, которые увеличивает поток, слушающий
+    NOTIFY_CHANNEL.
+
+    Пока поток не подключен, поколение неизвестно (None) и кеши
+    не используются. После переподключения увеличивается эпоха,
+    общая для всех счетчиков: уведомления за время разрыва могли
+    потеряться.
+    """
+
+    NOTIFY_CHANNEL = 'foodgram_invalidation'
+
+    def __init__(self, slots):
+        super().__init__(slots)
+        self._epoch = 0
+        self._listening = False
+        self._thread = None
+
+    def generation(self, slot):
+        if not self._listening:
+            self.start_listener()
+            return None
+        return self._epoch + self._counters[slot]
+
+    def publish(self, slot):
+        # Свой процесс узнает об изменении сразу, не дожидаясь NOTIFY.
+        super().publish(slot)
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)', [self.NOTIFY_CHANNEL, str(slot)])
+
+    def start_listener(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.listen, name='invalidation', daemon=True)
+                self._thread.start()
+
+    def listen(self):
+        import psycopg
+
+        params = connections['default'].get_connection_params()
+        params.pop('cursor_factory', None)
+        while True:
+            try:
+                with psycopg.connect(autocommit=True, **params) as connection:
+                    connection.execute(f'LISTEN {self.NOTIFY_CHANNEL}')
+                    with self._lock:
+                        self._epoch += 1
+                    self._listening = True
+                    for notify in connection.notifies():
+                        super().publish(int(notify.payload))
+            except Exception:
+                logger.exception('Ошибка соединения LISTEN %s',
+                                 self.NOTIFY_CHANNEL)
+            finally:
+                self._listening = False
+            time.sleep(PUBSUB_RECONNECT_DELAY)
+
+
+TRANSPORTS = {
+    'local': LocalTransport,
+    'file': FileTransport,
+    'postgres': PostgresTransport,
+}
+
+_transport = None
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        _transport = TRANSPORTS[settings.INVALIDATION_TRANSPORT](
+            INVALIDATION_SLOTS)
+    return _transport
+
+
+def get_slot(name):
+    return zlib.crc32(name.encode()) % INVALIDATION_SLOTS
+
+
+def get_generation(name):
+    """Текущее поколение имени; None — поколение неизвестно."""
+    return get_transport().generation(get_slot(name))
+
+
+def invalidate(name):
+    """Увеличивает поколение имени во всех процессах после фиксации
+    транзакции (вне транзакции — сразу)."""
+    transaction.on_commit(partial(get_transport().publish, get_slot(name)))
+
+
+class LocalCache:
+    """LRU-кеш в памяти процесса, сбрасываемый через шину.
+
+    Поколение берется до чтения данных из источника и сохраняется
+    вместе с ними: если данные изменятся между чтением и записью
+    в кеш, запись сразу окажется устаревшей.
+    """
+
+    def __init__(self, namespace, maxsize):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_key_name(self, key):
+        return f'{self.namespace}:{key}'
+
+    def get_generation(self, key):
+        namespace_generation = get_generation(self.namespace)
+        key_generation = get_generation(self.get_key_name(key))
+        if namespace_generation is None or key_generation is None:
+            return None
+        return namespace_generation, key_generation
+
+    def get(self, key, generation, default=None):
+        if generation is None:
+            return default
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[1] != generation:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, generation):
+        if generation is None:
+            return
+        with self._lock:
+            self._entries[key] = (value, generation)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Сбрасывает ключ или, без key, весь кеш во всех процессах."""
+        invalidate(
+            self.namespace if key is None else self.get_key_name(key))
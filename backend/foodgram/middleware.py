@@ -0,0 +1,65 @@
+import hashlib
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.db_routers import use_primary
+
+
+def get_primary_pin_key(request):
+    credentials = (request.headers.get('Authorization')
+                   or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    if not credentials:
+        return None
+    return 'primary-pin:' + hashlib.sha256(credentials.encode()).hexdigest()
+
+
+def is_successful_write(request, response):
+    return (request.method not in SAFE_METHODS
+            and response.status_code < 400)
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """Закрепляет чтения за основной базой после записи.
+
+    Изменяющие запросы целиком работают с основной базой. После успешной
+    записи клиент еще PRIMARY_STICKY_SECONDS читает из основной базы,
+    чтобы не увидеть отставшую реплику (например, is_favorited).
+    Без реплик все чтения и так идут в основную базу, и middleware
+    не добавляется, чтобы не обращаться к кешу в каждом запросе.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return get_response
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            key = get_primary_pin_key(request)
+            token = use_primary.set(
+                request.method not in SAFE_METHODS
+                or bool(key and await cache.aget(key))
+            )
+            try:
+                response = await get_response(request)
+            finally:
+                use_primary.reset(token)
+            if key and is_successful_write(request, response):
+                await cache.aset(key, True, settings.PRIMARY_STICKY_SECONDS)
+            return response
+    else:
+        def middleware(request):
+            key = get_primary_pin_key(request)
+            token = use_primary.set(
+                request.method not in SAFE_METHODS
+                or bool(key and cache.get(key))
+            )
+            try:
+                response = get_response(request)
+            finally:
+                use_primary.reset(token)
+            if key and is_successful_write(request, response):
+                cache.set(key, True, settings.PRIMARY_STICKY_SECONDS)
+            return response
+    return middleware
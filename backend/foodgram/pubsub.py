@@ -0,0 +1,138 @@
+"""Публикация событий подписчикам в открытых соединениях.
+
+Подписчики — корутины одного процесса (например, потоки Server-Sent
+Events). Публиковать можно из любого потока. Если включен
+PUBSUB_POSTGRES, события рассылаются через LISTEN/NOTIFY PostgreSQL:
+каждый процесс держит одно соединение, слушающее канал, и доставляет
+события своим подписчикам, поэтому события доходят до соединений
+на любом воркере.
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+import orjson
+from django.conf import settings
+from django.db import connections
+
+from foodgram.constants import PUBSUB_QUEUE_SIZE, PUBSUB_RECONNECT_DELAY
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'foodgram_events'
+
+REFRESH = None
+"""Сообщение, которое получают все подписчики после переподключения
+к PostgreSQL: события за время разрыва могли потеряться."""
+
+
+class Subscription:
+    """Подписка на канал на время блока with."""
+
+    def __init__(self, pubsub, channel):
+        self.pubsub = pubsub
+        self.channel = channel
+        self.loop = None
+        self.queue = asyncio.Queue(maxsize=PUBSUB_QUEUE_SIZE)
+
+    def __enter__(self):
+        self.loop = asyncio.get_running_loop()
+        self.pubsub.add(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pubsub.remove(self)
+
+    def put(self, message):
+        """Кладет сообщение в очередь, вытесняя самое старое."""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class PubSub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+        self._listener = None
+
+    def has_subscribers(self, channel):
+        """Могут ли у канала быть подписчики. С PUBSUB_POSTGRES они
+        бывают в других процессах, поэтому ответ всегда True."""
+        return settings.PUBSUB_POSTGRES or channel in self._subscriptions
+
+    def subscribe(self, channel):
+        """Подписка на канал; используется в корутине:
+        with pubsub.subscribe(channel) as subscription."""
+        return Subscription(self, channel)
+
+    def add(self, subscription):
+        if settings.PUBSUB_POSTGRES:
+            self.start_listener()
+        with self._lock:
+            self._subscriptions[subscription.channel].add(subscription)
+
+    def remove(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions[subscription.channel]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.channel]
+
+    def deliver(self, channel, message):
+        """Передает сообщение подписчикам канала в этом процессе."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(
+                subscription.put, message)
+
+    def deliver_all(self, message):
+        with self._lock:
+            channels = list(self._subscriptions)
+        for channel in channels:
+            self.deliver(channel, message)
+
+    def publish(self, channel, message):
+        """Публикует сообщение (JSON-сериализуемое) в канал."""
+        if not settings.PUBSUB_POSTGRES:
+            self.deliver(channel, message)
+            return
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [
+                NOTIFY_CHANNEL, orjson.dumps([channel, message]).decode()])
+
+    def start_listener(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(
+                self.listen())
+
+    async def listen(self):
+        """Доставляет события из NOTIFY_CHANNEL, переподключаясь
+        при разрыве соединения."""
+        import psycopg
+
+        params = connections['default'].get_connection_params()
+        params.pop('cursor_factory', None)
+        reconnected = False
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                        autocommit=True, **params) as connection:
+                    await connection.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                    if reconnected:
+                        self.deliver_all(REFRESH)
+                    async for notify in connection.notifies():
+                        self.deliver(*orjson.loads(notify.payload))
+            except Exception:
+                logger.exception('Ошибка соединения LISTEN %s',
+                                 NOTIFY_CHANNEL)
+            reconnected = True
+            await asyncio.sleep(PUBSUB_RECONNECT_DELAY)
+
+
+pubsub = PubSub()
@@ -0,0 +1,172 @@
+"""Защита чтений от зависшей или недоступной базы.
+
+statement_timeout ограничивает время SQL-запросов в пределах запроса
+к API, а database_breaker (circuit breaker) после серии ошибок базы
+на время перестает пускать к ней чтения.
+"""
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from weakref import WeakKeyDictionary
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from foodgram.constants import (
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+)
+
+statement_timeout = ContextVar('statement_timeout', default=None)
+"""Ограничение времени SQL-запросов текущего запроса (мс); None —
+ограничение соединения по умолчанию (DATABASE_STATEMENT_TIMEOUT)."""
+
+UNKNOWN = object()
+
+_applied_timeouts = WeakKeyDictionary()
+"""Соединение psycopg -> statement_timeout, установленное в нем вне
+транзакции."""
+
+_local_timeouts = WeakKeyDictionary()
+"""Соединение psycopg -> (statement_timeout, метка) для SET LOCAL
+в текущей транзакции."""
+
+
+def set_statement_timeout(cursor, timeout, local=False):
+    scope = 'LOCAL ' if local else ''
+    if timeout is None:
+        cursor.execute(f'SET {scope}statement_timeout TO DEFAULT')
+    else:
+        cursor.execute(f'SET {scope}statement_timeout = {int(timeout)}')
+
+
+def get_local_timeout(connection):
+    """statement_timeout, установленное SET LOCAL в текущей транзакции,
+    или UNKNOWN.
+
+    Метка SET LOCAL — обработчик transaction.on_commit: он, как и
+    SET LOCAL, отменяется откатом транзакции или точки сохранения,
+    в которой был добавлен.
+    """
+    local = _local_timeouts.get(connection.connection)
+    if local is not None and any(
+            func is local[1] for _, func, _ in connection.run_on_commit):
+        return local[0]
+    return UNKNOWN
+
+
+def apply_statement_timeout(execute, sql, params, many, context):
+    """Перед запросом устанавливает statement_timeout текущего запроса,
+    если в соединении действует другое значение.
+
+    Вне транзакции значение устанавливается для соединения, а в
+    транзакции — SET LOCAL один раз до ее завершения: значение
+    соединения при этом остается известным.
+    """
+    connection = context['connection']
+    raw_connection = connection.connection
+    timeout = statement_timeout.get()
+    if not connection.in_atomic_block:
+        if _applied_timeouts.get(raw_connection) != timeout:
+            set_statement_timeout(context['cursor'].cursor, timeout)
+            _applied_timeouts[raw_connection] = timeout
+        return execute(sql, params, many, context)
+    applied = get_local_timeout(connection)
+    if applied is UNKNOWN:
+        applied = _applied_timeouts.get(raw_connection)
+    if applied != timeout:
+        set_statement_timeout(context['cursor'].cursor, timeout, local=True)
+
+        def forget():
+            _local_timeouts.pop(raw_connection, None)
+
+        _local_timeouts[raw_connection] = (timeout, forget)
+        transaction.on_commit(forget, using=connection.alias)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_statement_timeout(sender, connection, **kwargs):
+    if (connection.vendor == 'postgresql'
+            and apply_statement_timeout not in connection.execute_wrappers):
+        connection.execute_wrappers.append(apply_statement_timeout)
+
+
+class CircuitBreaker:
+    """Автомат, размыкающийся после failure_threshold ошибок подряд.
+
+    Разомкнутый автомат не пускает запросы reset_timeout секунд, затем
+    пропускает одну пробную попытку (полуоткрытое состояние): успех
+    замыкает автомат, ошибка снова размыкает.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Состояние, в котором выполняется запрос: CLOSED или
+        HALF_OPEN (пробная попытка) — запрос можно выполнять,
+        OPEN — нельзя."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.CLOSED:
+                return self.CLOSED
+            if (self.state == self.OPEN
+                    and now - self.opened_at >= self.reset_timeout):
+                self.state = self.HALF_OPEN
+                self.probe_started_at = None
+            # Пробная попытка, не вернувшая результата, не должна
+            # оставить автомат полуоткрытым навсегда.
+            if self.state == self.HALF_OPEN and (
+                    self.probe_started_at is None
+                    or now - self.probe_started_at >= self.reset_timeout):
+                self.probe_started_at = now
+                self.counters['probes'] += 1
+                return self.HALF_OPEN
+            self.counters['rejected'] += 1
+            return self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                self.counters['closed'] += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.counters['failures'] += 1
+            if self.state == self.OPEN:
+                return
+            if (self.state == self.HALF_OPEN
+                    or self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.counters['trips'] += 1
+
+    def get_status(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'counters': dict(self.counters),
+            }
+
+
+database_breaker = CircuitBreaker(
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RESET_TIMEOUT)
+"""Автомат чтений из базы текущего процесса."""
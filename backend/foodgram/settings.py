@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -30,10 +31,12 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'tasks.apps.TasksConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.replica_routing_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,8 +75,42 @@ if DB_ENGINE == 'postgresql':
             'PASSWORD': os.getenv('DATABASE_PASSWORD'),
             'HOST': os.getenv('DATABASE_HOST', 'localhost'),
             'PORT': os.getenv('DATABASE_PORT', '5432'),
+            'OPTIONS': {},
         }
     }
+    DATABASE_STATEMENT_TIMEOUT = int(
+        os.getenv('DATABASE_STATEMENT_TIMEOUT', '0'))
+    if DATABASE_STATEMENT_TIMEOUT:
+        DATABASES['default']['OPTIONS']['options'] = (
+            f'-c statement_timeout={DATABASE_STATEMENT_TIMEOUT}')
+    if os.getenv('DATABASE_POOL', 'False').lower() == 'true':
+        from psycopg_pool import ConnectionPool
+
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', '10')),
+            'check': ConnectionPool.check_connection,
+        }
+    else:
+        # Под ASGI каждый поток запроса держит свое соединение, и
+        # постоянные соединения копятся: по умолчанию они закрываются
+        # в конце запроса, для переиспользования есть пул.
+        DATABASES['default']['CONN_MAX_AGE'] = int(
+            os.getenv('DATABASE_CONN_MAX_AGE', '0'))
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    DATABASE_REPLICAS = []
+    for number, host in enumerate(
+            filter(None, os.getenv('DATABASE_REPLICA_HOSTS', '').split(','))):
+        alias = f'replica_{number}'
+        DATABASES[alias] = {
+            **DATABASES['default'],
+            'HOST': host.strip(),
+            'OPTIONS': {**DATABASES['default']['OPTIONS']},
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append(alias)
+    PUBSUB_POSTGRES = os.getenv('PUBSUB_POSTGRES', 'False').lower() == 'true'
 else:
     DATABASES = {
         'default': {
@@ -81,6 +118,24 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    DATABASE_REPLICAS = []
+    PUBSUB_POSTGRES = False
+
+DATABASE_ROUTERS = ['foodgram.db_routers.PrimaryReplicaRouter']
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))
+REPLICA_LAG_CHECK_INTERVAL = float(
+    os.getenv('REPLICA_LAG_CHECK_INTERVAL', '5'))
+PRIMARY_STICKY_SECONDS = int(os.getenv('PRIMARY_STICKY_SECONDS', '15'))
+DATABASE_READ_STATEMENT_TIMEOUT = int(
+    os.getenv('DATABASE_READ_STATEMENT_TIMEOUT', '2000'))
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -114,6 +169,16 @@ STATIC_ROOT = os.getenv('STATIC_ROOT', BASE_DIR / 'django_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.getenv('MEDIA_ROOT', BASE_DIR / 'media')
 
+CATALOG_SNAPSHOT_DIR = os.getenv(
+    'CATALOG_SNAPSHOT_DIR', os.path.join(MEDIA_ROOT, 'catalog'))
+
+# local — только для одного процесса: другие процессы не узнают
+# об изменениях и, например, продолжат принимать удаленные токены.
+INVALIDATION_TRANSPORT = os.getenv('INVALIDATION_TRANSPORT', 'file')
+INVALIDATION_FILE = os.getenv(
+    'INVALIDATION_FILE',
+    os.path.join(tempfile.gettempdir(), 'foodgram-invalidation'))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
@@ -121,6 +186,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser',
+        'api.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 DJOSER = {
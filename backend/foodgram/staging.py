@@ -0,0 +1,77 @@
+"""Запись загруженных файлов вне транзакций.
+
+Файл записывается в каталог FILE_STAGING_DIR хранилища до начала
+транзакции, в транзакции модель получает только имя файла, а на место
+файл переносится переименованием после фиксации. Транзакция не ждет
+записи на диск, сколько бы ни весил файл. Поддерживаются хранилища
+с локальными путями (FileSystemStorage).
+"""
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from uuid import uuid4
+
+from django.db import transaction
+
+from foodgram.constants import FILE_STAGING_DIR, STAGED_FILE_TIMEOUT
+from tasks.queue import enqueue
+
+logger = logging.getLogger(__name__)
+
+
+def discard_staged_file(path):
+    """Удаляет временный файл, если он не был перенесен на место
+    (транзакция откатилась или процесс завершился аварийно)."""
+    Path(path).unlink(missing_ok=True)
+
+
+class StagedFile:
+    """Файл для поля field, записанный во временный каталог.
+
+    Создается вне транзакции: задача удаления непринятого файла
+    должна сохраниться и при откате.
+    """
+
+    def __init__(self, field, content, instance=None):
+        storage = field.storage
+        extension = os.path.splitext(content.name)[1].lower()
+        self.name = field.generate_filename(
+            instance, f'{uuid4().hex}{extension}')
+        self.path = storage.path(self.name)
+        staging_dir = Path(storage.location) / FILE_STAGING_DIR
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        fd, self.staged_path = tempfile.mkstemp(
+            dir=staging_dir, suffix=extension)
+        with os.fdopen(fd, 'wb') as file:
+            for chunk in content.chunks():
+                file.write(chunk)
+        if storage.file_permissions_mode is not None:
+            os.chmod(self.staged_path, storage.file_permissions_mode)
+        enqueue(discard_staged_file, self.staged_path,
+                delay=STAGED_FILE_TIMEOUT)
+
+    def commit(self):
+        """Переносит файл на место (в пределах файловой системы
+        хранилища — атомарно)."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        os.replace(self.staged_path, self.path)
+
+    def discard(self):
+        discard_staged_file(self.staged_path)
+
+
+@contextmanager
+def atomic_with_files(staged_files):
+    """transaction.atomic(), после фиксации которой файлы переносятся
+    на место, а при ошибке внутри блока удаляются."""
+    try:
+        with transaction.atomic():
+            yield
+            for staged_file in staged_files:
+                transaction.on_commit(staged_file.commit, robust=True)
+    except BaseException:
+        for staged_file in staged_files:
+            staged_file.discard()
+        raise
@@ -2,11 +2,15 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from recipes.views import short_link_redirect
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    re_path(r'^s/(?P<code>[0-9A-Za-z]{1,16})/?$', short_link_redirect,
+            name='short-link'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,39 @@
+from django.core.cache import cache
+
+LIST_VERSION_KEY = 'recipes:list-version'
+USER_VERSION_KEY = 'users:{}:version'
+
+
+def get_list_version():
+    """Версия списка рецептов: меняется при любом изменении рецептов,
+    поэтому ключи кеша с версией устаревают без перебора."""
+    return cache.get_or_set(LIST_VERSION_KEY, 1, None)
+
+
+async def aget_list_version():
+    return await cache.aget_or_set(LIST_VERSION_KEY, 1, None)
+
+
+def bump_list_version():
+    try:
+        cache.incr(LIST_VERSION_KEY)
+    except ValueError:
+        cache.set(LIST_VERSION_KEY, 1, None)
+
+
+def get_user_version(user_id):
+    """Версия данных пользователя: меняется при изменении профиля,
+    избранного, списка покупок и подписок."""
+    return cache.get_or_set(USER_VERSION_KEY.format(user_id), 1, None)
+
+
+async def aget_user_version(user_id):
+    return await cache.aget_or_set(USER_VERSION_KEY.format(user_id), 1, None)
+
+
+def bump_user_version(user_id):
+    key = USER_VERSION_KEY.format(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import os
+from pathlib import Path
+
+import brotli
+import orjson
+from django.conf import settings
+
+from recipes.models import Ingredient
+from recipes.registry import (
+    get_ingredient_registry,
+    get_registry_path,
+    write_registry,
+)
+
+SNAPSHOT_ENCODINGS = {
+    'br': ('.br', lambda content: brotli.compress(content, quality=11)),
+    'gzip': ('.gz', lambda content: gzip.compress(content, mtime=0)),
+}
+"""Сжатые варианты снимка: Content-Encoding -> (суффикс, компрессор)."""
+
+
+def get_snapshot_dir():
+    return Path(settings.CATALOG_SNAPSHOT_DIR)
+
+
+def get_snapshot_path(version, encoding=None):
+    suffix = SNAPSHOT_ENCODINGS[encoding][0] if encoding else ''
+    return get_snapshot_dir() / f'ingredients.{version}.json{suffix}'
+
+
+def write_atomic(path, content):
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+def rebuild_catalog_snapshot():
+    """Собирает снимок каталога и справочник, возвращает версию снимка.
+
+    Версия — хеш содержимого, поэтому снимок без изменений каталога
+    не пересобирается, а файлы прошлых версий удаляются.
+    """
+    rows = list(Ingredient.objects.order_by('id').values_list(
+        'id', 'name', 'measurement_unit'))
+    content = orjson.dumps([
+        {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+        for pk, name, measurement_unit in rows
+    ])
+    version = hashlib.sha256(content).hexdigest()[:16]
+    snapshot_dir = get_snapshot_dir()
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    paths = [get_snapshot_path(version, encoding)
+             for encoding in (None, *SNAPSHOT_ENCODINGS)]
+    if not all(path.exists() for path in (*paths, get_registry_path())):
+        write_registry(rows)
+        for encoding, (_, compress) in SNAPSHOT_ENCODINGS.items():
+            write_atomic(
+                get_snapshot_path(version, encoding), compress(content))
+        write_atomic(get_snapshot_path(version), content)
+    write_atomic(snapshot_dir / 'current', version.encode())
+    for path in snapshot_dir.glob('ingredients.*.json*'):
+        if not path.name.startswith(f'ingredients.{version}.'):
+            path.unlink(missing_ok=True)
+    return version
+
+
+def get_catalog_version():
+    try:
+        return (get_snapshot_dir() / 'current').read_text()
+    except FileNotFoundError:
+        return rebuild_catalog_snapshot()
+
+
+def resolve_ingredients(ingredient_ids):
+    """id -> (название, единица измерения) по справочнику.
+
+    Ингредиенты, которых еще нет в справочнике, берутся из БД,
+    несуществующим соответствует None.
+    """
+    registry = get_ingredient_registry()
+    resolved = {pk: registry.get(pk) for pk in ingredient_ids}
+    missing = [pk for pk, ingredient in resolved.items() if ingredient is None]
+    if missing:
+        resolved.update(
+            (pk, (name, measurement_unit))
+            for pk, name, measurement_unit in Ingredient.objects.filter(
+                pk__in=missing).values_list('pk', 'name', 'measurement_unit')
+        )
+    return resolved
@@ -0,0 +1,129 @@
+"""Журнал изменений для синхронизации клиентов (/api/sync/).
+
+Токен синхронизации — позиция последней полученной клиентом записи.
+id записи выдается при вставке, и транзакция с меньшим id может
+зафиксироваться позже уже отданных записей. Поэтому записи отдаются
+только после того, как assign_positions() назначит им позиции: она
+видит лишь зафиксированные записи, и каждая следующая позиция больше
+всех уже назначенных, как бы поздно ни зафиксировалась транзакция.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Max, Q
+
+from foodgram.constants import CHANGE_LOG_BATCH_SIZE, CHANGE_LOG_LOCK_ID
+from recipes.models import ChangeLogEntry, Favorite, ShoppingCart
+from users.models import Subscribe
+
+Kind = ChangeLogEntry.Kind
+
+
+def log_recipe_changes(recipes):
+    """Записывает изменение рецептов из queryset, например после
+    изменения их автора или ингредиента."""
+    ChangeLogEntry.objects.bulk_create(
+        (
+            ChangeLogEntry(kind=Kind.RECIPE, object_id=pk, owner=author_id)
+            for pk, author_id in recipes.values_list('pk', 'author_id')
+        ),
+        batch_size=CHANGE_LOG_BATCH_SIZE,
+    )
+
+
+def assign_positions():
+    """Назначает позиции зафиксированным записям без позиции, в порядке id.
+
+    Назначения идут по одному под advisory-блокировкой PostgreSQL,
+    и позиции каждого следующего больше всех предыдущих (на SQLite
+    транзакции записи и так выполняются по одной).
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    pending = ChangeLogEntry.objects.filter(position__isnull=True)
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s)', [CHANGE_LOG_LOCK_ID])
+        first_id = pending.order_by('id').values_list(
+            'id', flat=True).first()
+        if first_id is None:
+            return
+        last_position = ChangeLogEntry.objects.aggregate(
+            last=Max('position'))['last'] or 0
+        # Записи с меньшим id, зафиксированные после выборки first_id,
+        # получат позиции при следующем вызове.
+        pending.filter(id__gte=first_id).update(
+            position=F('id') - first_id + last_position + 1)
+
+
+def get_current_token():
+    """Токен, с которого клиенту достаточно получать изменения."""
+    assign_positions()
+    return ChangeLogEntry.objects.aggregate(
+        last=Max('position'))['last'] or 0
+
+
+def get_compacted_token():
+    """Токен последней удаленной при сжатии записи: изменения после
+    более старых токенов могли быть удалены."""
+    first_position = ChangeLogEntry.objects.filter(
+        position__isnull=False).order_by('position').values_list(
+            'position', flat=True).first()
+    return first_position - 1 if first_position else 0
+
+
+def get_user_changes(user, since, limit):
+    """Изменения после токена since, относящиеся к пользователю.
+
+    Это его избранное, корзина, подписки и рецепты, а также изменения
+    рецептов из избранного, корзины и рецептов авторов, на которых он
+    подписан. Для каждого объекта остается последнее изменение.
+    Возвращает [(тип, id объекта, удален)], следующий токен и признак
+    того, что изменения получены не все.
+    """
+    current_token = get_current_token()
+    entries = list(ChangeLogEntry.objects.filter(
+        Q(owner=user.pk)
+        | (Q(kind=Kind.RECIPE) & (
+            Q(owner__in=Subscribe.objects.filter(
+                user=user).values('author_id'))
+            | Q(object_id__in=Favorite.objects.filter(
+                user=user).values('recipe_id'))
+            | Q(object_id__in=ShoppingCart.objects.filter(
+                user=user).values('recipe_id'))
+        )),
+        position__gt=since,
+        position__lte=current_token,
+    ).order_by('position').values_list(
+        'position', 'kind', 'object_id', 'deleted')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    next_token = entries[-1][0] if has_more else max(since, current_token)
+    changes = {}
+    for _, kind, object_id, deleted in entries:
+        changes.pop((kind, object_id), None)
+        changes[kind, object_id] = deleted
+    return (
+        [(kind, object_id, deleted)
+         for (kind, object_id), deleted in changes.items()],
+        next_token,
+        has_more,
+    )
+
+
+def compact_change_log(before):
+    """Удаляет записи старше before, кроме последней записи журнала.
+
+    Последняя запись сохраняется, чтобы по первой оставшейся записи
+    было видно, какие токены устарели (get_compacted_token()). Записи
+    без позиции еще не отданы клиентам и не удаляются.
+    """
+    assign_positions()
+    positioned = ChangeLogEntry.objects.filter(position__isnull=False)
+    last_position = positioned.aggregate(last=Max('position'))['last']
+    if last_position is None:
+        return 0
+    boundary = positioned.filter(
+        created_at__gte=before).order_by('position').values_list(
+            'position', flat=True).first() or last_position
+    deleted, _ = positioned.filter(position__lt=boundary).delete()
+    return deleted
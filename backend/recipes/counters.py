@@ -0,0 +1,33 @@
+"""Счетчики избранного и списка покупок пользователя для потока
+событий (/api/events/)."""
+from foodgram.pubsub import pubsub
+from recipes.models import Favorite, ShoppingCart
+
+
+def get_user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def get_counters(user_id):
+    return {
+        'favorites_count': Favorite.objects.filter(user_id=user_id).count(),
+        'shopping_cart_count': ShoppingCart.objects.filter(
+            user_id=user_id).count(),
+    }
+
+
+async def aget_counters(user_id):
+    return {
+        'favorites_count': await Favorite.objects.filter(
+            user_id=user_id).acount(),
+        'shopping_cart_count': await ShoppingCart.objects.filter(
+            user_id=user_id).acount(),
+    }
+
+
+def publish_counters(user_id):
+    """Отправляет новые значения счетчиков открытым потокам событий
+    пользователя."""
+    channel = get_user_channel(user_id)
+    if pubsub.has_subscribers(channel):
+        pubsub.publish(channel, get_counters(user_id))
@@ -0,0 +1,164 @@
+import threading
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from recipes.caching import bump_list_version
+from recipes.change_log import log_recipe_changes
+from recipes.models import Recipe, RecipeDocument, RecipeIngredient
+
+RECIPE_DOCUMENT_FIELDS = (
+    'id',
+    'author__email',
+    'author__id',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'author__avatar',
+    'name',
+    'image',
+    'text',
+    'cooking_time',
+)
+
+
+def get_file_url(name):
+    return default_storage.url(name) if name else None
+
+
+def build_documents(recipes):
+    """Данные рецептов, не зависящие от пользователя, который их смотрит.
+
+    Собираются из двух запросов values_list(), без экземпляров моделей.
+    """
+    ingredients = {}
+    for recipe_id, *ingredient in RecipeIngredient.objects.filter(
+        recipe__in=recipes
+    ).order_by('id').values_list(
+        'recipe_id',
+        'ingredient_id',
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount',
+    ):
+        ingredients.setdefault(recipe_id, []).append(ingredient)
+
+    return {
+        recipe_id: {
+            'id': recipe_id,
+            'author': {
+                'email': email,
+                'id': author_id,
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+                'avatar': get_file_url(avatar),
+            },
+            'ingredients': [
+                {
+                    'id': ingredient_id,
+                    'name': name,
+                    'measurement_unit': measurement_unit,
+                    'amount': amount,
+                }
+                for ingredient_id, name, measurement_unit, amount
+                in ingredients.get(recipe_id, ())
+            ],
+            'name': recipe_name,
+            'image': get_file_url(image),
+            'text': text,
+            'cooking_time': cooking_time,
+        }
+        for (recipe_id, email, author_id, username, first_name, last_name,
+             avatar, recipe_name, image, text, cooking_time)
+        in recipes.values_list(*RECIPE_DOCUMENT_FIELDS)
+    }
+
+
+def rebuild_recipe_documents(recipes):
+    """Пересобирает документы для рецептов из queryset."""
+    recipes = Recipe.objects.filter(pk__in=recipes.values('pk'))
+    return RecipeDocument.objects.bulk_create(
+        [
+            RecipeDocument(recipe_id=recipe_id, data=data)
+            for recipe_id, data in build_documents(recipes).items()
+        ],
+        update_conflicts=True,
+        unique_fields=('recipe',),
+        update_fields=('data', 'updated_at'),
+    )
+
+
+def rebuild_related_documents(lookup, value):
+    """Пересобирает документы рецептов из filter(lookup=value)
+    и записывает изменение рецептов в журнал.
+
+    Задача очереди: ставится после изменения автора или ингредиента,
+    данные которых входят в документы всех их рецептов.
+    """
+    recipes = Recipe.objects.filter(**{lookup: value})
+    rebuild_recipe_documents(recipes)
+    log_recipe_changes(recipes)
+    bump_list_version()
+
+
+_pending = threading.local()
+
+
+def schedule_document_rebuild(recipe_id):
+    """Сбрасывает документ рецепта в текущей транзакции и пересобирает
+    его после фиксации.
+
+    Документ удаляется вместе с изменением, поэтому устаревший документ
+    не отдается, даже если пересборка не выполнится: недостающие
+    документы собираются при чтении. Рецепты, измененные в одной
+    транзакции несколько раз, пересобираются один раз.
+    """
+    RecipeDocument.objects.filter(recipe_id=recipe_id).delete()
+    if not hasattr(_pending, 'recipe_ids'):
+        _pending.recipe_ids = set()
+    _pending.recipe_ids.add(recipe_id)
+    transaction.on_commit(rebuild_pending_documents, robust=True)
+
+
+def rebuild_pending_documents():
+    """Пересобирает документы рецептов, запланированные в этом потоке.
+
+    Вызывается после фиксации каждой транзакции, в которой планировалась
+    пересборка; первый вызов забирает все рецепты, остальные ничего
+    не делают. Рецепты из отмененной транзакции пересобираются после
+    следующей фиксации, что безопасно.
+    """
+    recipe_ids = getattr(_pending, 'recipe_ids', None)
+    if not recipe_ids:
+        return
+    _pending.recipe_ids = set()
+    rebuild_recipe_documents(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+def has_document(recipe):
+    try:
+        recipe.document
+    except RecipeDocument.DoesNotExist:
+        return False
+    return True
+
+
+def attach_recipe_documents(recipes, rebuild=False):
+    """Подставляет рецептам документы, собирая недостающие.
+
+    С rebuild=True документы пересобираются для всех рецептов,
+    например после изменения рецепта.
+    """
+    recipes = [
+        recipe for recipe in recipes if rebuild or not has_document(recipe)
+    ]
+    if not recipes:
+        return
+    documents = {
+        document.recipe_id: document
+        for document in rebuild_recipe_documents(
+            Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes]))
+    }
+    for recipe in recipes:
+        recipe.document = documents[recipe.pk]
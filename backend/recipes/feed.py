@@ -0,0 +1,108 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from foodgram.constants import (
+    FEED_BACKFILL_LIMIT,
+    FEED_CELEBRITIES_CACHE_TIMEOUT,
+    FEED_FANOUT_BATCH_SIZE,
+    FEED_FANOUT_MAX_SUBSCRIBERS,
+)
+from recipes.models import Recipe, TimelineEntry
+from users.models import Subscribe, User
+
+
+def get_celebrities():
+    """Авторы, рецепты которых подмешиваются в ленты при чтении."""
+    celebrities = cache.get('feed:celebrities')
+    if celebrities is None:
+        celebrities = set(
+            User.objects.annotate(
+                subscribers_count=Count('subscribers')
+            ).filter(
+                subscribers_count__gt=FEED_FANOUT_MAX_SUBSCRIBERS
+            ).values_list('pk', flat=True)
+        )
+        cache.set('feed:celebrities', celebrities,
+                  FEED_CELEBRITIES_CACHE_TIMEOUT)
+    return celebrities
+
+
+def fan_out_recipe(recipe_id):
+    """Раскладывает новый рецепт по лентам подписчиков автора."""
+    recipe = Recipe.objects.filter(pk=recipe_id).values(
+        'author_id', 'pub_date').first()
+    if recipe is None or recipe['author_id'] in get_celebrities():
+        return
+    subscribers = Subscribe.objects.filter(
+        author_id=recipe['author_id']
+    ).values_list('user_id', flat=True).iterator(
+        chunk_size=FEED_FANOUT_BATCH_SIZE)
+    batch = []
+    for user_id in subscribers:
+        batch.append(TimelineEntry(
+            user_id=user_id, recipe_id=recipe_id,
+            pub_date=recipe['pub_date'],
+        ))
+        if len(batch) == FEED_FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки.
+
+    Задача выполняется позже подписки: если пользователь уже отписался,
+    лента не заполняется.
+    """
+    if author_id in get_celebrities() or not Subscribe.objects.filter(
+            user_id=user_id, author_id=author_id).exists():
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+            for pk, pub_date in Recipe.objects.filter(
+                author_id=author_id
+            ).values_list('pk', 'pub_date')[:FEED_BACKFILL_LIMIT]
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def remove_from_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id).delete()
+
+
+def get_feed_page(user, limit, position=None, reverse=False):
+    """Ключи (pub_date, recipe_id) страницы ленты пользователя.
+
+    Лента упорядочена по (-pub_date, -recipe_id): это записи TimelineEntry,
+    разложенные при записи, и рецепты популярных авторов, на которых
+    пользователь подписан, — они подмешиваются при чтении по тому же
+    ключу. Возвращается до limit + 1 ключей после position (не включая
+    его), а с reverse — до него, в обратном порядке: лишний ключ
+    показывает, что страница не последняя.
+    """
+    sources = [(TimelineEntry.objects.filter(user=user), 'recipe_id')]
+    celebrities = list(Subscribe.objects.filter(
+        user=user, author_id__in=get_celebrities()
+    ).values_list('author_id', flat=True))
+    if celebrities:
+        sources.append(
+            (Recipe.objects.filter(author_id__in=celebrities), 'pk'))
+    lookup = 'gt' if reverse else 'lt'
+    keys = set()
+    for queryset, id_field in sources:
+        if position is not None:
+            pub_date, recipe_id = position
+            queryset = queryset.filter(
+                Q(**{f'pub_date__{lookup}': pub_date})
+                | Q(pub_date=pub_date, **{f'{id_field}__{lookup}': recipe_id})
+            )
+        ordering = ('pub_date', id_field)
+        if not reverse:
+            ordering = tuple(f'-{field}' for field in ordering)
+        keys.update(queryset.order_by(*ordering).values_list(
+            'pub_date', id_field)[:limit + 1])
+    return sorted(keys, reverse=not reverse)[:limit + 1]
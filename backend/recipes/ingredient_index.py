@@ -0,0 +1,278 @@
+"""Инвертированный индекс ингредиент -> рецепты.
+
+Хранится в файле рядом со справочником ингредиентов и, как и справочник,
+отображается в память каждым процессом. Формат: заголовок, отсортированные
+id рецептов (int64), отсортированные id ингредиентов (int64), смещения
+списков рецептов каждого ингредиента (int64), число ингредиентов рецепта
+(int32) и сами списки — номера рецептов в массиве id (int32).
+
+Рецепты, измененные после сборки, берутся из их документов
+(RecipeDocument.updated_at), поэтому файл не переписывается при каждом
+сохранении рецепта, а пересобирается, когда таких рецептов накопится
+INGREDIENT_INDEX_MAX_CHANGES.
+"""
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone as django_timezone
+
+from foodgram.background import run_in_background
+from foodgram.constants import (
+    INGREDIENT_INDEX_CHANGES_MARGIN,
+    INGREDIENT_INDEX_MAX_CHANGES,
+    INGREDIENT_INDEX_REBUILD_TIMEOUT,
+)
+from foodgram.invalidation import get_generation, invalidate
+from recipes.models import RecipeDocument, RecipeIngredient
+
+MAGIC = b'FGII'
+HEADER = struct.Struct('=4s4xqqqd')
+INVALIDATION_NAME = 'ingredient-index'
+
+
+def get_index_path():
+    return Path(settings.CATALOG_SNAPSHOT_DIR) / 'ingredients.index'
+
+
+def write_index(pairs, built_at, path=None):
+    """Записывает индекс из массива пар (id рецепта, id ингредиента)."""
+    path = path or get_index_path()
+    recipe_ids, positions, sizes = np.unique(
+        pairs[:, 0], return_inverse=True, return_counts=True)
+    order = np.lexsort((positions, pairs[:, 1]))
+    ingredient_ids, counts = np.unique(
+        pairs[order, 1], return_counts=True)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(
+            MAGIC, len(recipe_ids), len(ingredient_ids), len(pairs),
+            built_at.timestamp(),
+        ))
+        for array, dtype in (
+            (recipe_ids, np.int64),
+            (ingredient_ids, np.int64),
+            (offsets, np.int64),
+            (sizes, np.int32),
+            (positions[order], np.int32),
+        ):
+            file.write(array.astype(dtype).tobytes())
+    os.replace(tmp_path, path)
+    return len(recipe_ids)
+
+
+def rebuild_ingredient_index(path=None):
+    """Собирает индекс по всем рецептам, возвращает число рецептов."""
+    built_at = django_timezone.now()
+    pairs = np.fromiter(
+        chain.from_iterable(
+            RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id').iterator(chunk_size=10000)
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    recipes_count = write_index(pairs, built_at, path)
+    invalidate(INVALIDATION_NAME)
+    return recipes_count
+
+
+class IngredientIndex:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.stat = os.fstat(file.fileno())
+            self._mmap = mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, recipes_count, ingredients_count, postings_count,
+         built_at) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f'{path} не является индексом ингредиентов')
+        self.built_at = datetime.fromtimestamp(built_at, timezone.utc)
+        offset = HEADER.size
+        arrays = []
+        for dtype, count in (
+            (np.int64, recipes_count),
+            (np.int64, ingredients_count),
+            (np.int64, ingredients_count + 1),
+            (np.int32, recipes_count),
+            (np.int32, postings_count),
+        ):
+            arrays.append(np.frombuffer(
+                self._mmap, dtype=dtype, count=count, offset=offset))
+            offset += arrays[-1].nbytes
+        (self.recipe_ids, self.ingredient_ids, self._offsets,
+         self.sizes, self._postings) = arrays
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def find(self, ids, keys):
+        """Позиции ids в отсортированном массиве keys и маска найденных."""
+        ids = np.asarray(ids, dtype=np.int64)
+        positions = np.searchsorted(keys, ids)
+        found = positions < len(keys)
+        found[found] = keys[positions[found]] == ids[found]
+        return positions, found
+
+    def count_overlaps(self, ingredient_ids):
+        """Число ингредиентов из ingredient_ids в каждом рецепте индекса."""
+        positions, found = self.find(
+            sorted(ingredient_ids), self.ingredient_ids)
+        postings = [
+            self._postings[self._offsets[position]:
+                           self._offsets[position + 1]]
+            for position in positions[found]
+        ]
+        if not postings:
+            return np.zeros(len(self), dtype=np.int64)
+        return np.bincount(np.concatenate(postings), minlength=len(self))
+
+    def match(self, ingredient_ids, exclude=(), max_size=0):
+        """Рецепты индекса, кроме exclude, в которых есть хотя бы один
+        из ингредиентов или всего не больше max_size ингредиентов:
+        массивы id рецептов, чисел совпавших ингредиентов и чисел всех
+        ингредиентов рецепта."""
+        overlaps = self.count_overlaps(ingredient_ids)
+        matched = (overlaps > 0) | (self.sizes <= max_size)
+        if exclude:
+            positions, found = self.find(sorted(exclude), self.recipe_ids)
+            matched[positions[found]] = False
+        return (self.recipe_ids[matched], overlaps[matched],
+                self.sizes[matched].astype(np.int64))
+
+
+_index = None
+_generation = None
+
+
+def get_ingredient_index():
+    """Индекс текущего процесса; перечитывается после пересборки
+    (файл проверяется, только если изменилось поколение индекса)."""
+    global _index, _generation
+    generation = get_generation(INVALIDATION_NAME)
+    if (_index is not None and generation is not None
+            and generation == _generation):
+        return _index
+    path = get_index_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        rebuild_ingredient_index(path)
+        stat = os.stat(path)
+    if (_index is None
+            or (_index.stat.st_ino, _index.stat.st_mtime_ns)
+            != (stat.st_ino, stat.st_mtime_ns)):
+        _index = IngredientIndex(path)
+    _generation = generation
+    return _index
+
+
+def get_changed_recipes(index):
+    """id рецепта -> id его ингредиентов для рецептов, измененных
+    после сборки индекса."""
+    changed = {
+        recipe_id: {ingredient['id'] for ingredient in ingredients}
+        for recipe_id, ingredients in RecipeDocument.objects.filter(
+            updated_at__gte=index.built_at - timedelta(
+                seconds=INGREDIENT_INDEX_CHANGES_MARGIN)
+        ).values_list('recipe_id', 'data__ingredients')
+    }
+    if (len(changed) > INGREDIENT_INDEX_MAX_CHANGES
+            and cache.add('ingredient-index:rebuild', True,
+                          INGREDIENT_INDEX_REBUILD_TIMEOUT)):
+        run_in_background(rebuild_ingredient_index)
+    return changed
+
+
+def match_ingredients(ingredient_ids, max_size=0):
+    """Рецепты, в которых есть хотя бы один из ингредиентов или всего
+    не больше max_size ингредиентов.
+
+    Возвращает массивы id рецептов, числа совпавших ингредиентов
+    и числа всех ингредиентов рецепта. Удаленные после сборки индекса
+    рецепты могут попасть в результат и отсеиваются при выборке из БД.
+    """
+    index = get_ingredient_index()
+    changed = get_changed_recipes(index)
+    recipe_ids, overlaps, sizes = index.match(
+        ingredient_ids, changed, max_size)
+    ingredient_ids = set(ingredient_ids)
+    changed_matches = [
+        (recipe_id, len(ingredients & ingredient_ids), len(ingredients))
+        for recipe_id, ingredients in changed.items()
+        if ingredients & ingredient_ids
+        or 0 < len(ingredients) <= max_size
+    ]
+    if changed_matches:
+        changed_ids, changed_overlaps, changed_sizes = np.array(
+            changed_matches, dtype=np.int64).T
+        recipe_ids = np.concatenate((recipe_ids, changed_ids))
+        overlaps = np.concatenate((overlaps, changed_overlaps))
+        sizes = np.concatenate((sizes, changed_sizes))
+    return recipe_ids, overlaps, sizes
+
+
+def top_recipes(recipe_ids, scores, limit):
+    """id limit рецептов с наибольшей оценкой, при равенстве — новее."""
+    if len(scores) > limit:
+        candidates = np.argpartition(-scores, limit - 1)[:limit]
+        # Рецепты с той же оценкой, что и у последнего кандидата.
+        threshold = scores[candidates].min()
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((-recipe_ids[candidates], -scores[candidates]))
+    return recipe_ids[candidates[order]][:limit].tolist()
+
+
+def rank_similar_recipes(recipe_id, ingredient_ids, matches, limit):
+    """id limit рецептов из matches (см. match_ingredients()), наиболее
+    близких к рецепту по коэффициенту Жаккара наборов ингредиентов."""
+    recipe_ids, overlaps, sizes = matches
+    other = recipe_ids != recipe_id
+    recipe_ids, overlaps, sizes = (
+        recipe_ids[other], overlaps[other], sizes[other])
+    scores = overlaps / (len(ingredient_ids) + sizes - overlaps)
+    return top_recipes(recipe_ids, scores, limit)
+
+
+def rank_pantry_recipes(matches, max_missing):
+    """id рецептов из matches, для которых не хватает не больше
+    max_missing ингредиентов: сначала с наибольшей долей имеющихся."""
+    recipe_ids, overlaps, sizes = matches
+    missing = sizes - overlaps
+    fits = missing <= max_missing
+    recipe_ids, overlaps, sizes, missing = (
+        recipe_ids[fits], overlaps[fits], sizes[fits], missing[fits])
+    order = np.lexsort((-recipe_ids, missing, -overlaps / sizes))
+    return recipe_ids[order].tolist()
+
+
+def find_similar_recipes(recipe_id, limit):
+    """id рецептов, наиболее близких по коэффициенту Жаккара наборов
+    ингредиентов."""
+    ingredient_ids = set(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', flat=True))
+    if not ingredient_ids:
+        return []
+    return rank_similar_recipes(
+        recipe_id, ingredient_ids, match_ingredients(ingredient_ids), limit)
+
+
+def find_pantry_recipes(ingredient_ids, max_missing):
+    """id рецептов, для которых из ingredient_ids не хватает не больше
+    max_missing ингредиентов: сначала с наибольшей долей имеющихся.
+
+    Рецепт не больше чем из max_missing ингредиентов подходит, даже если
+    ни одного из них нет в ingredient_ids.
+    """
+    return rank_pantry_recipes(
+        match_ingredients(ingredient_ids, max_missing), max_missing)
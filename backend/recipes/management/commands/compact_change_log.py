@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodgram.constants import CHANGE_LOG_RETENTION_DAYS
+from recipes.change_log import compact_change_log
+
+
+class Command(BaseCommand):
+    help = ('Удаление старых записей журнала изменений; клиенты с более '
+            'старыми токенами синхронизации загружают данные заново')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=CHANGE_LOG_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        deleted = compact_change_log(
+            timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей: {deleted}'))
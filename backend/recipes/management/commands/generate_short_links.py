@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.short_links import get_short_code
+
+
+class Command(BaseCommand):
+    help = 'Создание коротких ссылок для рецептов без них'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.filter(
+            short_code=None).order_by('pk').values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        for start in range(0, len(recipe_ids), batch_size):
+            Recipe.objects.bulk_update(
+                [
+                    Recipe(pk=pk, short_code=get_short_code(pk))
+                    for pk in recipe_ids[start:start + batch_size]
+                ],
+                ('short_code',),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано коротких ссылок: {len(recipe_ids)}'))
@@ -3,6 +3,7 @@ from pathlib import Path
 
 from django.core.management.base import BaseCommand
 
+from recipes.catalog import rebuild_catalog_snapshot
 from recipes.models import Ingredient
 
 
@@ -27,16 +28,17 @@ class Command(BaseCommand):
             with data_file.open(encoding='utf-8') as file:
                 data = json.load(file)
 
-                ingredients = (
+                ingredients = [
                     Ingredient(
                         name=item['name'],
                         measurement_unit=item['measurement_unit']
                     )
                     for item in data
-                )
+                ]
 
                 Ingredient.objects.bulk_create(
                     ingredients, ignore_conflicts=True)
+                rebuild_catalog_snapshot()
 
                 self.stdout.write(
                     self.style.SUCCESS(
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from recipes.ingredient_index import rebuild_ingredient_index
+
+
+class Command(BaseCommand):
+    help = 'Пересборка индекса ингредиентов рецептов'
+
+    def handle(self, *args, **options):
+        recipes_count = rebuild_ingredient_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано рецептов: {recipes_count}'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.documents import rebuild_recipe_documents
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересборка документов рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipe_ids = list(
+            Recipe.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(recipe_ids), batch_size):
+            rebuild_recipe_documents(Recipe.objects.filter(
+                pk__in=recipe_ids[start:start + batch_size]))
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано документов: {len(recipe_ids)}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import TRENDING_BATCH_SIZE
+from recipes.trending import update_trending_scores
+
+
+class Command(BaseCommand):
+    help = 'Пересчет популярности рецептов по журналу событий'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=TRENDING_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        processed = update_trending_scores(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано событий: {processed}'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipedocument',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Обновлен'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipedocument_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('favorite', 'Избранное'), ('shopping_cart', 'Корзина')], max_length=16, verbose_name='Тип')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время')),
+            ],
+            options={
+                'verbose_name': 'Событие рецепта',
+                'verbose_name_plural': 'События рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-pub_date'], name='recipe_trending_idx'),
+        ),
+        migrations.AddField(
+            model_name='recipeevent',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+    ]
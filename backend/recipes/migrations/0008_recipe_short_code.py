@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='short_code',
+            field=models.CharField(editable=False, max_length=16, null=True, unique=True, verbose_name='Короткий код ссылки'),
+        ),
+    ]
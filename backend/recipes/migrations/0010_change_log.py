@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recipe', 'Рецепт'), ('favorite', 'Избранное'), ('shopping_cart', 'Корзина'), ('subscription', 'Подписка')], max_length=16, verbose_name='Тип')),
+                ('object_id', models.PositiveBigIntegerField(help_text='id рецепта, для подписки — id автора', verbose_name='id объекта')),
+                ('owner', models.PositiveBigIntegerField(help_text='Автор рецепта или пользователь, которому принадлежит избранное, корзина или подписка', verbose_name='id владельца')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удален')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Время')),
+            ],
+            options={
+                'verbose_name': 'Запись журнала изменений',
+                'verbose_name_plural': 'Журнал изменений',
+                'indexes': [models.Index(fields=['owner', 'id'], name='changelog_owner_idx'), models.Index(fields=['object_id', 'id'], name='changelog_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:17
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_ids_to_positions(apps, schema_editor):
+    """Выданные до миграции токены (id записей) остаются верными."""
+    ChangeLogEntry = apps.get_model('recipes', 'ChangeLogEntry')
+    ChangeLogEntry.objects.update(position=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_change_log'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='changelogentry',
+            name='changelog_owner_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='changelogentry',
+            name='changelog_object_idx',
+        ),
+        migrations.AddField(
+            model_name='changelogentry',
+            name='position',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Порядок фиксации; пусто, пока запись не получена синхронизацией', null=True, unique=True, verbose_name='Позиция'),
+        ),
+        migrations.RunPython(
+            copy_ids_to_positions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['owner', 'position'], name='changelog_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['object_id', 'position'], name='changelog_object_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(condition=models.Q(('position__isnull', True)), fields=['id'], name='changelog_pending_idx'),
+        ),
+    ]
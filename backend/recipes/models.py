@@ -7,7 +7,9 @@ from foodgram.constants import (
     INGREDIENT_NAME_MAX_LENGTH,
     RECIPE_IMAGE_UPLOAD_TO,
     RECIPE_NAME_MAX_LENGTH,
+    SHORT_LINK_MAX_LENGTH,
 )
+from recipes.registry import get_ingredient_registry
 from users.models import User
 
 
@@ -59,11 +61,33 @@ class Recipe(models.Model):
         default=timezone.now,
         db_index=True
     )
+    trending_score = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+        editable=False,
+    )
+    short_code = models.CharField(
+        verbose_name='Короткий код ссылки',
+        max_length=SHORT_LINK_MAX_LENGTH,
+        unique=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('-trending_score', '-pub_date'),
+                name='recipe_trending_idx',
+            ),
+            models.Index(
+                fields=('cooking_time',),
+                name='recipe_cooking_time_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -101,14 +125,104 @@ class RecipeIngredient(models.Model):
                 name='unique_recipe_ingredient'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('ingredient', 'recipe'),
+                name='recipe_ingredient_lookup_idx',
+            )
+        ]
 
     def __str__(self):
-        return (
-            f'{self.recipe.name}: '
-            f'{self.ingredient.name} - '
-            f'{self.amount} '
-            f'{self.ingredient.measurement_unit}'
+        name, measurement_unit = (
+            get_ingredient_registry().get(self.ingredient_id)
+            or (self.ingredient.name, self.ingredient.measurement_unit)
         )
+        return f'{self.recipe.name}: {name} - {self.amount} {measurement_unit}'
+
+
+class RecipeDocument(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document',
+    )
+    data = models.JSONField(verbose_name='Документ')
+    updated_at = models.DateTimeField(
+        verbose_name='Обновлен', auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Документ рецепта'
+        verbose_name_plural = 'Документы рецептов'
+
+    def __str__(self):
+        return f'Документ рецепта {self.recipe_id}'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='timeline_user_pub_date_idx',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} в ленте {self.user_id}'
+
+
+class RecipeEvent(models.Model):
+    """Добавление рецепта в избранное или корзину.
+
+    Журнал, из которого update_trending_scores пересчитывает
+    популярность рецептов; обработанные записи удаляются.
+    """
+
+    class Kind(models.TextChoices):
+        FAVORITE = 'favorite', 'Избранное'
+        SHOPPING_CART = 'shopping_cart', 'Корзина'
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='events',
+    )
+    kind = models.CharField(
+        verbose_name='Тип', max_length=16, choices=Kind.choices)
+    created_at = models.DateTimeField(
+        verbose_name='Время', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Событие рецепта'
+        verbose_name_plural = 'События рецептов'
+
+    def __str__(self):
+        return f'{self.get_kind_display()}: {self.recipe_id}'
 
 
 class BaseUserRecipeModel(models.Model):
@@ -149,3 +263,63 @@ class ShoppingCart(BaseUserRecipeModel):
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзина'
         default_related_name = 'shopping_carts'
+
+
+class ChangeLogEntry(models.Model):
+    """Изменение данных, которые клиенты синхронизируют через /api/sync/.
+
+    Журнал только дополняется: запись указывает, какой объект изменился
+    или удален, а сами данные берутся при синхронизации. Позиция записи
+    служит токеном синхронизации; она назначается после фиксации
+    транзакции записи (recipes.change_log.assign_positions()). Старые
+    записи удаляет команда compact_change_log.
+    """
+
+    class Kind(models.TextChoices):
+        RECIPE = 'recipe', 'Рецепт'
+        FAVORITE = 'favorite', 'Избранное'
+        SHOPPING_CART = 'shopping_cart', 'Корзина'
+        SUBSCRIPTION = 'subscription', 'Подписка'
+
+    kind = models.CharField(
+        verbose_name='Тип', max_length=16, choices=Kind.choices)
+    object_id = models.PositiveBigIntegerField(
+        verbose_name='id объекта',
+        help_text='id рецепта, для подписки — id автора',
+    )
+    owner = models.PositiveBigIntegerField(
+        verbose_name='id владельца',
+        help_text='Автор рецепта или пользователь, которому '
+                  'принадлежит избранное, корзина или подписка',
+    )
+    deleted = models.BooleanField(verbose_name='Удален', default=False)
+    created_at = models.DateTimeField(
+        verbose_name='Время', default=timezone.now, db_index=True)
+    position = models.PositiveBigIntegerField(
+        verbose_name='Позиция',
+        help_text='Порядок фиксации; пусто, пока запись не получена '
+                  'синхронизацией',
+        null=True,
+        blank=True,
+        unique=True,
+    )
+
+    class Meta:
+        verbose_name = 'Запись журнала изменений'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            models.Index(
+                fields=('owner', 'position'), name='changelog_owner_idx'),
+            models.Index(
+                fields=('object_id', 'position'),
+                name='changelog_object_idx'),
+            models.Index(
+                fields=('id',),
+                condition=models.Q(position__isnull=True),
+                name='changelog_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        action = 'удаление' if self.deleted else 'изменение'
+        return f'{self.get_kind_display()} {self.object_id}: {action}'
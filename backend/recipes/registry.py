@@ -0,0 +1,114 @@
+"""Справочник ингредиентов id -> (название, единица измерения).
+
+Хранится в файле, который каждый процесс отображает в память (mmap),
+поэтому все воркеры gunicorn делят одни и те же страницы. Формат:
+заголовок, отсортированный массив id (int64), смещения строк (uint32)
+и строки в UTF-8 вида «название\\x1fединица».
+"""
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+from foodgram.invalidation import get_generation, invalidate
+
+MAGIC = b'FGIR'
+HEADER = struct.Struct('=4sI')
+SEPARATOR = '\x1f'
+INVALIDATION_NAME = 'ingredient-registry'
+
+
+def get_registry_path():
+    return Path(settings.CATALOG_SNAPSHOT_DIR) / 'ingredients.registry'
+
+
+def write_registry(rows, path=None):
+    """Записывает справочник из строк (id, name, measurement_unit)."""
+    path = path or get_registry_path()
+    rows = sorted(rows)
+    ids = array('q', (row[0] for row in rows))
+    offsets = array('I', [0])
+    blob = bytearray()
+    for _, name, measurement_unit in rows:
+        blob += f'{name}{SEPARATOR}{measurement_unit}'.encode()
+        offsets.append(len(blob))
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(ids)))
+        file.write(ids.tobytes())
+        file.write(offsets.tobytes())
+        file.write(blob)
+    os.replace(tmp_path, path)
+    invalidate(INVALIDATION_NAME)
+
+
+class IngredientRegistry:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.stat = os.fstat(file.fileno())
+            self._mmap = mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f'{path} не является справочником ингредиентов')
+        view = memoryview(self._mmap)
+        ids_end = HEADER.size + 8 * count
+        offsets_end = ids_end + 4 * (count + 1)
+        self._ids = view[HEADER.size:ids_end].cast('q')
+        self._offsets = view[ids_end:offsets_end].cast('I')
+        self._blob_start = offsets_end
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _index(self, ingredient_id):
+        index = bisect_left(self._ids, ingredient_id)
+        if index < len(self._ids) and self._ids[index] == ingredient_id:
+            return index
+        return None
+
+    def __contains__(self, ingredient_id):
+        return self._index(ingredient_id) is not None
+
+    def get(self, ingredient_id, default=None):
+        index = self._index(ingredient_id)
+        if index is None:
+            return default
+        start = self._blob_start + self._offsets[index]
+        end = self._blob_start + self._offsets[index + 1]
+        return tuple(
+            self._mmap[start:end].decode().split(SEPARATOR, 1))
+
+
+_registry = None
+_generation = None
+
+
+def get_ingredient_registry():
+    """Справочник текущего процесса; перечитывается после пересборки.
+
+    Пока поколение справочника в шине инвалидации не менялось, файл
+    не проверяется: функция вызывается для каждой строки ингредиента.
+    """
+    global _registry, _generation
+    generation = get_generation(INVALIDATION_NAME)
+    if (_registry is not None and generation is not None
+            and generation == _generation):
+        return _registry
+    path = get_registry_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        from recipes.catalog import rebuild_catalog_snapshot
+        rebuild_catalog_snapshot()
+        stat = os.stat(path)
+    if (_registry is None
+            or (_registry.stat.st_ino, _registry.stat.st_mtime_ns)
+            != (stat.st_ino, stat.st_mtime_ns)):
+        _registry = IngredientRegistry(path)
+    _generation = generation
+    return _registry
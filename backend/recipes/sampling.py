@@ -0,0 +1,48 @@
+import random
+
+from foodgram.constants import (
+    RANDOM_SAMPLE_ATTEMPTS,
+    RANDOM_SAMPLE_OVERSAMPLING,
+)
+from recipes.models import Recipe
+
+
+def sample_recipe_ids(limit):
+    """id limit случайных рецептов без сортировки всей таблицы.
+
+    Берутся случайные числа из диапазона id, а несуществующие (пропуски
+    после удалений) отбрасываются, поэтому выборка равномерна, а каждый
+    запрос — поиск по первичному ключу не более чем limit *
+    RANDOM_SAMPLE_OVERSAMPLING значений. Если таблица слишком
+    разрежена, недостающие рецепты добираются подряд со случайного id
+    (дойдя до конца таблицы — с ее начала), поэтому рецептов всегда
+    min(limit, число рецептов).
+    """
+    # Отдельные запросы: MIN и MAX в одном запросе SQLite считает
+    # полным проходом по таблице, а так это два поиска по индексу.
+    recipe_ids = Recipe.objects.values_list('pk', flat=True)
+    low = recipe_ids.order_by('pk').first()
+    if low is None:
+        return []
+    high = recipe_ids.order_by('-pk').first()
+    found = set()
+    for _ in range(RANDOM_SAMPLE_ATTEMPTS):
+        needed = (limit - len(found)) * RANDOM_SAMPLE_OVERSAMPLING
+        if needed <= 0:
+            break
+        if high - low < needed:
+            candidates = set(range(low, high + 1))
+        else:
+            candidates = {random.randint(low, high) for _ in range(needed)}
+        found.update(Recipe.objects.filter(
+            pk__in=candidates - found).values_list('pk', flat=True))
+    if len(found) < limit:
+        start = random.randint(low, high)
+        # По кругу: от случайного id до конца таблицы, затем с начала.
+        for remaining in (recipe_ids.filter(pk__gte=start),
+                          recipe_ids.filter(pk__lt=start)):
+            found.update(remaining.exclude(pk__in=found).order_by(
+                'pk')[:limit - len(found)])
+            if len(found) >= limit:
+                break
+    return random.sample(sorted(found), min(limit, len(found)))
@@ -0,0 +1,92 @@
+"""Короткие ссылки на рецепты.
+
+Код — id рецепта в base62, перемешанный умножением на число, взаимно
+простое с 62 ** длина, поэтому коды разных рецептов не совпадают
+и не идут подряд, а по коду восстанавливается id. Код сохраняется
+в рецепте при первом запросе ссылки.
+"""
+from string import ascii_letters, digits
+
+from django.core.cache import cache
+
+from foodgram.constants import SHORT_LINK_LENGTH, SHORT_LINK_LRU_SIZE
+from foodgram.invalidation import LocalCache
+from recipes.models import Recipe
+
+ALPHABET = digits + ascii_letters
+MULTIPLIER = 1580030173
+
+
+def get_short_code(recipe_id):
+    length = SHORT_LINK_LENGTH
+    while recipe_id >= len(ALPHABET) ** length:
+        length += 1
+    number = recipe_id * MULTIPLIER % len(ALPHABET) ** length
+    code = []
+    for _ in range(length):
+        number, index = divmod(number, len(ALPHABET))
+        code.append(ALPHABET[index])
+    return ''.join(reversed(code))
+
+
+def get_recipe_id(code):
+    """id рецепта, которому выдается код, или None, если такой код
+    не выдается никому."""
+    if len(code) < SHORT_LINK_LENGTH:
+        return None
+    number = 0
+    for char in code:
+        index = ALPHABET.find(char)
+        if index < 0:
+            return None
+        number = number * len(ALPHABET) + index
+    modulus = len(ALPHABET) ** len(code)
+    recipe_id = number * pow(MULTIPLIER, -1, modulus) % modulus
+    if get_short_code(recipe_id) != code:
+        return None
+    return recipe_id
+
+
+def get_cache_key(code):
+    return f'short-link:{code}'
+
+
+def ensure_short_code(recipe):
+    """Код ссылки рецепта; создается, если его еще нет."""
+    if recipe.short_code is None:
+        recipe.short_code = get_short_code(recipe.pk)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            short_code=recipe.short_code)
+        cache.set(get_cache_key(recipe.short_code), recipe.pk, None)
+    return recipe.short_code
+
+
+recipe_ids = LocalCache('short-links', SHORT_LINK_LRU_SIZE)
+
+
+def forget_short_code(code):
+    """Удаляет код из кешей, например при удалении рецепта."""
+    cache.delete(get_cache_key(code))
+    recipe_ids.invalidate(code)
+
+
+async def aresolve_short_code(code):
+    """id рецепта по коду: из памяти процесса, общего кеша или БД.
+
+    Коды, которые не выдаются, отклоняются без обращения к кешам.
+    """
+    if get_recipe_id(code) is None:
+        return None
+    generation = recipe_ids.get_generation(code)
+    recipe_id = recipe_ids.get(code, generation)
+    if recipe_id is not None:
+        return recipe_id
+    recipe_id = await cache.aget(get_cache_key(code))
+    if recipe_id is None:
+        recipe_id = await Recipe.objects.filter(
+            short_code=code).values_list('pk', flat=True).afirst()
+        if recipe_id is None:
+            return None
+        await cache.aset(get_cache_key(code), recipe_id, None)
+    recipe_ids.set(code, recipe_id, generation)
+    return recipe_id
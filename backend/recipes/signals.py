@@ -0,0 +1,177 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.caching import bump_list_version, bump_user_version
+from recipes.catalog import rebuild_catalog_snapshot
+from recipes.counters import publish_counters
+from recipes.documents import (
+    rebuild_related_documents,
+    schedule_document_rebuild,
+)
+from recipes.models import (
+    ChangeLogEntry,
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeDocument,
+    RecipeEvent,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from recipes.short_links import forget_short_code, get_short_code
+from tasks.queue import enqueue
+from users.models import Subscribe, User
+
+DOCUMENT_FIELDS = {
+    User: ('author', frozenset(
+        ('email', 'username', 'first_name', 'last_name', 'avatar'))),
+    Ingredient: ('ingredients', frozenset(('name', 'measurement_unit'))),
+}
+"""Модель -> (поле рецепта, поля модели, которые входят в документ)."""
+
+
+def has_changed_fields(sender, instance, fields):
+    """Отличаются ли поля экземпляра от сохраненных в БД."""
+    fields = sorted(fields)
+    stored = sender.objects.filter(pk=instance.pk).values_list(
+        *fields).first()
+    return stored != tuple(
+        sender._meta.get_field(field).get_prep_value(
+            getattr(instance, field))
+        for field in fields
+    )
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Ingredient)
+def detect_document_changes(sender, instance, update_fields, **kwargs):
+    # Например, set_password() сохраняет пользователя целиком, но его
+    # данные в документах рецептов не меняются.
+    _, fields = DOCUMENT_FIELDS[sender]
+    if update_fields is not None:
+        fields = fields & update_fields
+    instance._documents_changed = bool(fields) and not (
+        instance._state.adding
+    ) and has_changed_fields(sender, instance, fields)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Ingredient)
+def rebuild_related_documents_later(sender, instance, created, **kwargs):
+    """Сбрасывает документы рецептов автора или ингредиента и ставит
+    их пересборку в очередь: рецептов может быть много.
+
+    До пересборки недостающие документы собираются при чтении.
+    """
+    if created or not instance._documents_changed:
+        return
+    lookup, _ = DOCUMENT_FIELDS[sender]
+    RecipeDocument.objects.filter(**{f'recipe__{lookup}': instance}).delete()
+    enqueue(rebuild_related_documents, lookup, instance.pk)
+    transaction.on_commit(bump_list_version)
+
+
+@receiver(post_save, sender=Recipe)
+def rebuild_recipe_document(sender, instance, **kwargs):
+    # Документ, загруженный вместе с рецептом, больше не действителен.
+    if Recipe.document.related.is_cached(instance):
+        Recipe.document.related.delete_cached_value(instance)
+    schedule_document_rebuild(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def rebuild_recipe_ingredients_document(sender, instance, **kwargs):
+    schedule_document_rebuild(instance.recipe_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_recipe_short_link(sender, instance, **kwargs):
+    # Код зависит только от id: экземпляр мог быть загружен до выдачи
+    # ссылки, и short_code в нем еще пустой.
+    transaction.on_commit(
+        partial(forget_short_code, get_short_code(instance.pk)))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def rebuild_ingredient_catalog(sender, **kwargs):
+    transaction.on_commit(rebuild_catalog_snapshot)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def log_recipe_event(sender, instance, created, **kwargs):
+    if not created:
+        return
+    RecipeEvent.objects.create(
+        recipe_id=instance.recipe_id,
+        kind=(RecipeEvent.Kind.FAVORITE if sender is Favorite
+              else RecipeEvent.Kind.SHOPPING_CART),
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_list(sender, **kwargs):
+    transaction.on_commit(bump_list_version)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def invalidate_user_data(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    transaction.on_commit(partial(bump_user_version, user_id))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def update_user_counters(sender, instance, created=True, **kwargs):
+    if created:
+        transaction.on_commit(partial(publish_counters, instance.user_id))
+
+
+CHANGE_LOG_FIELDS = {
+    Recipe: (ChangeLogEntry.Kind.RECIPE, 'pk', 'author_id'),
+    Favorite: (ChangeLogEntry.Kind.FAVORITE, 'recipe_id', 'user_id'),
+    ShoppingCart: (
+        ChangeLogEntry.Kind.SHOPPING_CART, 'recipe_id', 'user_id'),
+    Subscribe: (ChangeLogEntry.Kind.SUBSCRIPTION, 'author_id', 'user_id'),
+}
+"""Модель -> (тип записи журнала, поле id объекта, поле id владельца)."""
+
+
+def log_change(sender, instance, deleted):
+    kind, object_field, owner_field = CHANGE_LOG_FIELDS[sender]
+    ChangeLogEntry.objects.create(
+        kind=kind,
+        object_id=getattr(instance, object_field),
+        owner=getattr(instance, owner_field),
+        deleted=deleted,
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscribe)
+def log_saved(sender, instance, **kwargs):
+    log_change(sender, instance, deleted=False)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscribe)
+def log_deleted(sender, instance, **kwargs):
+    log_change(sender, instance, deleted=True)
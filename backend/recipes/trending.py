@@ -0,0 +1,61 @@
+"""Популярность рецептов с затуханием во времени.
+
+Вклад добавления с весом w в момент t к моменту now равен
+w * 2 ** (-(now - t) / TRENDING_HALF_LIFE). Общий множитель
+2 ** (-now / TRENDING_HALF_LIFE) на порядок рецептов не влияет, поэтому
+хранится log2 суммы w * 2 ** (t / TRENDING_HALF_LIFE): значение не нужно
+пересчитывать со временем, а новые добавления просто прибавляются к нему.
+"""
+import math
+
+from django.db import transaction
+
+from foodgram.constants import (
+    TRENDING_FAVORITE_WEIGHT,
+    TRENDING_HALF_LIFE,
+    TRENDING_SHOPPING_CART_WEIGHT,
+)
+from recipes.models import Recipe, RecipeEvent
+
+EVENT_WEIGHTS = {
+    RecipeEvent.Kind.FAVORITE: TRENDING_FAVORITE_WEIGHT,
+    RecipeEvent.Kind.SHOPPING_CART: TRENDING_SHOPPING_CART_WEIGHT,
+}
+
+
+def logaddexp2(first, second):
+    """log2(2 ** first + 2 ** second) без переполнения."""
+    high, low = max(first, second), min(first, second)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def get_event_score(kind, created_at):
+    return (math.log2(EVENT_WEIGHTS[kind])
+            + created_at.timestamp() / TRENDING_HALF_LIFE)
+
+
+def update_trending_scores(batch_size):
+    """Учитывает накопившиеся события, возвращает их количество."""
+    processed = 0
+    while True:
+        with transaction.atomic():
+            events = list(RecipeEvent.objects.order_by('pk').values_list(
+                'pk', 'recipe_id', 'kind', 'created_at')[:batch_size])
+            if not events:
+                return processed
+            scores = {}
+            for _, recipe_id, kind, created_at in events:
+                score = get_event_score(kind, created_at)
+                scores[recipe_id] = (
+                    logaddexp2(scores[recipe_id], score)
+                    if recipe_id in scores else score
+                )
+            recipes = list(Recipe.objects.select_for_update().filter(
+                pk__in=scores).only('trending_score'))
+            for recipe in recipes:
+                recipe.trending_score = logaddexp2(
+                    recipe.trending_score, scores[recipe.pk])
+            Recipe.objects.bulk_update(recipes, ('trending_score',))
+            RecipeEvent.objects.filter(
+                pk__in=[event[0] for event in events]).delete()
+        processed += len(events)
@@ -0,0 +1,13 @@
+from django.http import Http404, HttpResponsePermanentRedirect
+
+from foodgram.constants import SHORT_LINK_MAX_AGE
+from recipes.short_links import aresolve_short_code
+
+
+async def short_link_redirect(request, code):
+    recipe_id = await aresolve_short_code(code)
+    if recipe_id is None:
+        raise Http404('Ссылка не найдена.')
+    response = HttpResponsePermanentRedirect(f'/recipes/{recipe_id}')
+    response['Cache-Control'] = f'public, max-age={SHORT_LINK_MAX_AGE}'
+    return response
@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from tasks.models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'created_at',
+        'finished_at',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key')
+    readonly_fields = ('created_at', 'finished_at', 'error')
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodgram.constants import TASKS_RETENTION_DAYS
+from tasks.queue import clean_tasks
+
+
+class Command(BaseCommand):
+    help = 'Удаление завершенных задач очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=TASKS_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        deleted = clean_tasks(
+            timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Удалено задач: {deleted}'))
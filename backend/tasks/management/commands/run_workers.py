@@ -0,0 +1,43 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from foodgram.constants import TASKS_WORKER_PROCESSES, TASKS_WORKER_THREADS
+from tasks.worker import run_worker
+
+
+class Command(BaseCommand):
+    help = ('Обработчики очереди отложенных задач: процессы по --threads '
+            'потоков; с --once завершаются, когда очередь опустеет')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=TASKS_WORKER_PROCESSES)
+        parser.add_argument(
+            '--threads', type=int, default=TASKS_WORKER_THREADS)
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        threads, once = options['threads'], options['once']
+        if options['processes'] == 1:
+            run_worker(threads, once)
+            return
+        # Дочерние процессы не должны унаследовать открытые соединения.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=run_worker, args=(threads, once))
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+
+        def stop(*args):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        for process in processes:
+            process.join()
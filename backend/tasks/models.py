@@ -0,0 +1,70 @@
+from django.db import models
+from django.utils import timezone
+
+from foodgram.constants import TASKS_MAX_ATTEMPTS
+
+
+class Task(models.Model):
+    """Отложенный вызов функции, выполняемый командой run_workers.
+
+    Задача создается в транзакции вместе с данными и становится видна
+    обработчикам после ее фиксации. Задача с ключом идемпотентности
+    создается один раз, пока прежняя запись с тем же ключом не удалена
+    командой clean_tasks.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    name = models.CharField(
+        verbose_name='Функция',
+        max_length=255,
+        help_text='Путь импорта функции',
+    )
+    args = models.JSONField(verbose_name='Аргументы', default=list)
+    key = models.CharField(
+        verbose_name='Ключ идемпотентности',
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попытки', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток', default=TASKS_MAX_ATTEMPTS)
+    run_at = models.DateTimeField(
+        verbose_name='Выполнить после', default=timezone.now)
+    locked_until = models.DateTimeField(
+        verbose_name='Захвачена до',
+        null=True,
+        blank=True,
+        help_text='После этого времени задача, обработчик которой '
+                  'завершился аварийно, выполняется снова',
+    )
+    error = models.TextField(verbose_name='Последняя ошибка', blank=True)
+    created_at = models.DateTimeField(
+        verbose_name='Создана', default=timezone.now)
+    finished_at = models.DateTimeField(
+        verbose_name='Завершена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        ordering = ('-created_at',)
+        indexes = [
+            models.Index(
+                fields=('status', 'run_at'), name='task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
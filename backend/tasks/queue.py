@@ -0,0 +1,150 @@
+"""Очередь отложенных задач в базе данных.
+
+Обработчики (команда run_workers) забирают задачи через
+SELECT ... FOR UPDATE SKIP LOCKED, поэтому конкурирующие обработчики
+не ждут друг друга. В базах без SKIP LOCKED (SQLite) задача
+захватывается условным UPDATE по прочитанному состоянию.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from foodgram.constants import (
+    TASKS_CLAIM_CANDIDATES,
+    TASKS_LOCK_TIMEOUT,
+    TASKS_MAX_ATTEMPTS,
+    TASKS_RETRY_BASE_DELAY,
+    TASKS_RETRY_MAX_DELAY,
+)
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'foodgram_tasks'
+
+Status = Task.Status
+
+
+def get_task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def notify_workers():
+    """Будит обработчиков, слушающих NOTIFY_CHANNEL (PostgreSQL);
+    без этого они заберут задачу при очередном опросе."""
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, ''])
+
+
+def enqueue(func, *args, key=None, delay=0,
+            max_attempts=TASKS_MAX_ATTEMPTS):
+    """Ставит вызов func(*args) в очередь.
+
+    Задача записывается в текущей транзакции: при откате она
+    не выполняется, а после фиксации обработчики будятся через
+    transaction.on_commit. Аргументы должны сериализоваться в JSON.
+    Повторный вызов с тем же key не создает новую задачу.
+    """
+    Task.objects.bulk_create(
+        [Task(
+            name=get_task_name(func),
+            args=list(args),
+            key=key,
+            max_attempts=max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )],
+        ignore_conflicts=key is not None,
+    )
+    transaction.on_commit(notify_workers)
+
+
+def get_lock_fields(now):
+    return {
+        'status': Status.RUNNING,
+        'attempts': F('attempts') + 1,
+        'locked_until': now + timedelta(seconds=TASKS_LOCK_TIMEOUT),
+    }
+
+
+def claim_task():
+    """Захватывает задачу, готовую к выполнению, или возвращает None.
+
+    Готовы задачи в очереди, срок которых наступил, и задачи, захват
+    которых истек: их обработчик завершился аварийно.
+    """
+    now = timezone.now()
+    ready = Task.objects.using(DEFAULT_DB_ALIAS).filter(
+        Q(status=Status.QUEUED, run_at__lte=now)
+        | Q(status=Status.RUNNING, locked_until__lt=now)
+    ).order_by('run_at')
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            task = ready.select_for_update(skip_locked=True).first()
+            if task is None:
+                return None
+            Task.objects.filter(pk=task.pk).update(**get_lock_fields(now))
+    else:
+        for task in ready[:TASKS_CLAIM_CANDIDATES]:
+            if Task.objects.filter(
+                pk=task.pk, status=task.status, attempts=task.attempts,
+            ).update(**get_lock_fields(now)):
+                break
+        else:
+            return None
+    task.attempts += 1
+    task.status = Status.RUNNING
+    return task
+
+
+def get_retry_delay(attempts):
+    """Задержка перед повтором (с): растет вдвое с каждой попыткой,
+    со случайным разбросом, чтобы повторы не шли одновременно."""
+    delay = min(TASKS_RETRY_MAX_DELAY,
+                TASKS_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1)
+
+
+def run_task(task):
+    """Выполняет захваченную задачу и сохраняет результат."""
+    tasks = Task.objects.filter(pk=task.pk)
+    try:
+        if task.attempts > task.max_attempts:
+            raise RuntimeError('Превышено число попыток')
+        import_string(task.name)(*task.args)
+    except Exception:
+        logger.exception('Ошибка задачи %s (попытка %s)',
+                         task.name, task.attempts)
+        now = timezone.now()
+        if task.attempts >= task.max_attempts:
+            tasks.update(
+                status=Status.FAILED, locked_until=None, finished_at=now,
+                error=traceback.format_exc())
+        else:
+            tasks.update(
+                status=Status.QUEUED, locked_until=None,
+                run_at=now + timedelta(
+                    seconds=get_retry_delay(task.attempts)),
+                error=traceback.format_exc())
+        return False
+    tasks.update(
+        status=Status.DONE, locked_until=None, finished_at=timezone.now())
+    return True
+
+
+def clean_tasks(before):
+    """Удаляет выполненные и окончательно упавшие задачи, завершенные
+    до before; их ключи идемпотентности снова можно использовать."""
+    deleted, _ = Task.objects.filter(
+        status__in=(Status.DONE, Status.FAILED), finished_at__lt=before,
+    ).delete()
+    return deleted
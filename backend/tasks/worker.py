@@ -0,0 +1,100 @@
+"""Процесс обработчиков очереди задач.
+
+Потоки процесса по очереди забирают и выполняют задачи, а когда
+очередь пуста, ждут TASKS_POLL_INTERVAL или уведомления о новой задаче
+(LISTEN на PostgreSQL в главном потоке процесса).
+"""
+import logging
+import signal
+import threading
+
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    DatabaseError,
+    close_old_connections,
+    connections,
+)
+
+from foodgram.constants import PUBSUB_RECONNECT_DELAY, TASKS_POLL_INTERVAL
+from foodgram.db_routers import use_primary
+from tasks.queue import NOTIFY_CHANNEL, claim_task, run_task
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    def __init__(self, threads, once=False):
+        self.threads = threads
+        self.once = once
+        self.stopped = threading.Event()
+        self.wakeup = threading.Event()
+
+    def stop(self, *args):
+        self.stopped.set()
+        self.wakeup.set()
+
+    def run(self):
+        """Запускает потоки и ждет их завершения (по SIGTERM или SIGINT,
+        а с once — когда очередь опустеет)."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        threads = [
+            threading.Thread(target=self.process, name=f'tasks-{number}')
+            for number in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        if not self.once:
+            self.listen()
+        for thread in threads:
+            thread.join()
+
+    def process(self):
+        # Задачи выполняются сразу после фиксации данных, которых еще
+        # может не быть на репликах.
+        use_primary.set(True)
+        try:
+            while not self.stopped.is_set():
+                try:
+                    task = claim_task()
+                except DatabaseError:
+                    logger.exception('Ошибка при получении задачи')
+                    task = None
+                if task is not None:
+                    run_task(task)
+                elif self.once:
+                    return
+                else:
+                    self.wakeup.wait(TASKS_POLL_INTERVAL)
+                    self.wakeup.clear()
+                close_old_connections()
+        finally:
+            connections.close_all()
+
+    def listen(self):
+        """Будит потоки по уведомлениям о новых задачах до остановки."""
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'postgresql':
+            self.stopped.wait()
+            return
+
+        import psycopg
+
+        params = connection.get_connection_params()
+        params.pop('cursor_factory', None)
+        while not self.stopped.is_set():
+            try:
+                with psycopg.connect(autocommit=True, **params) as listener:
+                    listener.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                    while not self.stopped.is_set():
+                        for _ in listener.notifies(
+                                timeout=TASKS_POLL_INTERVAL, stop_after=1):
+                            self.wakeup.set()
+            except Exception:
+                logger.exception('Ошибка соединения LISTEN %s',
+                                 NOTIFY_CHANNEL)
+                self.stopped.wait(PUBSUB_RECONNECT_DELAY)
+
+
+def run_worker(threads, once=False):
+    Worker(threads, once).run()
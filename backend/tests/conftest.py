@@ -0,0 +1,50 @@
+import pytest
+from django.core.cache import cache
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def create_user(username, **fields):
+    return User.objects.create_user(
+        email=f'{username}@example.com',
+        username=username,
+        first_name=username.title(),
+        last_name='Тестов',
+        password='Pa55word-test',
+        **fields,
+    )
+
+
+def get_client(user=None):
+    if user is None:
+        return Client()
+    token, _ = Token.objects.get_or_create(user=user)
+    return Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+
+@pytest.fixture
+def user(db):
+    return create_user('reader')
+
+
+@pytest.fixture
+def author(db):
+    return create_user('author', avatar='users/аватар автора.png')
+
+
+@pytest.fixture
+def ingredients(db):
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(10)
+    )
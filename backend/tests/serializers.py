@@ -0,0 +1,70 @@
+"""Эталонные декларативные сериализаторы DRF для сравнения с быстрым
+путем: читают модели и не используют документы рецептов."""
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from api.views import RecipeViewSet
+from recipes.models import Recipe, RecipeIngredient
+from users.models import Subscribe, User
+
+
+class ReferenceUserSerializer(serializers.ModelSerializer):
+    is_subscribed = serializers.SerializerMethodField()
+    avatar = serializers.ImageField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = ('email', 'id', 'username', 'first_name', 'last_name',
+                  'is_subscribed', 'avatar')
+
+    def get_is_subscribed(self, obj):
+        subscribed_authors = self.context.get('subscribed_authors')
+        if subscribed_authors is not None:
+            return obj.pk in subscribed_authors
+        user = self.context['request'].user
+        return user.is_authenticated and Subscribe.objects.filter(
+            user=user, author=obj).exists()
+
+
+class ReferenceIngredientSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class ReferenceRecipeSerializer(serializers.ModelSerializer):
+    author = ReferenceUserSerializer()
+    ingredients = ReferenceIngredientSerializer(
+        many=True, source='recipe_ingredients')
+    is_favorited = serializers.BooleanField()
+    is_in_shopping_cart = serializers.BooleanField()
+    image = serializers.ImageField()
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'author', 'ingredients', 'is_favorited',
+                  'is_in_shopping_cart', 'name', 'image', 'text',
+                  'cooking_time')
+
+
+def prefetch_ingredients(recipes):
+    """Ингредиенты в порядке добавления, как в документах рецептов."""
+    return recipes.prefetch_related(Prefetch(
+        'recipe_ingredients',
+        RecipeIngredient.objects.select_related('ingredient').order_by('id'),
+    ))
+
+
+class ReferenceRecipeViewSet(RecipeViewSet):
+    def list(self, request, *args, **kwargs):
+        queryset = prefetch_ingredients(
+            self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        serializer = ReferenceRecipeSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
@@ -0,0 +1,28 @@
+"""Настройки тестов: по умолчанию SQLite и временные каталоги.
+
+С DB_ENGINE=postgresql и переменными DATABASE_* тесты идут на локальном
+PostgreSQL, и выполняются тесты, которым он нужен (LISTEN/NOTIFY).
+"""
+import os
+import tempfile
+
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('DB_ENGINE', 'sqlite')
+
+from foodgram.settings import *  # noqa: E402,F401,F403
+from foodgram.settings import DATABASES, DB_ENGINE  # noqa: E402
+
+TEST_ROOT = tempfile.mkdtemp(prefix='foodgram-tests-')
+MEDIA_ROOT = os.path.join(TEST_ROOT, 'media')
+CATALOG_SNAPSHOT_DIR = os.path.join(MEDIA_ROOT, 'catalog')
+INVALIDATION_TRANSPORT = 'local'
+
+# Вторая база для тестов маршрутизации чтений; реплики включаются
+# в самих тестах через override_settings.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': (
+        {'NAME': f'test_{DATABASES["default"]["NAME"]}_replica'}
+        if DB_ENGINE == 'postgresql' else {}
+    ),
+}
@@ -0,0 +1,80 @@
+"""Асинхронные view отвечают так же, как синхронные ViewSet."""
+import pytest
+from django.test import RequestFactory
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+
+from api.async_views import (
+    IngredientDetailView,
+    IngredientListView,
+    RecipeDetailView,
+    RecipeListView,
+    ShoppingCartCountView,
+)
+from recipes.models import Ingredient, Recipe, ShoppingCart
+from tests.conftest import get_client
+
+
+@pytest.fixture
+def recipe(user, author, ingredients):
+    recipe = Recipe.objects.create(
+        author=author,
+        name='Рецепт',
+        image='recipes/images/рецепт.png',
+        text='Описание',
+        cooking_time=5,
+    )
+    recipe.ingredients.set(ingredients[:2], through_defaults={'amount': 3})
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    return recipe
+
+
+def get_sync_response(view_class, path, user=None, **kwargs):
+    headers = {}
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        headers['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+    response = view_class.get_sync_view()(
+        RequestFactory().get(path, **headers), **kwargs)
+    response.render()
+    return response
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', (False, True))
+@pytest.mark.parametrize('view_class, path', (
+    (RecipeListView, '/api/recipes/?limit=5'),
+    (RecipeDetailView, '/api/recipes/{recipe}/'),
+    (IngredientListView, '/api/ingredients/?search=ингр'),
+    (IngredientDetailView, '/api/ingredients/{ingredient}/'),
+    (ShoppingCartCountView, '/api/recipes/shopping_cart_count/'),
+))
+def test_async_view_matches_viewset(recipe, ingredients, user,
+                                    authenticated, view_class, path):
+    viewer = user if authenticated else None
+    path = path.format(recipe=recipe.pk, ingredient=ingredients[0].pk)
+    match = resolve(path.split('?')[0])
+    assert match.func.view_class is view_class
+
+    response = get_client(viewer).get(path)
+    expected = get_sync_response(view_class, path, viewer, **match.kwargs)
+
+    assert response.status_code == expected.status_code
+    assert response.content == expected.content
+    for header in ('Content-Type', 'WWW-Authenticate'):
+        assert response.get(header) == expected.get(header)
+
+
+@pytest.mark.django_db
+def test_ingredient_search_matches_name_start(ingredients):
+    salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def search(query):
+        response = get_client().get('/api/ingredients/', {'search': query})
+        assert response.status_code == 200
+        return [ingredient['id'] for ingredient in response.json()]
+
+    assert search('сол') == [salt.pk]
+    assert search('ингр') == [ingredient.pk for ingredient in ingredients]
+    # Поиск только по началу названия.
+    assert search('оль') == []
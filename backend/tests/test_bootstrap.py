@@ -0,0 +1,103 @@
+"""Разделы /api/bootstrap/ совпадают с эндпоинтами и собираются
+одновременно."""
+import time
+import warnings
+
+import pytest
+from django.core.cache import cache
+from django.core.paginator import UnorderedObjectListWarning
+
+from api.async_views import BootstrapView
+from recipes.models import Recipe, ShoppingCart
+from tests.conftest import create_user, get_client
+from users.models import Subscribe
+
+SECTION_DELAY = 0.3
+"""Задержка медленного раздела (с), как у долгого запроса к базе."""
+
+
+@pytest.fixture
+def recipes(user, author, ingredients):
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            image=f'recipes/images/фото {number}.png',
+            text='Описание',
+            cooking_time=number + 1,
+        )
+        for number in range(3)
+    )
+    ShoppingCart.objects.create(user=user, recipe=recipes[0])
+    Subscribe.objects.create(user=user, author=author)
+    return recipes
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sections_match_endpoints(recipes, user):
+    client = get_client(user)
+    data = client.get('/api/bootstrap/?limit=2&recipes_limit=1').json()
+
+    assert data['me'] == client.get('/api/users/me/').json()
+    for name, path in (
+        ('recipes', '/api/recipes/?limit=2'),
+        ('shopping_cart_count', '/api/recipes/shopping_cart_count/'),
+        ('subscriptions', '/api/users/subscriptions/?limit=2&recipes_limit=1'),
+    ):
+        assert data[name] == client.get(path).json(), name
+    assert get_client().get('/api/bootstrap/').json() == {
+        'me': None,
+        'recipes': get_client().get('/api/recipes/').json(),
+        'shopping_cart_count': None,
+        'subscriptions': None,
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_slow_sections_are_built_concurrently(recipes, user, monkeypatch):
+    for method in ('get_shopping_cart_count', 'get_subscriptions'):
+        original = getattr(BootstrapView, method)
+
+        def slow(self, *args, original=original):
+            time.sleep(SECTION_DELAY)
+            return original(self, *args)
+
+        monkeypatch.setattr(BootstrapView, method, slow)
+    client = get_client(create_user('другой'))
+    client.get('/api/bootstrap/?sections=me')
+
+    def get_time(sections):
+        cache.clear()
+        started = time.perf_counter()
+        response = client.get(f'/api/bootstrap/?sections={sections}')
+        assert response.status_code == 200, response.content
+        return time.perf_counter() - started
+
+    one = get_time('shopping_cart_count')
+    two = get_time('shopping_cart_count,subscriptions')
+
+    assert one >= SECTION_DELAY
+    assert two - one < SECTION_DELAY / 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_subscriptions_are_newest_first(recipes, user):
+    authors = [create_user(f'автор {number}') for number in range(3)]
+    for author in authors:
+        Subscribe.objects.create(user=user, author=author)
+    client = get_client(user)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', UnorderedObjectListWarning)
+        pages = [
+            client.get(
+                f'/api/users/subscriptions/?limit=2&page={page}').json()
+            for page in (1, 2)
+        ]
+        bootstrap = client.get(
+            '/api/bootstrap/?sections=subscriptions&limit=2').json()
+
+    assert [
+        author['id'] for page in pages for author in page['results']
+    ] == [*(author.pk for author in reversed(authors)), recipes[0].author_id]
+    assert bootstrap['subscriptions'] == pages[0]
@@ -0,0 +1,148 @@
+"""Снимок каталога ингредиентов: версии, сжатие и перепроверка."""
+import gzip
+
+import brotli
+import orjson
+import pytest
+
+from recipes import catalog
+from recipes.catalog import get_catalog_version, rebuild_catalog_snapshot
+from recipes.models import Ingredient
+from tests.conftest import get_client
+
+PATH = '/api/ingredients/snapshot/'
+
+
+@pytest.fixture
+def snapshot_dir(settings, tmp_path):
+    settings.CATALOG_SNAPSHOT_DIR = str(tmp_path / 'catalog')
+    return tmp_path / 'catalog'
+
+
+def get_snapshot(**headers):
+    return get_client().get(PATH, headers=headers)
+
+
+def get_files(snapshot_dir):
+    return sorted(path.name for path in snapshot_dir.iterdir())
+
+
+@pytest.mark.django_db
+def test_snapshot_contains_catalog(ingredients, snapshot_dir):
+    response = get_snapshot()
+    version = get_catalog_version()
+
+    assert response.status_code == 200
+    assert orjson.loads(response.content) == [
+        {'id': ingredient.pk, 'name': ingredient.name,
+         'measurement_unit': ingredient.measurement_unit}
+        for ingredient in ingredients
+    ]
+    assert 'Content-Encoding' not in response
+    assert response['ETag'] == f'"{version}"'
+    assert response['X-Catalog-Version'] == version
+    assert 'Accept-Encoding' in response['Vary']
+    assert response['Cache-Control'] == 'public, no-cache'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('accept_encoding, encoding', (
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip;q=0.5', 'gzip'),
+    ('BR', 'br'),
+    ('deflate, identity', None),
+    ('gzip;q=invalid', None),
+))
+def test_snapshot_encoding_follows_accept_encoding(
+        ingredients, snapshot_dir, accept_encoding, encoding):
+    plain = get_snapshot().content
+
+    response = get_snapshot(accept_encoding=accept_encoding)
+
+    assert response.get('Content-Encoding') == encoding
+    decompress = {
+        'br': brotli.decompress, 'gzip': gzip.decompress, None: bytes,
+    }[encoding]
+    assert decompress(response.content) == plain
+    version = response['X-Catalog-Version']
+    assert response['ETag'] == (
+        f'"{version}-{encoding}"' if encoding else f'"{version}"')
+
+
+@pytest.mark.django_db
+def test_snapshot_not_modified_for_matching_etag(ingredients, snapshot_dir):
+    etag = get_snapshot(accept_encoding='gzip')['ETag']
+
+    response = get_snapshot(accept_encoding='gzip', if_none_match=etag)
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response['ETag'] == etag
+
+    # ETag другого сжатия не подходит.
+    response = get_snapshot(accept_encoding='br', if_none_match=etag)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_versioned_snapshot_is_immutable(ingredients, snapshot_dir):
+    version = get_catalog_version()
+
+    response = get_client().get(PATH, {'version': version})
+    assert 'immutable' in response['Cache-Control']
+
+    response = get_client().get(PATH, {'version': 'прежняя'})
+    assert response['Cache-Control'] == 'public, no-cache'
+
+
+@pytest.mark.django_db
+def test_catalog_change_creates_version_and_prunes_old(
+        ingredients, snapshot_dir, django_capture_on_commit_callbacks):
+    version = get_catalog_version()
+    files = get_files(snapshot_dir)
+    assert rebuild_catalog_snapshot() == version
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    new_version = get_catalog_version()
+    assert new_version != version
+    assert get_files(snapshot_dir) == sorted(
+        name.replace(version, new_version) for name in files)
+    assert {'id': Ingredient.objects.get(name='соль').pk, 'name': 'соль',
+            'measurement_unit': 'г'} in orjson.loads(get_snapshot().content)
+
+
+@pytest.mark.django_db
+def test_failed_rebuild_keeps_previous_version(
+        ingredients, snapshot_dir, monkeypatch):
+    version = get_catalog_version()
+    files = get_files(snapshot_dir)
+    content = get_snapshot().content
+    Ingredient.objects.filter(pk=ingredients[0].pk).update(name='сахар')
+
+    def fail(content):
+        raise OSError('нет места')
+
+    monkeypatch.setitem(catalog.SNAPSHOT_ENCODINGS, 'gzip', ('.gz', fail))
+    with pytest.raises(OSError):
+        rebuild_catalog_snapshot()
+
+    # Файлы пишутся через временные, текущая версия переключается
+    # последней, а прежняя удаляется только после этого.
+    assert get_catalog_version() == version
+    assert set(files) <= set(get_files(snapshot_dir))
+    assert not [name for name in get_files(snapshot_dir) if '.tmp' in name]
+    assert get_snapshot().content == content
+
+
+@pytest.mark.django_db
+def test_missing_snapshot_file_is_rebuilt(ingredients, snapshot_dir):
+    version = get_catalog_version()
+    (snapshot_dir / f'ingredients.{version}.json.br').unlink()
+
+    response = get_snapshot(accept_encoding='br')
+
+    assert response.status_code == 200
+    assert orjson.loads(brotli.decompress(response.content)) == (
+        orjson.loads(get_snapshot().content))
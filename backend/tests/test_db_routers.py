@@ -0,0 +1,146 @@
+"""Маршрутизация чтений между основной базой и репликами."""
+from http import HTTPStatus
+
+import pytest
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.db_routers import PrimaryReplicaRouter, ReplicaPool
+from foodgram.middleware import replica_routing_middleware
+from recipes.models import Ingredient
+
+factory = RequestFactory()
+USER = {'HTTP_AUTHORIZATION': 'Token user'}
+OTHER_USER = {'HTTP_AUTHORIZATION': 'Token other'}
+
+
+def test_replicas_require_shared_cache(settings):
+    settings.DATABASE_REPLICAS = ['replica']
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    with pytest.raises(ImproperlyConfigured):
+        PrimaryReplicaRouter()
+
+
+def test_replicas_with_shared_cache(settings, tmp_path):
+    settings.DATABASE_REPLICAS = ['replica']
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(tmp_path),
+    }}
+
+    assert PrimaryReplicaRouter().replicas.aliases == ('replica',)
+
+
+@pytest.fixture
+def replica(tmp_path):
+    """Вторая локальная база в роли реплики, с разными данными в базах.
+
+    Настройки меняются одним override_settings: при восстановлении
+    маршрутизатор пересоздается, когда DATABASE_REPLICAS уже прежние.
+    """
+    with override_settings(
+        DATABASE_REPLICAS=['replica'],
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path),
+        }},
+        REPLICA_LAG_CHECK_INTERVAL=0,
+        DATABASE_ROUTERS=['foodgram.db_routers.PrimaryReplicaRouter'],
+    ):
+        Ingredient.objects.using(DEFAULT_DB_ALIAS).create(
+            name='основная', measurement_unit='г')
+        Ingredient.objects.using('replica').create(
+            name='реплика', measurement_unit='г')
+        yield router.routers[0]
+
+
+def test_middleware_is_skipped_without_replicas(settings):
+    settings.DATABASE_REPLICAS = []
+
+    def get_response(request):
+        return HttpResponse()
+
+    assert replica_routing_middleware(get_response) is get_response
+
+
+def read_names():
+    return list(
+        Ingredient.objects.order_by('pk').values_list('name', flat=True))
+
+
+def handle(request, status=HTTPStatus.OK):
+    """Запрос через replica_routing_middleware; возвращает прочитанное
+    внутри запроса."""
+    seen = []
+
+    def get_response(request):
+        seen.extend(read_names())
+        if request.method not in SAFE_METHODS:
+            Ingredient.objects.create(
+                name=f'новая {request.method}', measurement_unit='г')
+        return HttpResponse(status=status)
+
+    replica_routing_middleware(get_response)(request)
+    return seen
+
+
+databases = pytest.mark.django_db(
+    transaction=True, databases=[DEFAULT_DB_ALIAS, 'replica'])
+
+
+@databases
+def test_safe_request_reads_replica(replica):
+    assert handle(factory.get('/', **USER)) == ['реплика']
+    assert handle(factory.get('/')) == ['реплика']
+
+
+@databases
+def test_write_request_uses_primary(replica):
+    assert handle(factory.post('/', **USER)) == ['основная']
+
+    assert Ingredient.objects.using(DEFAULT_DB_ALIAS).filter(
+        name='новая POST').exists()
+    assert not Ingredient.objects.using('replica').filter(
+        name='новая POST').exists()
+
+
+@databases
+def test_reads_stick_to_primary_after_write(replica):
+    handle(factory.post('/', **USER))
+
+    assert handle(factory.get('/', **USER)) == ['основная', 'новая POST']
+    assert handle(factory.get('/', **OTHER_USER)) == ['реплика']
+
+    cache.clear()
+    assert handle(factory.get('/', **USER)) == ['реплика']
+
+
+@databases
+def test_failed_write_does_not_pin(replica):
+    handle(factory.post('/', **USER), status=HTTPStatus.BAD_REQUEST)
+
+    assert handle(factory.get('/', **USER)) == ['реплика']
+
+
+@databases
+def test_lagging_replica_is_excluded(replica, settings, monkeypatch):
+    lag = settings.REPLICA_MAX_LAG + 1
+    monkeypatch.setattr(
+        ReplicaPool, 'get_lag', staticmethod(lambda alias: lag))
+
+    assert handle(factory.get('/')) == ['основная']
+
+    lag = 0
+    assert handle(factory.get('/')) == ['реплика']
+
+
+@databases
+def test_reads_in_transaction_use_primary(replica):
+    with transaction.atomic():
+        assert read_names() == ['основная']
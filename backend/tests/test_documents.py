@@ -0,0 +1,210 @@
+"""Документы рецептов пересобираются при любой записи рецепта,
+а после изменения автора или ингредиента — задачей очереди."""
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from recipes import documents
+from recipes.documents import rebuild_recipe_documents
+from recipes.models import (
+    ChangeLogEntry,
+    Recipe,
+    RecipeDocument,
+    RecipeIngredient,
+)
+from tasks.models import Task
+from tasks.queue import claim_task, run_task
+from tests.conftest import get_client
+
+
+@pytest.fixture
+def recipe(author, ingredients, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = Recipe.objects.create(
+            author=author,
+            name='Рецепт',
+            image='recipes/images/рецепт.png',
+            text='Описание',
+            cooking_time=5,
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredients[0], amount=1)
+    return recipe
+
+
+def get_document(recipe):
+    return RecipeDocument.objects.get(recipe=recipe).data
+
+
+def get_ingredient_ids(recipe):
+    return [
+        ingredient['id'] for ingredient in get_document(recipe)['ingredients']
+    ]
+
+
+@pytest.mark.django_db
+def test_orm_write_rebuilds_document_on_commit(
+        recipe, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks() as callbacks:
+        recipe.name = 'Новое название'
+        recipe.save()
+        # До фиксации устаревший документ уже не отдается.
+        assert not RecipeDocument.objects.filter(recipe=recipe).exists()
+        assert get_client().get(
+            f'/api/recipes/{recipe.pk}/').json()['name'] == 'Новое название'
+
+    for callback in callbacks:
+        callback()
+
+    assert get_document(recipe)['name'] == 'Новое название'
+
+
+@pytest.mark.django_db
+def test_recipe_ingredient_writes_rebuild_document(
+        recipe, ingredients, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        added = RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredients[1], amount=2)
+    assert get_ingredient_ids(recipe) == [ingredients[0].pk, ingredients[1].pk]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        added.amount = 3
+        added.save()
+    assert get_document(recipe)['ingredients'][1]['amount'] == 3
+
+    with django_capture_on_commit_callbacks(execute=True):
+        RecipeIngredient.objects.filter(ingredient=ingredients[0]).delete()
+    assert get_ingredient_ids(recipe) == [ingredients[1].pk]
+
+
+@pytest.mark.django_db
+def test_transaction_rebuilds_document_once(
+        recipe, ingredients, monkeypatch, django_capture_on_commit_callbacks):
+    rebuilt = []
+
+    def rebuild(recipes):
+        rebuilt.append(sorted(recipes.values_list('pk', flat=True)))
+        return rebuild_recipe_documents(recipes)
+
+    monkeypatch.setattr(documents, 'rebuild_recipe_documents', rebuild)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.save()
+        recipe.recipe_ingredients.all().delete()
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredients[2], amount=1)
+
+    # Кроме рецепта, могут пересобираться рецепты отмененных транзакций
+    # предыдущих тестов.
+    assert len(rebuilt) == 1 and recipe.pk in rebuilt[0]
+    assert get_ingredient_ids(recipe) == [ingredients[2].pk]
+
+
+@pytest.mark.django_db
+def test_api_update_returns_rebuilt_document(
+        recipe, author, ingredients, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = get_client(author).patch(
+            f'/api/recipes/{recipe.pk}/',
+            {
+                'name': 'Обновленный',
+                'ingredients': [{'id': ingredients[3].pk, 'amount': 4}],
+            },
+            content_type='application/json',
+        )
+
+    assert response.status_code == 200, response.content
+    assert response.json()['name'] == 'Обновленный'
+    assert [
+        ingredient['id'] for ingredient in response.json()['ingredients']
+    ] == [ingredients[3].pk]
+    assert get_ingredient_ids(recipe) == [ingredients[3].pk]
+
+
+def get_rebuild_tasks():
+    return list(Task.objects.filter(
+        name='recipes.documents.rebuild_related_documents',
+    ).values_list('args', flat=True))
+
+
+def get_logged_recipes():
+    return list(ChangeLogEntry.objects.filter(
+        kind=ChangeLogEntry.Kind.RECIPE).values_list('object_id', flat=True))
+
+
+@pytest.mark.django_db
+def test_author_change_rebuilds_documents_in_queue(
+        recipe, author, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        author.first_name = 'Новое имя'
+        author.save()
+
+    # Документы сброшены сразу, а пересобираются задачей очереди.
+    assert not RecipeDocument.objects.filter(recipe=recipe).exists()
+    assert get_rebuild_tasks() == [['author', author.pk]]
+    assert get_client().get(f'/api/recipes/{recipe.pk}/').json()[
+        'author']['first_name'] == 'Новое имя'
+    logged = get_logged_recipes()
+
+    assert run_task(claim_task())
+    assert get_document(recipe)['author']['first_name'] == 'Новое имя'
+    assert get_logged_recipes() == [*logged, recipe.pk]
+
+
+@pytest.mark.django_db
+def test_ingredient_change_rebuilds_documents_in_queue(
+        recipe, ingredients, django_capture_on_commit_callbacks):
+    ingredient = ingredients[0]
+    with django_capture_on_commit_callbacks(execute=True):
+        ingredient.name = 'соль'
+        ingredient.save()
+
+    assert get_rebuild_tasks() == [['ingredients', ingredient.pk]]
+    assert run_task(claim_task())
+    assert get_document(recipe)['ingredients'][0]['name'] == 'соль'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('change', (
+    lambda author: author.set_password('другой-пароль'),
+    lambda author: setattr(author, 'is_active', False),
+    lambda author: None,
+))
+def test_save_without_document_changes_keeps_documents(
+        recipe, author, change, django_capture_on_commit_callbacks):
+    logged = get_logged_recipes()
+    change(author)
+    with django_capture_on_commit_callbacks(execute=True):
+        author.save()
+        ingredient = recipe.ingredients.get()
+        ingredient.save()
+
+    assert RecipeDocument.objects.filter(recipe=recipe).exists()
+    assert get_rebuild_tasks() == []
+    assert get_logged_recipes() == logged
+
+
+@pytest.mark.django_db
+def test_save_of_other_fields_does_not_read_stored_values(author):
+    author.first_name = 'Новое имя'
+    with CaptureQueriesContext(connection) as queries:
+        author.save(update_fields=['last_login'])
+
+    assert not [
+        query for query in queries
+        if query['sql'].startswith('SELECT "users_user"')
+    ]
+    assert get_rebuild_tasks() == []
+
+
+@pytest.mark.django_db
+def test_rolled_back_change_does_not_enqueue_rebuild(
+        recipe, author, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        with pytest.raises(RuntimeError), transaction.atomic():
+            author.first_name = 'Новое имя'
+            author.save()
+            raise RuntimeError
+
+    assert get_rebuild_tasks() == []
+    assert RecipeDocument.objects.filter(recipe=recipe).exists()
@@ -0,0 +1,67 @@
+"""Поток событий: лимит потоков пользователя и рассылка через PostgreSQL."""
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.authtoken.models import Token
+
+from api.async_views import EventsView
+from foodgram.constants import EVENTS_MAX_CONNECTIONS_PER_USER
+from foodgram.pubsub import pubsub
+
+
+@pytest.fixture
+def open_stream(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    request = RequestFactory().get(
+        '/api/events/', HTTP_AUTHORIZATION=f'Token {token.key}')
+    view = EventsView.as_view()
+
+    @async_to_sync
+    async def open_stream():
+        return await view(request)
+
+    return open_stream
+
+
+@pytest.mark.django_db
+def test_stream_slots_are_reserved_before_streaming(user, open_stream):
+    responses = [
+        open_stream() for _ in range(EVENTS_MAX_CONNECTIONS_PER_USER)]
+
+    assert all(response.status_code == 200 for response in responses)
+    assert open_stream().status_code == 429
+
+    responses[0].close()
+    responses[0].close()
+    assert EventsView.streams[user.pk] == EVENTS_MAX_CONNECTIONS_PER_USER - 1
+    response = open_stream()
+    assert response.status_code == 200
+
+    for response in [*responses[1:], response]:
+        response.close()
+    assert user.pk not in EventsView.streams
+
+
+@pytest.mark.django_db(transaction=True)
+def test_postgres_bridge_delivers_notifications(settings):
+    if connection.vendor != 'postgresql':
+        pytest.skip('Нужен PostgreSQL (DB_ENGINE=postgresql)')
+    settings.PUBSUB_POSTGRES = True
+
+    async def receive():
+        with pubsub.subscribe('test-channel') as subscription:
+            # Пока слушатель не подключился, уведомления теряются:
+            # сообщение публикуется, пока не будет получено.
+            for _ in range(50):
+                await asyncio.to_thread(
+                    pubsub.publish, 'test-channel', {'value': 1})
+                try:
+                    return await asyncio.wait_for(subscription.get(), 0.2)
+                except asyncio.TimeoutError:
+                    continue
+        return None
+
+    assert asyncio.run(receive()) == {'value': 1}
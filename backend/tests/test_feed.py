@@ -0,0 +1,113 @@
+"""Лента подписок: курсор по записям ленты и рецептам популярных авторов."""
+from datetime import timedelta
+
+import orjson
+import pytest
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from api.renderers import ORJSONRenderer
+from api.views import RecipeViewSet
+from recipes.feed import backfill_timeline, fan_out_recipe
+from recipes.models import Recipe, TimelineEntry
+from tests.conftest import create_user, get_client
+from tests.serializers import ReferenceRecipeSerializer, prefetch_ingredients
+from users.models import Subscribe
+
+PATH = '/api/recipes/feed/?limit=3'
+
+
+@pytest.fixture
+def feed(user, author):
+    """Рецепты ленты user в порядке вывода."""
+    celebrity = create_user('celebrity')
+    stranger = create_user('stranger')
+    Subscribe.objects.create(user=user, author=author)
+    Subscribe.objects.create(user=user, author=celebrity)
+    cache.set('feed:celebrities', {celebrity.pk})
+    now = timezone.now()
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=(author, celebrity, stranger)[number % 3],
+            name=f'Рецепт {number}',
+            image='recipes/image.png',
+            text='Описание',
+            cooking_time=1,
+            # Одинаковые даты проверяют второй ключ курсора.
+            pub_date=now - timedelta(minutes=number // 4),
+        )
+        for number in range(16)
+    )
+    for recipe in recipes:
+        fan_out_recipe(recipe.pk)
+    return sorted(
+        (recipe for recipe in recipes if recipe.author != stranger),
+        key=lambda recipe: (recipe.pub_date, recipe.pk),
+        reverse=True,
+    )
+
+
+def get_pages(client, url, link):
+    pages = []
+    while url is not None:
+        response = client.get(url)
+        assert response.status_code == 200, response.content
+        data = response.json()
+        pages.append([recipe['id'] for recipe in data['results']])
+        url = data[link]
+    return pages
+
+
+@pytest.mark.django_db
+def test_feed_pages_follow_timeline_order(user, feed):
+    client = get_client(user)
+    pages = get_pages(client, PATH, 'next')
+
+    assert sum(pages, []) == [recipe.pk for recipe in feed]
+    assert all(len(page) == 3 for page in pages[:-1])
+
+    last_page = client.get(PATH).json()
+    while last_page['next'] is not None:
+        last_page = client.get(last_page['next']).json()
+    assert get_pages(client, last_page['previous'], 'previous') == (
+        pages[-2::-1])
+
+
+@pytest.mark.django_db
+def test_feed_rejects_invalid_cursor(user, feed):
+    response = get_client(user).get(PATH + '&cursor=invalid')
+
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_feed_renders_like_serializers(user, feed):
+    request = Request(RequestFactory().get(PATH))
+    request.user = user
+    recipes = RecipeViewSet(request=request).get_queryset().filter(
+        pk__in=[recipe.pk for recipe in feed[:3]]
+    ).order_by('-pub_date', '-pk')
+    expected = ReferenceRecipeSerializer(
+        prefetch_ingredients(recipes), many=True,
+        context={'request': request},
+    ).data
+
+    response = get_client(user).get(PATH)
+
+    assert response.json()['results'] == orjson.loads(
+        ORJSONRenderer().render(expected))
+
+
+@pytest.mark.django_db
+def test_backfill_skips_cancelled_subscription(user, author):
+    Recipe.objects.create(
+        author=author, name='Рецепт', image='recipes/image.png',
+        text='Описание', cooking_time=1)
+    subscription = Subscribe.objects.create(user=user, author=author)
+    subscription.delete()
+
+    backfill_timeline(user.pk, author.pk)
+
+    assert not TimelineEntry.objects.filter(user=user).exists()
@@ -0,0 +1,82 @@
+"""Выбор полей ответа (?fields= и ?omit=): меньше запросов и байтов."""
+import pytest
+
+from recipes.documents import rebuild_recipe_documents
+from recipes.models import Recipe, RecipeIngredient
+from tests.conftest import get_client
+
+PATH = '/api/recipes/?limit=12'
+
+
+@pytest.fixture
+def recipes(author, ingredients):
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            image=f'recipes/images/фото {number}.png',
+            text=f'Описание рецепта {number}',
+            cooking_time=number + 1,
+        )
+        for number in range(12)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes
+        for ingredient in ingredients[:3]
+    )
+    rebuild_recipe_documents(Recipe.objects.all())
+    return recipes
+
+
+@pytest.fixture
+def get_page(user, django_assert_num_queries):
+    client = get_client(user)
+    # Пользователь токена запоминается в памяти процесса: считаются
+    # запросы уже после первого обращения.
+    client.get(PATH)
+
+    def get_page(path, queries):
+        with django_assert_num_queries(queries):
+            response = client.get(path)
+        assert response.status_code == 200, response.content
+        return response
+
+    return get_page
+
+
+@pytest.mark.django_db
+def test_sparse_fields_skip_documents_and_subscriptions(recipes, get_page):
+    # Число рецептов, строки с документами и флагами, подписки.
+    full = get_page(PATH, 3)
+    # Число рецептов и строки из таблицы рецептов.
+    sparse = get_page(PATH + '&fields=id,name', 2)
+
+    assert sparse.json()['results'] == [
+        {'id': recipe['id'], 'name': recipe['name']}
+        for recipe in full.json()['results']
+    ]
+    assert len(sparse.content) * 10 < len(full.content)
+
+
+@pytest.mark.django_db
+def test_omit_removes_fields(recipes, get_page):
+    omitted_fields = ('author', 'ingredients', 'text')
+    full = get_page(PATH, 3)
+    omitted = get_page(PATH + '&omit=' + ','.join(omitted_fields), 2)
+
+    assert omitted.json()['results'] == [
+        {
+            name: value for name, value in recipe.items()
+            if name not in omitted_fields
+        }
+        for recipe in full.json()['results']
+    ]
+    assert len(omitted.content) < len(full.content)
+
+
+@pytest.mark.django_db
+def test_unknown_field_is_rejected(recipes, user):
+    response = get_client(user).get(PATH + '&fields=id,unknown')
+
+    assert response.status_code == 400
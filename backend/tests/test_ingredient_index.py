@@ -0,0 +1,107 @@
+"""Похожие рецепты и рецепты из имеющихся ингредиентов по индексу."""
+from datetime import timedelta
+
+import pytest
+
+from foodgram.constants import INGREDIENT_INDEX_CHANGES_MARGIN
+from recipes import ingredient_index
+from recipes.ingredient_index import rebuild_ingredient_index
+from recipes.models import Recipe, RecipeDocument, RecipeIngredient
+from tests.conftest import get_client
+
+RECIPE_INGREDIENTS = ({0, 1, 2}, {0, 1}, {0, 3, 4, 5}, {6}, {7, 8})
+"""Номера ингредиентов рецептов."""
+
+
+def set_ingredients(recipe, ingredients, numbers):
+    RecipeIngredient.objects.filter(recipe=recipe).delete()
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredients[number],
+                         amount=1)
+        for number in sorted(numbers)
+    )
+
+
+@pytest.fixture
+def recipes(author, ingredients, settings, tmp_path, monkeypatch,
+            django_capture_on_commit_callbacks):
+    """Рецепты из индекса: их документы собраны до сборки индекса."""
+    settings.CATALOG_SNAPSHOT_DIR = str(tmp_path)
+    monkeypatch.setattr(ingredient_index, '_index', None)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipes = [
+            Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {number}',
+                image='recipes/images/рецепт.png',
+                text='Описание',
+                cooking_time=5,
+            )
+            for number in range(len(RECIPE_INGREDIENTS))
+        ]
+        for recipe, numbers in zip(recipes, RECIPE_INGREDIENTS):
+            set_ingredients(recipe, ingredients, numbers)
+        rebuild_ingredient_index()
+    RecipeDocument.objects.update(updated_at=(
+        ingredient_index.get_ingredient_index().built_at
+        - timedelta(seconds=2 * INGREDIENT_INDEX_CHANGES_MARGIN)))
+    return recipes
+
+
+def get_pantry(ingredients, numbers, missing):
+    response = get_client().get('/api/recipes/pantry/', {
+        'ingredients': [ingredients[number].pk for number in numbers],
+        'missing': missing,
+    })
+    assert response.status_code == 200, response.content
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+def get_similar(recipe):
+    response = get_client().get(f'/api/recipes/{recipe.pk}/similar/')
+    assert response.status_code == 200, response.content
+    return [recipe['id'] for recipe in response.json()]
+
+
+def ids(recipes, *numbers):
+    return [recipes[number].pk for number in numbers]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('missing, expected', (
+    (0, (1,)),
+    # Сначала большая доля имеющихся ингредиентов; рецепт 3 из одного
+    # ингредиента подходит, хотя его нет среди имеющихся.
+    (1, (1, 0, 3)),
+    (2, (1, 0, 3, 4)),
+    (3, (1, 0, 2, 3, 4)),
+))
+def test_pantry_ranks_recipes_within_missing(
+        recipes, ingredients, missing, expected):
+    assert get_pantry(ingredients, (0, 1), missing) == ids(recipes, *expected)
+
+
+@pytest.mark.django_db
+def test_pantry_ties_are_ordered_by_missing_then_newest(recipes, ingredients):
+    # Доля 1/2 у рецептов 1 и 4 (не хватает одного) и 2 (не хватает
+    # двух), затем 1/3 у рецепта 0 и ничего у рецепта 3.
+    assert get_pantry(ingredients, (0, 3, 7), 3) == ids(recipes, 4, 1, 2, 0, 3)
+
+
+@pytest.mark.django_db
+def test_similar_recipes_exclude_source(recipes):
+    assert get_similar(recipes[0]) == ids(recipes, 1, 2)
+    assert get_similar(recipes[1]) == ids(recipes, 0, 2)
+    assert get_similar(recipes[3]) == []
+
+
+@pytest.mark.django_db
+def test_changed_documents_override_index(
+        recipes, ingredients, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        set_ingredients(recipes[4], ingredients, {0, 1, 7})
+        set_ingredients(recipes[1], ingredients, {9})
+        recipes[3].delete()
+
+    assert get_pantry(ingredients, (0, 1), 1) == ids(recipes, 4, 0, 1)
+    assert get_similar(recipes[0]) == ids(recipes, 4, 2)
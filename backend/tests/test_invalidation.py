@@ -0,0 +1,165 @@
+"""Шина инвалидации: кеши процессов сбрасываются после фиксации."""
+import multiprocessing
+
+import pytest
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from foodgram.invalidation import FileTransport, LocalCache
+from tests.conftest import get_client
+from users.tokens import get_cached_token_user
+
+COUNT_PATH = '/api/recipes/shopping_cart_count/'
+
+PUBLISHES = 500
+"""Увеличений счетчика в каждом процессе теста FileTransport."""
+
+
+@pytest.fixture
+def local_cache():
+    local_cache = LocalCache('tests', 2)
+    local_cache.set('a', 1, local_cache.get_generation('a'))
+    return local_cache
+
+
+def get(local_cache, key):
+    return local_cache.get(key, local_cache.get_generation(key))
+
+
+@pytest.mark.django_db
+def test_local_cache_entry_is_stale_after_commit(
+        local_cache, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        local_cache.invalidate('a')
+        assert get(local_cache, 'a') == 1
+
+    assert get(local_cache, 'a') is None
+
+
+@pytest.mark.django_db
+def test_local_cache_entry_is_valid_after_rollback(
+        local_cache, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        with pytest.raises(RuntimeError), transaction.atomic():
+            local_cache.invalidate('a')
+            local_cache.invalidate()
+            raise RuntimeError
+
+    assert callbacks == []
+    assert get(local_cache, 'a') == 1
+
+
+@pytest.mark.django_db
+def test_local_cache_namespace_invalidation(
+        local_cache, django_capture_on_commit_callbacks):
+    local_cache.set('b', 2, local_cache.get_generation('b'))
+    with django_capture_on_commit_callbacks(execute=True):
+        local_cache.invalidate('b')
+    assert get(local_cache, 'a') == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        local_cache.invalidate()
+    assert get(local_cache, 'a') is None
+
+
+@pytest.mark.django_db
+def test_local_cache_rejects_value_read_before_invalidation(
+        local_cache, django_capture_on_commit_callbacks):
+    # Поколение берется до чтения источника: значение, прочитанное
+    # до изменения, не попадает в кеш как актуальное.
+    generation = local_cache.get_generation('b')
+    with django_capture_on_commit_callbacks(execute=True):
+        local_cache.invalidate('b')
+    local_cache.set('b', 'старое', generation)
+
+    assert get(local_cache, 'b') is None
+
+
+def test_local_cache_evicts_least_recently_used(local_cache):
+    local_cache.set('b', 2, local_cache.get_generation('b'))
+    assert get(local_cache, 'a') == 1
+    local_cache.set('c', 3, local_cache.get_generation('c'))
+
+    assert get(local_cache, 'b') is None
+    assert (get(local_cache, 'a'), get(local_cache, 'c')) == (1, 3)
+
+
+def test_file_transport_is_shared_between_instances(tmp_path):
+    path = tmp_path / 'invalidation'
+    first, second = FileTransport(4, path), FileTransport(4, path)
+
+    first.publish(1)
+    second.publish(1)
+
+    assert [second.generation(slot) for slot in range(4)] == [0, 2, 0, 0]
+    # Файл расширяется под большее число счетчиков без потери значений.
+    assert FileTransport(8, path).generation(1) == 2
+
+
+def publish_many(path):
+    transport = FileTransport(4, path)
+    for _ in range(PUBLISHES):
+        transport.publish(3)
+
+
+def test_file_transport_counts_concurrent_publishes(tmp_path):
+    path = tmp_path / 'invalidation'
+    context = multiprocessing.get_context('fork')
+    processes = [
+        context.Process(target=publish_many, args=(path,))
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert all(process.exitcode == 0 for process in processes)
+    assert FileTransport(4, path).generation(3) == 4 * PUBLISHES
+
+
+@pytest.fixture
+def token_user(user):
+    """Пользователь, токен которого закеширован асинхронной
+    аутентификацией."""
+    client = get_client(user)
+    assert client.get(COUNT_PATH).status_code == 200
+    key = Token.objects.get(user=user).key
+    assert get_cached_token_user(key) == user
+    return client, key
+
+
+@pytest.mark.django_db
+def test_logout_evicts_cached_token(
+        user, token_user, django_capture_on_commit_callbacks):
+    client, key = token_user
+    with django_capture_on_commit_callbacks(execute=True):
+        assert client.post('/api/auth/token/logout/').status_code == 204
+
+    assert get_cached_token_user(key) is None
+    assert client.get(COUNT_PATH).status_code == 401
+
+
+@pytest.mark.django_db
+def test_user_save_evicts_cached_token(
+        user, token_user, django_capture_on_commit_callbacks):
+    client, key = token_user
+    user.is_active = False
+    with django_capture_on_commit_callbacks(execute=True):
+        user.save()
+
+    assert get_cached_token_user(key) is None
+    assert client.get(COUNT_PATH).status_code == 401
+
+
+@pytest.mark.django_db
+def test_rolled_back_user_save_keeps_cached_token(
+        user, token_user, django_capture_on_commit_callbacks):
+    client, key = token_user
+    with django_capture_on_commit_callbacks(execute=True):
+        with pytest.raises(RuntimeError), transaction.atomic():
+            user.save()
+            raise RuntimeError
+
+    assert get_cached_token_user(key) == user
+    assert client.get(COUNT_PATH).status_code == 200
@@ -0,0 +1,164 @@
+"""Фильтры списка рецептов и фасеты."""
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.db.models import BooleanField, Value
+from django.test.utils import CaptureQueriesContext
+
+from api import facets
+from api.facets import acount_facets, count_facets
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from tests.conftest import create_user, get_client
+
+RECIPES = (
+    # (автор, время приготовления, номера ингредиентов)
+    (0, 10, {0, 1}),
+    (0, 20, {0}),
+    (0, 45, {1, 2}),
+    (1, 90, {0, 1, 2}),
+    (1, 15, set()),
+    (2, 30, {3}),
+)
+
+
+@pytest.fixture
+def recipes(author, user, ingredients):
+    authors = (author, user, create_user('chef'))
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=authors[author_number],
+            name=f'Рецепт {number}',
+            image='recipes/images/рецепт.png',
+            text='Описание',
+            cooking_time=cooking_time,
+        )
+        for number, (author_number, cooking_time, _) in enumerate(RECIPES)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe, ingredient=ingredients[ingredient], amount=1)
+        for recipe, (*_, numbers) in zip(recipes, RECIPES)
+        for ingredient in numbers
+    )
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    Favorite.objects.create(user=user, recipe=recipes[5])
+    ShoppingCart.objects.create(user=user, recipe=recipes[2])
+    return recipes
+
+
+def get_list(params, user=None):
+    response = get_client(user).get('/api/recipes/', params)
+    assert response.status_code == 200, response.content
+    return response.json()
+
+
+def get_numbers(recipes, params):
+    ids = {recipe['id'] for recipe in get_list(params)['results']}
+    return sorted(
+        number for number, recipe in enumerate(recipes) if recipe.pk in ids)
+
+
+def ingredient_ids(ingredients, *numbers):
+    return ','.join(str(ingredients[number].pk) for number in numbers)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, expected', (
+    ({'min_cooking_time': 20}, [1, 2, 3, 5]),
+    ({'max_cooking_time': 15}, [0, 4]),
+    ({'min_cooking_time': 20, 'max_cooking_time': 45}, [1, 2, 5]),
+    ({'ingredients': (0, 1)}, [0, 3]),
+    ({'ingredients': (2,)}, [2, 3]),
+    ({'exclude_ingredients': (2,)}, [0, 1, 4, 5]),
+    ({'exclude_ingredients': (0, 3)}, [2, 4]),
+    ({'ingredients': (0,), 'exclude_ingredients': (1,)}, [1]),
+    ({'ingredients': (1,), 'max_cooking_time': 45}, [0, 2]),
+))
+def test_recipe_list_filters(recipes, ingredients, params, expected):
+    params = {
+        name: ingredient_ids(ingredients, *value)
+        if isinstance(value, tuple) else value
+        for name, value in params.items()
+    }
+    assert get_numbers(recipes, params) == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', (
+    {'min_cooking_time': 'долго'},
+    {'ingredients': 'один,два'},
+    {'exclude_ingredients': '1,x'},
+))
+def test_invalid_filter_is_rejected(recipes, params):
+    response = get_client().get('/api/recipes/', params)
+
+    assert response.status_code == 400
+    assert set(response.json()) == set(params)
+
+
+def get_queryset():
+    """Рецепты с флагами, как в списке для анонимного пользователя."""
+    flag = Value(False, output_field=BooleanField())
+    return Recipe.objects.annotate(
+        is_favorited=flag, is_in_shopping_cart=flag)
+
+
+def get_author_facets(recipes, *numbers):
+    authors = [recipes[number].author for number in numbers]
+    return [
+        {'id': author.pk, 'count': count}
+        for author, count in zip(authors, (3, 2, 1))
+    ]
+
+
+@pytest.mark.django_db
+def test_facets_count_filtered_recipes(recipes, user):
+    data = get_list({'facets': 1}, user)
+
+    assert data['facets'] == {
+        'author': get_author_facets(recipes, 0, 3, 5),
+        'cooking_time': [
+            {'min': 1, 'max': 15, 'count': 2},
+            {'min': 16, 'max': 30, 'count': 2},
+            {'min': 31, 'max': 60, 'count': 1},
+            {'min': 61, 'max': None, 'count': 1},
+        ],
+        'is_favorited': 2,
+        'is_in_shopping_cart': 1,
+    }
+    assert get_list({'facets': 1})['facets']['is_favorited'] == 0
+
+    filtered = get_list({'facets': 1, 'max_cooking_time': 20}, user)
+    assert filtered['facets']['author'] == [
+        {'id': recipes[0].author.pk, 'count': 2},
+        {'id': recipes[4].author.pk, 'count': 1},
+    ]
+    assert [
+        bucket['count'] for bucket in filtered['facets']['cooking_time']
+    ] == [2, 1, 0, 0]
+    assert filtered['facets']['is_favorited'] == 1
+
+
+@pytest.mark.django_db
+def test_facets_limit_authors_in_query(recipes, monkeypatch):
+    monkeypatch.setattr(facets, 'FACET_AUTHORS_LIMIT', 2)
+    queryset = get_queryset()
+
+    with CaptureQueriesContext(connection) as queries:
+        counted = count_facets(queryset)
+
+    # Итоги и авторы — по запросу; авторов база отдает не больше лимита.
+    assert len(queries) == 2
+    assert 'LIMIT 2' in queries[1]['sql']
+    assert counted['author'] == get_author_facets(recipes, 0, 3)
+    assert async_to_sync(acount_facets)(queryset) == counted
+
+
+@pytest.mark.django_db
+def test_facets_of_empty_list(recipes):
+    counted = count_facets(get_queryset().none())
+
+    assert counted['author'] == []
+    assert [bucket['count'] for bucket in counted['cooking_time']] == [
+        0, 0, 0, 0]
+    assert (counted['is_favorited'], counted['is_in_shopping_cart']) == (0, 0)
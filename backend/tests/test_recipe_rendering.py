@@ -0,0 +1,99 @@
+"""Ответы быстрого пути совпадают с выводом сериализаторов DRF."""
+from datetime import timedelta
+
+import orjson
+import pytest
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.async_views import RecipeListView
+from api.views import RecipeViewSet
+from recipes.documents import rebuild_recipe_documents
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from tests.conftest import create_user, get_client
+from tests.serializers import ReferenceRecipeViewSet
+from users.models import Subscribe
+
+PATH = '/api/recipes/?limit=50'
+
+
+def get_view_content(view_class, user=None):
+    headers = {}
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        headers['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+    view = view_class.as_view({'get': 'list'})
+    response = view(RequestFactory().get(PATH, **headers))
+    response.render()
+    assert response.status_code == 200, response.content
+    return response.content
+
+
+@pytest.fixture
+def recipes(user, author, ingredients):
+    other_author = create_user('other')
+    now = timezone.now()
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author if number % 3 else other_author,
+            name=f'Рецепт «{number}»',
+            image=f'recipes/images/фото рецепта {number}.png',
+            text=f'Описание № {number}\nс "кавычками" и \\ слешем',
+            cooking_time=number + 1,
+            pub_date=now - timedelta(minutes=number),
+        )
+        for number in range(12)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient=ingredients[(number + offset * 3) % len(ingredients)],
+            amount=offset + 1,
+        )
+        for number, recipe in enumerate(recipes)
+        # Ингредиенты добавляются не по порядку id.
+        for offset in (2, 0, 1)
+    )
+    # Половина рецептов — с готовыми документами, для остальных
+    # документы собираются при чтении.
+    rebuild_recipe_documents(
+        Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes[::2]]))
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::3])
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::4])
+    Subscribe.objects.create(user=user, author=author)
+    return recipes
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', (False, True))
+def test_fast_path_matches_serializers(recipes, user, authenticated,
+                                       monkeypatch):
+    viewer = user if authenticated else None
+    expected = get_view_content(ReferenceRecipeViewSet, viewer)
+
+    async def run_sync(*args, **kwargs):
+        raise AssertionError('Запрос передан синхронному ViewSet')
+
+    monkeypatch.setattr(RecipeListView, 'run_sync', run_sync)
+
+    assert get_client(viewer).get(PATH).content == expected
+    assert get_view_content(RecipeViewSet, viewer) == expected
+
+
+@pytest.mark.django_db
+def test_fixture_covers_flags(recipes, user):
+    results = orjson.loads(
+        get_view_content(ReferenceRecipeViewSet, user))['results']
+
+    assert len(results) == len(recipes)
+    for field in ('is_favorited', 'is_in_shopping_cart'):
+        assert {recipe[field] for recipe in results} == {False, True}
+    assert {recipe['author']['is_subscribed'] for recipe in results} == {
+        False, True}
+    assert {recipe['author']['avatar'] for recipe in results} == {
+        None, 'http://testserver/media/users/'
+              '%D0%B0%D0%B2%D0%B0%D1%82%D0%B0%D1%80%20'
+              '%D0%B0%D0%B2%D1%82%D0%BE%D1%80%D0%B0.png'}
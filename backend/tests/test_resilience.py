@@ -0,0 +1,277 @@
+"""Ограничение времени запросов, автомат базы и устаревшие ответы."""
+import asyncio
+from collections import OrderedDict
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.test import AsyncClient, RequestFactory
+from rest_framework.authtoken.models import Token
+
+from api import async_views, stale
+from api.async_views import AsyncReadView, RecipeListView
+from api.stale import get_stale_key
+from foodgram import resilience
+from foodgram.constants import CIRCUIT_BREAKER_RESET_TIMEOUT
+from foodgram.resilience import CircuitBreaker, statement_timeout
+from recipes.models import Ingredient
+from tests.conftest import get_client
+from users.tokens import token_users
+
+PATH = '/api/recipes/'
+
+
+def show_statement_timeout():
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW statement_timeout')
+        return cursor.fetchone()[0]
+
+
+@pytest.fixture
+def timeout_sets(monkeypatch):
+    """Выполненные SET statement_timeout: (значение, LOCAL ли)."""
+    if connection.vendor != 'postgresql':
+        pytest.skip('Нужен PostgreSQL (DB_ENGINE=postgresql)')
+    sets = []
+    set_statement_timeout = resilience.set_statement_timeout
+
+    def record(cursor, timeout, local=False):
+        sets.append((timeout, local))
+        set_statement_timeout(cursor, timeout, local)
+
+    monkeypatch.setattr(resilience, 'set_statement_timeout', record)
+    token = statement_timeout.set(1500)
+    yield sets
+    statement_timeout.reset(token)
+    show_statement_timeout()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_statement_timeout_is_set_once_per_connection(timeout_sets):
+    Ingredient.objects.count()
+    Ingredient.objects.count()
+
+    assert show_statement_timeout() == '1500ms'
+    assert timeout_sets == [(1500, False)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_statement_timeout_is_set_once_per_transaction(timeout_sets):
+    Ingredient.objects.count()
+    timeout_sets.clear()
+    token = statement_timeout.set(700)
+    try:
+        with transaction.atomic():
+            Ingredient.objects.count()
+            Ingredient.objects.count()
+            with transaction.atomic():
+                Ingredient.objects.count()
+            assert show_statement_timeout() == '700ms'
+            assert timeout_sets == [(700, True)]
+    finally:
+        statement_timeout.reset(token)
+
+    # SET LOCAL не изменил значение соединения.
+    assert show_statement_timeout() == '1500ms'
+    assert timeout_sets == [(700, True)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_statement_timeout_is_set_again_after_savepoint_rollback(
+        timeout_sets):
+    Ingredient.objects.count()
+    timeout_sets.clear()
+    token = statement_timeout.set(700)
+    try:
+        with transaction.atomic():
+            Ingredient.objects.count()
+            with pytest.raises(RuntimeError), transaction.atomic():
+                inner_token = statement_timeout.set(300)
+                Ingredient.objects.count()
+                raise RuntimeError
+            # Откат точки сохранения отменил и SET LOCAL в ней.
+            assert show_statement_timeout() == '300ms'
+            statement_timeout.reset(inner_token)
+            assert show_statement_timeout() == '700ms'
+    finally:
+        statement_timeout.reset(token)
+
+    assert timeout_sets == [(700, True), (300, True), (300, True), (700, True)]
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.acquire() == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.acquire() == CircuitBreaker.OPEN
+    assert breaker.get_status()['counters'] == {
+        'failures': 5, 'trips': 1, 'rejected': 1}
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    breaker.opened_at -= 60
+
+    assert breaker.acquire() == CircuitBreaker.HALF_OPEN
+    assert breaker.acquire() == CircuitBreaker.OPEN
+    # Неудачная проба снова размыкает автомат на reset_timeout.
+    breaker.record_failure()
+    assert breaker.acquire() == CircuitBreaker.OPEN
+
+    breaker.opened_at -= 60
+    assert breaker.acquire() == CircuitBreaker.HALF_OPEN
+    # Проба, не вернувшая результата, не держит автомат полуоткрытым.
+    breaker.probe_started_at -= 60
+    assert breaker.acquire() == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+
+    assert breaker.acquire() == CircuitBreaker.CLOSED
+    assert breaker.get_status()['counters']['probes'] == 3
+
+
+class FailingDatabase:
+    """Чтения списка рецептов: число обращений к базе, сбой базы
+    и задержка ответа до события."""
+
+    def __init__(self):
+        self.reads = 0
+        self.down = False
+        self.released = None
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FailingDatabase()
+    get = RecipeListView.get
+
+    async def read(self, request):
+        database.reads += 1
+        if database.released is not None:
+            await database.released.wait()
+        if database.down:
+            raise OperationalError('база недоступна')
+        return await get(self, request)
+
+    monkeypatch.setattr(RecipeListView, 'get', read)
+    monkeypatch.setattr(stale, '_stored_at', OrderedDict())
+    return database
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker(
+        failure_threshold=2, reset_timeout=CIRCUIT_BREAKER_RESET_TIMEOUT)
+    monkeypatch.setattr(async_views, 'database_breaker', breaker)
+    return breaker
+
+
+def age_stale_response(path, seconds):
+    key = get_stale_key(RequestFactory().get(path))
+    content, content_type, stored_at = cache.get(key)
+    cache.set(key, (content, content_type, stored_at - seconds))
+
+
+@pytest.mark.django_db
+def test_stale_response_is_served_when_database_fails(database, breaker):
+    client = get_client()
+    fresh = client.get(PATH)
+    assert fresh.status_code == 200
+    assert 'X-Cache' not in fresh
+    age_stale_response(PATH, 30)
+
+    database.down = True
+    response = client.get(PATH)
+
+    assert response.status_code == 200
+    assert response.content == fresh.content
+    assert response['Content-Type'] == fresh['Content-Type']
+    assert response['X-Cache'] == 'STALE'
+    assert 30 <= int(response['Age']) <= 31
+    assert breaker.failures == 1
+
+
+@pytest.mark.django_db
+def test_unavailable_without_stale_response(database, breaker):
+    get_client().get(PATH)
+    database.down = True
+
+    response = get_client().get(PATH + '?limit=1')
+
+    assert response.status_code == 503
+    assert response['Retry-After'] == str(CIRCUIT_BREAKER_RESET_TIMEOUT)
+    assert 'X-Cache' not in response
+
+
+@pytest.mark.django_db
+def test_stale_response_requires_token_known_to_process(
+        user, database, breaker):
+    client = get_client(user)
+    assert client.get(PATH).status_code == 200
+    database.down = True
+    assert client.get(PATH)['X-Cache'] == 'STALE'
+
+    # Процесс, не проверявший токен в базе, не знает, действует ли он.
+    token_users._entries.clear()
+    response = client.get(PATH)
+
+    assert response.status_code == 503
+
+
+@pytest.mark.django_db
+def test_revoked_token_gets_no_stale_response(
+        user, database, breaker, django_capture_on_commit_callbacks):
+    client = get_client(user)
+    assert client.get(PATH).status_code == 200
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Token.objects.filter(user=user).delete()
+    database.down = True
+    response = client.get(PATH)
+
+    assert response.status_code == 503
+    assert 'X-Cache' not in response
+
+
+@pytest.mark.django_db
+def test_open_breaker_serves_stale_and_revalidates_once(database, breaker):
+    async def scenario():
+        client = AsyncClient()
+        fresh = await client.get(PATH)
+        database.down = True
+        for _ in range(breaker.failure_threshold):
+            assert (await client.get(PATH))['X-Cache'] == 'STALE'
+        assert breaker.state == CircuitBreaker.OPEN
+
+        # База восстановилась, но разомкнутый автомат к ней не пускает.
+        database.down = False
+        reads = database.reads
+        assert (await client.get(PATH))['X-Cache'] == 'STALE'
+        assert database.reads == reads
+
+        breaker.opened_at -= breaker.reset_timeout
+        database.released = asyncio.Event()
+        responses = [await client.get(PATH) for _ in range(3)]
+        assert all(
+            response['X-Cache'] == 'STALE' for response in responses)
+        # Одна пробная попытка обновляет ответ в фоне.
+        await asyncio.sleep(0)
+        assert database.reads == reads + 1
+        database.released.set()
+        await asyncio.gather(*AsyncReadView.revalidations)
+
+        assert breaker.state == CircuitBreaker.CLOSED
+        response = await client.get(PATH)
+        assert 'X-Cache' not in response
+        assert response.content == fresh.content
+
+    async_to_sync(scenario)()
@@ -0,0 +1,93 @@
+"""Случайные рецепты: выборка по диапазону id с повторами и добором."""
+import pytest
+
+from foodgram.constants import RANDOM_SAMPLE_ATTEMPTS
+from recipes import sampling
+from recipes.models import Recipe
+from recipes.sampling import sample_recipe_ids
+from tests.conftest import get_client
+
+
+def create_recipes(author, count):
+    return [
+        recipe.pk for recipe in Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'Рецепт {number}',
+                image='recipes/images/рецепт.png',
+                text='Описание',
+                cooking_time=5,
+            )
+            for number in range(count)
+        )
+    ]
+
+
+@pytest.fixture
+def sparse_ids(author):
+    """Пять рецептов из двухсот: выборка по диапазону почти не попадает."""
+    ids = create_recipes(author, 200)
+    kept = [ids[0], ids[50], ids[51], ids[120], ids[-1]]
+    Recipe.objects.exclude(pk__in=kept).delete()
+    return kept
+
+
+@pytest.mark.django_db
+def test_empty_table_gives_empty_sample():
+    assert sample_recipe_ids(5) == []
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('count, limit', ((3, 10), (10, 10), (40, 6)))
+def test_sample_is_capped_and_unique(author, count, limit):
+    ids = create_recipes(author, count)
+
+    for _ in range(20):
+        sample = sample_recipe_ids(limit)
+        assert len(sample) == min(limit, count)
+        assert len(set(sample)) == len(sample)
+        assert set(sample) <= set(ids)
+
+
+@pytest.mark.django_db
+def test_dense_table_needs_one_lookup(author, django_assert_num_queries):
+    create_recipes(author, 40)
+
+    # MIN, MAX и один поиск по случайным id.
+    with django_assert_num_queries(3):
+        assert len(sample_recipe_ids(2)) == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', (3, 5, 8))
+def test_sparse_table_is_filled_up(sparse_ids, limit):
+    for _ in range(20):
+        sample = sample_recipe_ids(limit)
+        assert len(sample) == min(limit, len(sparse_ids))
+        assert len(set(sample)) == len(sample)
+        assert set(sample) <= set(sparse_ids)
+
+
+@pytest.mark.django_db
+def test_fallback_wraps_around_from_random_start(
+        sparse_ids, monkeypatch, django_assert_max_num_queries):
+    # Случайные id попадают только в последний рецепт, и добор подряд
+    # начинается с него: остальные берутся с начала таблицы.
+    monkeypatch.setattr(
+        sampling.random, 'randint', lambda low, high: high)
+
+    with django_assert_max_num_queries(RANDOM_SAMPLE_ATTEMPTS + 4):
+        sample = sample_recipe_ids(3)
+
+    assert sparse_ids[-1] in sample
+    assert sorted(sample) == sorted([sparse_ids[-1], *sparse_ids[:2]])
+
+
+@pytest.mark.django_db
+def test_random_endpoint(sparse_ids):
+    response = get_client().get('/api/recipes/random/', {'limit': 4})
+
+    assert response.status_code == 200
+    ids = [recipe['id'] for recipe in response.json()]
+    assert len(ids) == len(set(ids)) == 4
+    assert set(ids) <= set(sparse_ids)
@@ -0,0 +1,136 @@
+"""Короткие ссылки: коды без совпадений и переход по ссылке."""
+import pytest
+
+from foodgram.constants import SHORT_LINK_LENGTH, SHORT_LINK_MAX_AGE
+from recipes.models import Recipe
+from recipes.short_links import (
+    ALPHABET,
+    MULTIPLIER,
+    get_recipe_id,
+    get_short_code,
+    recipe_ids,
+)
+from tests.conftest import get_client
+
+BOUNDARY_IDS = (
+    len(ALPHABET) ** SHORT_LINK_LENGTH - 1,
+    len(ALPHABET) ** SHORT_LINK_LENGTH,
+    len(ALPHABET) ** (SHORT_LINK_LENGTH + 1) + 1,
+)
+
+
+def get_long_code(recipe_id):
+    """Код id на символ длиннее выдаваемого: он декодируется в id,
+    но этому id выдается более короткий код."""
+    length = SHORT_LINK_LENGTH + 1
+    number = recipe_id * MULTIPLIER % len(ALPHABET) ** length
+    code = ''
+    for _ in range(length):
+        number, index = divmod(number, len(ALPHABET))
+        code = ALPHABET[index] + code
+    return code
+
+
+@pytest.fixture
+def recipe(author):
+    return Recipe.objects.create(
+        author=author,
+        name='Рецепт',
+        image='recipes/images/рецепт.png',
+        text='Описание',
+        cooking_time=5,
+    )
+
+
+def test_codes_are_unique_and_decode_to_ids():
+    ids = [*range(1, 100_000), *BOUNDARY_IDS]
+    codes = [get_short_code(recipe_id) for recipe_id in ids]
+
+    assert len(set(codes)) == len(ids)
+    assert all(len(code) == SHORT_LINK_LENGTH for code in codes[:-2])
+    assert [get_recipe_id(code) for code in codes] == ids
+    # Соседние id не дают похожих кодов.
+    assert codes[0][:3] != codes[1][:3]
+
+
+@pytest.mark.parametrize('code', (
+    '',
+    'abc',
+    'abc-de',
+    'абвгде',
+    get_long_code(5),
+    get_long_code(len(ALPHABET) ** SHORT_LINK_LENGTH - 1),
+))
+def test_code_that_is_never_issued_is_rejected(code):
+    assert get_recipe_id(code) is None
+
+
+def get_link(recipe):
+    response = get_client().get(f'/api/recipes/{recipe.pk}/get-link/')
+    assert response.status_code == 200
+    return response.json()['short-link']
+
+
+@pytest.mark.django_db
+def test_short_link_redirects_to_recipe(recipe, django_assert_num_queries):
+    link = get_link(recipe)
+    code = get_short_code(recipe.pk)
+    assert link == f'http://testserver/s/{code}'
+    assert get_link(recipe) == link
+
+    response = get_client().get(link)
+
+    assert response.status_code == 301
+    assert response['Location'] == f'/recipes/{recipe.pk}'
+    assert response['Cache-Control'] == f'public, max-age={SHORT_LINK_MAX_AGE}'
+
+    # Код уже в памяти процесса и в общем кеше.
+    with django_assert_num_queries(0):
+        assert get_client().get(link).status_code == 301
+    recipe_ids._entries.clear()
+    with django_assert_num_queries(0):
+        assert get_client().get(f'/s/{code}').status_code == 301
+
+
+@pytest.mark.django_db
+def test_short_link_is_resolved_from_database(recipe):
+    code = get_short_code(recipe.pk)
+    Recipe.objects.filter(pk=recipe.pk).update(short_code=code)
+
+    assert get_client().get(f'/s/{code}/')['Location'] == (
+        f'/recipes/{recipe.pk}')
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('path', (
+    '/s/abc/',
+    '/s/abc-de/',
+    '/s/{unknown}/',
+    '/s/{not_issued}/',
+))
+def test_bad_or_unknown_code_is_not_found(
+        recipe, django_assert_num_queries, path):
+    get_link(recipe)
+    # Коды, которые не выдаются, отклоняются без запроса к БД.
+    queries = 1 if 'unknown' in path else 0
+    path = path.format(
+        unknown=get_short_code(recipe.pk + 1),
+        not_issued=get_long_code(recipe.pk),
+    )
+
+    with django_assert_num_queries(queries):
+        response = get_client().get(path)
+
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_deleted_recipe_link_is_not_found(
+        recipe, django_capture_on_commit_callbacks):
+    link = get_link(recipe)
+    assert get_client().get(link).status_code == 301
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.delete()
+
+    assert get_client().get(link).status_code == 404
@@ -0,0 +1,147 @@
+"""Картинки рецептов записываются до транзакции и переносятся после нее."""
+import base64
+import os
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from django.core.files.base import File
+from django.db import transaction
+from PIL import Image
+
+from foodgram import staging
+from foodgram.constants import FILE_STAGING_DIR
+from recipes.models import Recipe
+from tests.conftest import get_client
+
+CHUNK_WRITE_DELAY = 0.02
+"""Задержка записи каждого фрагмента файла (с): запись большой картинки
+заметно дольше транзакции, если бы она шла внутри транзакции."""
+
+
+def encode_image(size):
+    """Картинка PNG из шума (не сжимается) в виде data URI."""
+    image = Image.frombytes('RGB', (size, size), os.urandom(size * size * 3))
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    content = buffer.getvalue()
+    return content, 'data:image/png;base64,' + base64.b64encode(
+        content).decode()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def transaction_timings(monkeypatch):
+    """Длительность транзакций atomic_with_files(), с."""
+    timings = []
+
+    @contextmanager
+    def atomic():
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                yield
+        finally:
+            timings.append(time.perf_counter() - started)
+
+    monkeypatch.setattr(staging, 'transaction', SimpleNamespace(
+        atomic=atomic, on_commit=transaction.on_commit))
+    return timings
+
+
+@pytest.fixture
+def slow_writes(monkeypatch):
+    chunks = File.chunks
+
+    def slow_chunks(self, *args, **kwargs):
+        for chunk in chunks(self, *args, **kwargs):
+            time.sleep(CHUNK_WRITE_DELAY)
+            yield chunk
+
+    monkeypatch.setattr(File, 'chunks', slow_chunks)
+
+
+def post_recipe(user, ingredients, image):
+    return get_client(user).post(
+        '/api/recipes/',
+        {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': image,
+            'ingredients': [{'id': ingredients[0].id, 'amount': 1}],
+        },
+        content_type='application/json',
+    )
+
+
+def get_staged_files(media_root):
+    return list((media_root / FILE_STAGING_DIR).iterdir())
+
+
+@pytest.mark.django_db
+def test_transaction_time_does_not_depend_on_image_size(
+        user, ingredients, media_root, transaction_timings, slow_writes,
+        django_capture_on_commit_callbacks):
+    small, small_uri = encode_image(1)
+    large, large_uri = encode_image(750)
+    write_time = CHUNK_WRITE_DELAY * len(large) / File.DEFAULT_CHUNK_SIZE
+
+    request_timings = []
+    for content, uri in ((small, small_uri), (large, large_uri)):
+        started = time.perf_counter()
+        with django_capture_on_commit_callbacks(execute=True):
+            response = post_recipe(user, ingredients, uri)
+        request_timings.append(time.perf_counter() - started)
+        assert response.status_code == 201, response.content
+        image = Recipe.objects.get(pk=response.json()['id']).image
+        assert (media_root / image.name).read_bytes() == content
+
+    small_time, large_time = transaction_timings
+    assert request_timings[1] > write_time
+    assert large_time - small_time < write_time / 2
+    assert get_staged_files(media_root) == []
+
+
+@pytest.mark.django_db
+def test_rollback_discards_staged_file(user, ingredients, media_root,
+                                       monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('Ошибка внутри транзакции')
+
+    monkeypatch.setattr('api.serializers.enqueue', fail)
+    _, image = encode_image(10)
+
+    with pytest.raises(RuntimeError):
+        post_recipe(user, ingredients, image)
+
+    assert not Recipe.objects.exists()
+    assert get_staged_files(media_root) == []
+    assert not (media_root / 'recipes').exists()
+
+
+@pytest.mark.django_db
+def test_file_is_moved_on_commit(user, ingredients, media_root,
+                                 django_capture_on_commit_callbacks):
+    content, image = encode_image(10)
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        response = post_recipe(user, ingredients, image)
+    assert response.status_code == 201, response.content
+    name = Recipe.objects.get().image.name
+    staged_file, = get_staged_files(media_root)
+    assert staged_file.read_bytes() == content
+    assert not (media_root / name).exists()
+
+    for callback in callbacks:
+        callback()
+
+    assert (media_root / name).read_bytes() == content
+    assert get_staged_files(media_root) == []
@@ -0,0 +1,36 @@
+"""Пометка устаревших рекомендаций авторов при изменении подписок."""
+import pytest
+
+from users.models import StaleAuthorSuggestions, Subscribe, User
+
+
+def get_stale_users():
+    return set(StaleAuthorSuggestions.objects.values_list(
+        'user_id', flat=True))
+
+
+@pytest.fixture
+def subscriptions(user, author):
+    """user и author подписаны друг на друга."""
+    Subscribe.objects.create(user=user, author=author)
+    Subscribe.objects.create(user=author, author=user)
+    StaleAuthorSuggestions.objects.all().delete()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('delete', (
+    lambda user: user.delete(),
+    lambda user: User.objects.filter(pk=user.pk).delete(),
+))
+def test_deleting_user_marks_only_remaining_subscribers(
+        user, author, subscriptions, delete):
+    delete(user)
+
+    assert get_stale_users() == {author.pk}
+
+
+@pytest.mark.django_db
+def test_unsubscribe_marks_subscriber(user, author, subscriptions):
+    Subscribe.objects.filter(user=user).delete()
+
+    assert get_stale_users() == {user.pk}
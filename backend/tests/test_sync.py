@@ -0,0 +1,93 @@
+"""Токен /api/sync/ не пропускает записи, зафиксированные поздно."""
+import threading
+from datetime import timedelta
+
+import pytest
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from recipes.models import ChangeLogEntry, Favorite, Recipe
+from tests.conftest import get_client
+
+Kind = ChangeLogEntry.Kind
+
+
+@pytest.fixture
+def recipes(author):
+    return Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            image='recipes/images/рецепт.png',
+            text='Описание',
+            cooking_time=5,
+        )
+        for number in range(2)
+    )
+
+
+def get_changes(client, since):
+    response = client.get('/api/sync/', {'since': since})
+    assert response.status_code == 200, response.content
+    data = response.json()
+    return [
+        (change['type'], change['id']) for change in data['changes']
+    ], data['next']
+
+
+@pytest.mark.django_db
+def test_entry_committed_late_is_not_skipped(user, recipes):
+    client = get_client(user)
+    hour_ago = timezone.now() - timedelta(hours=1)
+    ChangeLogEntry.objects.create(
+        pk=100,
+        kind=Kind.FAVORITE,
+        object_id=recipes[1].pk,
+        owner=user.pk,
+        created_at=hour_ago,
+    )
+    token = client.get('/api/sync/').json()['next']
+
+    # Запись получила id раньше уже отданной, а ее транзакция
+    # зафиксировалась через час после создания записи.
+    ChangeLogEntry.objects.create(
+        pk=50,
+        kind=Kind.FAVORITE,
+        object_id=recipes[0].pk,
+        owner=user.pk,
+        created_at=hour_ago,
+    )
+
+    changes, next_token = get_changes(client, token)
+    assert changes == [(Kind.FAVORITE, recipes[0].pk)]
+    assert get_changes(client, next_token) == ([], next_token)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_transaction_is_not_skipped(user, recipes):
+    if connection.vendor != 'postgresql':
+        pytest.skip('Нужен PostgreSQL (DB_ENGINE=postgresql)')
+    client = get_client(user)
+    token = client.get('/api/sync/').json()['next']
+    inserted, commit = threading.Event(), threading.Event()
+
+    def slow_transaction():
+        try:
+            with transaction.atomic():
+                Favorite.objects.create(user=user, recipe=recipes[0])
+                inserted.set()
+                commit.wait(10)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=slow_transaction)
+    thread.start()
+    inserted.wait(10)
+    Favorite.objects.create(user=user, recipe=recipes[1])
+    changes, token = get_changes(client, token)
+    assert changes == [(Kind.FAVORITE, recipes[1].pk)]
+
+    commit.set()
+    thread.join()
+    changes, _ = get_changes(client, token)
+    assert changes == [(Kind.FAVORITE, recipes[0].pk)]
@@ -0,0 +1,222 @@
+"""Очередь задач: запись в транзакции, захват, повторы и обработчики."""
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+
+from foodgram.constants import TASKS_RETRY_BASE_DELAY
+from tasks import queue
+from tasks.models import Task
+from tasks.queue import claim_task, enqueue, run_task
+
+Status = Task.Status
+
+calls = []
+
+
+def record(*args):
+    calls.append(args)
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+@pytest.fixture
+def no_skip_locked(monkeypatch):
+    """Захват условным UPDATE, как в SQLite, на любой базе."""
+    monkeypatch.setattr(
+        connection.features, 'has_select_for_update_skip_locked', False)
+
+
+def expire(task, **fields):
+    Task.objects.filter(pk=task.pk).update(**fields)
+
+
+@pytest.mark.django_db
+def test_enqueue_is_rolled_back_with_transaction():
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            enqueue(record, 1)
+            assert Task.objects.count() == 1
+            raise RuntimeError
+
+    assert not Task.objects.exists()
+    assert claim_task() is None
+
+
+@pytest.mark.django_db
+def test_enqueue_with_key_creates_one_task():
+    enqueue(record, 1, key='recipe:1')
+    enqueue(record, 2, key='recipe:1')
+    enqueue(record, 3)
+    enqueue(record, 4)
+
+    assert list(Task.objects.order_by('pk').values_list('key', 'args')) == [
+        ('recipe:1', [1]), (None, [3]), (None, [4])]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('skip_locked', (True, False))
+def test_claimed_task_runs_once(skip_locked, monkeypatch):
+    if not skip_locked:
+        monkeypatch.setattr(
+            connection.features, 'has_select_for_update_skip_locked', False)
+    enqueue(record, 'a')
+    enqueue(record, 'b', delay=60)
+
+    task = claim_task()
+    assert (task.status, task.attempts) == (Status.RUNNING, 1)
+    assert claim_task() is None
+    assert run_task(task)
+
+    assert calls == [('a',)]
+    task.refresh_from_db()
+    assert task.status == Status.DONE and task.finished_at is not None
+    assert claim_task() is None
+
+
+@pytest.fixture
+def rival(no_skip_locked, monkeypatch):
+    """Задача, которую соперник захватывает между чтением кандидатов
+    и условным UPDATE (список из одного элемента после захвата)."""
+    get_lock_fields = queue.get_lock_fields
+    claimed = []
+
+    def claim_by_rival(now):
+        if not claimed:
+            claimed.append(None)
+            claimed[0] = claim_task()
+        return get_lock_fields(now)
+
+    monkeypatch.setattr(queue, 'get_lock_fields', claim_by_rival)
+    return claimed
+
+
+@pytest.mark.django_db
+def test_conditional_update_claims_are_exclusive(rival):
+    enqueue(record, 'a')
+    enqueue(record, 'b')
+
+    task = claim_task()
+
+    assert rival[0] is not None and task is not None
+    assert rival[0].pk != task.pk
+    assert Task.objects.filter(
+        status=Status.RUNNING, attempts=1).count() == 2
+
+
+@pytest.mark.django_db
+def test_conditional_update_claim_loses_only_task(rival):
+    enqueue(record, 'a')
+
+    assert claim_task() is None
+    assert rival[0] is not None
+    assert Task.objects.get().attempts == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('skip_locked', (True, False))
+def test_task_is_reclaimed_after_lock_expires(skip_locked, monkeypatch):
+    if not skip_locked:
+        monkeypatch.setattr(
+            connection.features, 'has_select_for_update_skip_locked', False)
+    enqueue(record, 'a')
+    task = claim_task()
+    assert claim_task() is None
+
+    # Обработчик завершился аварийно, не освободив задачу.
+    expire(task, locked_until=timezone.now() - timedelta(seconds=1))
+    reclaimed = claim_task()
+
+    assert reclaimed.pk == task.pk
+    assert reclaimed.attempts == 2
+    assert Task.objects.get().locked_until > timezone.now()
+
+
+@pytest.mark.django_db
+def test_failed_task_is_retried_with_growing_delay():
+    enqueue(fail, 'сбой')
+    delays = []
+    for attempt in (1, 2):
+        task = claim_task()
+        assert task.attempts == attempt
+        started = timezone.now()
+        assert not run_task(task)
+        task.refresh_from_db()
+        assert task.status == Status.QUEUED
+        assert task.locked_until is None
+        assert 'ValueError: сбой' in task.error
+        delays.append((task.run_at - started).total_seconds())
+        # Повтор не раньше срока.
+        assert claim_task() is None
+        expire(task, run_at=timezone.now())
+
+    # Задержка растет вдвое, разброс — до половины задержки.
+    assert TASKS_RETRY_BASE_DELAY / 2 <= delays[0] < TASKS_RETRY_BASE_DELAY + 1
+    assert TASKS_RETRY_BASE_DELAY <= delays[1] < TASKS_RETRY_BASE_DELAY * 2 + 1
+
+
+@pytest.mark.django_db
+def test_task_fails_after_max_attempts():
+    enqueue(fail, 'сбой', max_attempts=2)
+    for _ in range(2):
+        task = claim_task()
+        run_task(task)
+        expire(task, run_at=timezone.now())
+
+    task = Task.objects.get()
+    assert task.status == Status.FAILED
+    assert task.attempts == 2
+    assert task.finished_at is not None
+    assert task.error.startswith('Traceback')
+    assert 'ValueError: сбой' in task.error
+    assert claim_task() is None
+
+
+@pytest.mark.django_db
+def test_expired_task_over_max_attempts_fails():
+    enqueue(record, 'a', max_attempts=1)
+    task = claim_task()
+    expire(task, locked_until=timezone.now() - timedelta(seconds=1))
+
+    assert not run_task(claim_task())
+    task.refresh_from_db()
+    assert task.status == Status.FAILED
+    assert 'Превышено число попыток' in task.error
+    assert calls == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_workers_once_runs_queued_tasks():
+    for number in range(6):
+        enqueue(record, number)
+    enqueue(fail, 'сбой', max_attempts=1)
+
+    call_command('run_workers', processes=1, threads=3, once=True)
+
+    assert sorted(calls) == [(number,) for number in range(6)]
+    assert Task.objects.filter(status=Status.DONE).count() == 6
+    assert Task.objects.filter(status=Status.FAILED).count() == 1
+
+
+@pytest.mark.django_db
+def test_clean_tasks_frees_keys():
+    enqueue(record, 'a', key='once')
+    enqueue(record, 'b', key='queued')
+    run_task(claim_task())
+    Task.objects.filter(status=Status.DONE).update(
+        finished_at=timezone.now() - timedelta(days=8))
+
+    call_command('clean_tasks', days=7)
+
+    assert list(Task.objects.values_list('key', flat=True)) == ['queued']
+    enqueue(record, 'c', key='once')
+    assert Task.objects.count() == 2
@@ -0,0 +1,182 @@
+"""Популярность рецептов: сумма с затуханием в логарифмической шкале."""
+import math
+from datetime import timedelta
+from itertools import permutations
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from foodgram.constants import TRENDING_HALF_LIFE
+from recipes.models import Favorite, Recipe, RecipeEvent
+from recipes.trending import (
+    EVENT_WEIGHTS,
+    get_event_score,
+    logaddexp2,
+    update_trending_scores,
+)
+from tests.conftest import create_user, get_client
+
+Kind = RecipeEvent.Kind
+
+EVENTS = (
+    # (номер рецепта, тип, сколько периодов полураспада назад)
+    (0, Kind.FAVORITE, 0),
+    (1, Kind.SHOPPING_CART, 3),
+    (0, Kind.SHOPPING_CART, 1.5),
+    (2, Kind.FAVORITE, 0.25),
+    (0, Kind.FAVORITE, 10),
+    (1, Kind.FAVORITE, 0),
+    (2, Kind.FAVORITE, 0.5),
+)
+"""События не по порядку времени: они обрабатываются в порядке id."""
+
+
+@pytest.fixture
+def now():
+    return timezone.now()
+
+
+@pytest.fixture
+def recipes(author):
+    return Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            image='recipes/images/рецепт.png',
+            text='Описание',
+            cooking_time=5,
+        )
+        for number in range(4)
+    )
+
+
+def create_events(recipes, now, events=EVENTS):
+    RecipeEvent.objects.bulk_create(
+        RecipeEvent(
+            recipe=recipes[number],
+            kind=kind,
+            created_at=now - timedelta(seconds=age * TRENDING_HALF_LIFE),
+        )
+        for number, kind, age in events
+    )
+
+
+def get_decayed_scores(recipes, now):
+    """Популярность рецептов в момент now из сохраненных значений."""
+    return [
+        2 ** (recipe.trending_score - now.timestamp() / TRENDING_HALF_LIFE)
+        for recipe in Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes]).order_by('pk')
+    ]
+
+
+def get_direct_scores(recipes, events=EVENTS):
+    """Популярность как прямая сумма весов с затуханием."""
+    scores = [0] * len(recipes)
+    for number, kind, age in events:
+        scores[number] += EVENT_WEIGHTS[kind] * 2 ** -age
+    return scores
+
+
+@pytest.mark.parametrize('first, second', (
+    (0, 0),
+    (3, 1),
+    (-2.5, 4),
+    (20_000, 20_000 - 60),
+))
+def test_logaddexp2(first, second):
+    expected = max(first, second) + math.log2(
+        1 + 2 ** (min(first, second) - max(first, second)))
+
+    assert logaddexp2(first, second) == pytest.approx(expected)
+    assert logaddexp2(first, second) == logaddexp2(second, first)
+    if max(first, second) < 1000:
+        assert 2 ** logaddexp2(first, second) == pytest.approx(
+            2 ** first + 2 ** second)
+
+
+def test_fold_does_not_depend_on_event_order(now):
+    scores = [
+        get_event_score(kind, now - timedelta(
+            seconds=age * TRENDING_HALF_LIFE))
+        for _, kind, age in EVENTS
+    ]
+    results = []
+    for order in permutations(scores):
+        total = order[0]
+        for score in order[1:]:
+            total = logaddexp2(total, score)
+        results.append(total)
+
+    # Порядок сложения меняет только погрешность округления.
+    assert max(results) - min(results) < 1e-9
+    assert 2 ** (results[0] - now.timestamp() / TRENDING_HALF_LIFE) == (
+        pytest.approx(sum(get_direct_scores([0, 1, 2]))))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('batch_size', (1, 2, 100))
+def test_scores_match_direct_decayed_sum(recipes, now, batch_size):
+    create_events(recipes, now)
+
+    assert update_trending_scores(batch_size) == len(EVENTS)
+
+    assert not RecipeEvent.objects.exists()
+    # Начальное значение 0 — одно добавление в 1970 году, его вклад
+    # сейчас пренебрежимо мал.
+    assert get_decayed_scores(recipes, now) == pytest.approx(
+        get_direct_scores(recipes))
+    # Отношение популярностей со временем не меняется.
+    later = now + timedelta(seconds=7 * TRENDING_HALF_LIFE)
+    assert get_decayed_scores(recipes, later) == pytest.approx(
+        [score / 2 ** 7 for score in get_direct_scores(recipes)])
+
+
+@pytest.mark.django_db
+def test_events_are_applied_once(recipes, now):
+    create_events(recipes, now, EVENTS[:4])
+    assert update_trending_scores(3) == 4
+    scores = get_decayed_scores(recipes, now)
+
+    assert update_trending_scores(3) == 0
+    assert get_decayed_scores(recipes, now) == scores
+
+    create_events(recipes, now, EVENTS[4:])
+    assert update_trending_scores(3) == len(EVENTS) - 4
+    assert get_decayed_scores(recipes, now) == pytest.approx(
+        get_direct_scores(recipes))
+
+
+@pytest.mark.django_db
+def test_events_of_deleted_recipe_are_dropped(recipes, now):
+    create_events(recipes, now)
+    recipes[1].delete()
+
+    call_command('update_trending_scores', batch_size=2)
+
+    assert not RecipeEvent.objects.exists()
+    remaining = [recipes[0], recipes[2], recipes[3]]
+    direct = get_direct_scores(recipes)
+    assert get_decayed_scores(remaining, now) == pytest.approx(
+        [direct[0], direct[2], direct[3]])
+
+
+@pytest.mark.django_db
+def test_trending_ordering(recipes, user):
+    # Корзина весит вдвое больше избранного, добавление день назад —
+    # вдвое меньше сегодняшнего.
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    for number in range(3):
+        Favorite.objects.create(
+            user=create_user(f'читатель {number}'), recipe=recipes[2])
+    RecipeEvent.objects.filter(recipe=recipes[2]).update(
+        created_at=timezone.now() - timedelta(seconds=2 * TRENDING_HALF_LIFE))
+    RecipeEvent.objects.create(recipe=recipes[1], kind=Kind.SHOPPING_CART)
+    update_trending_scores(100)
+
+    response = get_client().get('/api/recipes/', {'ordering': 'trending'})
+
+    assert response.status_code == 200
+    assert [recipe['id'] for recipe in response.json()['results']] == [
+        recipes[number].pk for number in (1, 0, 2, 3)]
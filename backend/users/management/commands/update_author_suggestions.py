@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from users.suggestions import update_author_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчет рекомендаций авторов по графу подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true', dest='refresh_all',
+            help='Пересчитать рекомендации всех пользователей, а не только '
+                 'тех, чьи подписки изменились',
+        )
+
+    def handle(self, *args, **options):
+        users_count = update_author_suggestions(options['refresh_all'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рекомендаций пользователей: {users_count}'))
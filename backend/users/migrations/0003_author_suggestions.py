@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_subscribe_options_alter_user_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleAuthorSuggestions',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('marked_at', models.DateTimeField(verbose_name='Отмечен')),
+            ],
+            options={
+                'verbose_name': 'Устаревшие рекомендации',
+                'verbose_name_plural': 'Устаревшие рекомендации',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuthorSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Рекомендуемый автор')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_suggestions', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рекомендация автора',
+                'verbose_name_plural': 'Рекомендации авторов',
+                'indexes': [models.Index(fields=['user', '-score'], name='author_suggestion_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'author'), name='unique_author_suggestion')],
+            },
+        ),
+    ]
@@ -79,3 +79,57 @@ class Subscribe(models.Model):
 
     def __str__(self):
         return f'{self.user.username} подписан на {self.author.username}'
+
+
+class AuthorSuggestion(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='author_suggestions',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Рекомендуемый автор',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField(verbose_name='Оценка')
+
+    class Meta:
+        verbose_name = 'Рекомендация автора'
+        verbose_name_plural = 'Рекомендации авторов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_author_suggestion')
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-score'),
+                name='author_suggestion_score_idx',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.author_id} для {self.user_id}'
+
+
+class StaleAuthorSuggestions(models.Model):
+    """Пользователь, подписки которого изменились после расчета
+    рекомендаций."""
+
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+    )
+    marked_at = models.DateTimeField(verbose_name='Отмечен')
+
+    class Meta:
+        verbose_name = 'Устаревшие рекомендации'
+        verbose_name_plural = 'Устаревшие рекомендации'
+
+    def __str__(self):
+        return f'Рекомендации {self.user_id}'
@@ -0,0 +1,57 @@
+from weakref import WeakKeyDictionary
+
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from users.models import StaleAuthorSuggestions, Subscribe, User
+from users.tokens import token_users
+
+deleted_users = WeakKeyDictionary()
+"""QuerySet пользователей, удаляемый через delete() -> id удаляемых им
+пользователей (pre_delete приходит до удаления каскадом)."""
+
+
+@receiver(pre_delete, sender=User)
+def remember_deleted_user(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, QuerySet):
+        deleted_users.setdefault(origin, set()).add(instance.pk)
+
+
+def is_user_deleted(user_id, origin):
+    """Удаляется ли пользователь вместе с подпиской (каскадом)."""
+    if isinstance(origin, User):
+        return origin.pk == user_id
+    if isinstance(origin, QuerySet):
+        return user_id in deleted_users.get(origin, ())
+    return False
+
+
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def mark_suggestions_stale(sender, instance, origin=None, **kwargs):
+    if is_user_deleted(instance.user_id, origin):
+        return
+    StaleAuthorSuggestions.objects.bulk_create(
+        [StaleAuthorSuggestions(
+            user_id=instance.user_id, marked_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=('user',),
+        update_fields=('marked_at',),
+    )
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    token_users.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+            'key', flat=True):
+        token_users.invalidate(key)
@@ -0,0 +1,32 @@
+"""Пользователи по токенам для асинхронной аутентификации.
+
+Пользователь токена хранится в памяти процесса и сбрасывается во всех
+процессах через шину инвалидации при удалении токена (выходе)
+и изменении пользователя.
+"""
+from rest_framework.authtoken.models import Token
+
+from foodgram.constants import AUTH_TOKEN_CACHE_SIZE
+from foodgram.invalidation import LocalCache
+
+token_users = LocalCache('auth-tokens', AUTH_TOKEN_CACHE_SIZE)
+
+
+async def aget_token_user(key):
+    """Пользователь токена или None, если токена нет."""
+    generation = token_users.get_generation(key)
+    user = token_users.get(key, generation)
+    if user is None:
+        token = await Token.objects.select_related('user').filter(
+            key=key).afirst()
+        if token is None:
+            return None
+        user = token.user
+        token_users.set(key, user, generation)
+    return user
+
+
+def get_cached_token_user(key):
+    """Пользователь токена из памяти процесса, без обращения к базе;
+    None, если его там нет."""
+    return token_users.get(key, token_users.get_generation(key))